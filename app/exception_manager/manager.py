@@ -27,3 +27,9 @@ class KPILinkValidationError(ValidationError):
     """Error raised when parent or child cannot be set!"""
 
     pass
+
+
+class BatchImportValidationError(ValidationError):
+    """Error raised when streamed KPI values can not be imported"""
+
+    pass
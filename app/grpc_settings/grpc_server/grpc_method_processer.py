@@ -10,7 +10,8 @@ from grpc_settings.protobuf_storage.airflow_manager.protobuf_files import (
 from grpc_settings.protobuf_storage.airflow_manager.servicer import (
     AirflowManager,
 )
-from v1.settings.config import GRPC_PORT
+from services.kpi_services.cache import listen_kpi_metadata_invalidations
+from v1.settings.config import GRPC_PORT, KPI_METADATA_CACHE_SYNC_ENABLED
 
 
 async def start_grpc_server() -> None:
@@ -23,7 +24,14 @@ async def start_grpc_server() -> None:
     server.add_insecure_port(listen_addr)
     logging.info("Starting server on %s", listen_addr)
     await server.start()
+    background_tasks = []
+    if KPI_METADATA_CACHE_SYNC_ENABLED:
+        background_tasks.append(
+            asyncio.create_task(listen_kpi_metadata_invalidations())
+        )
     await server.wait_for_termination()
+    for task in background_tasks:
+        task.cancel()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,255 @@
+"""Staged pipeline for BatchImport stream: decode -> validate -> write.
+
+Stages are connected by bounded queues, so next message is decoded and validated while previous one
+is being written. When queues are full, decode stage stops reading request_iterator,
+which gives backpressure to the gRPC stream.
+KPI values are upserted by natural key, stream with already imported batch_id is not written again.
+In partial mode every message is committed separately, invalid rows are rejected and the rest is written.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+import asyncpg
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from exception_manager.manager import BatchImportValidationError
+from grpc_settings.protobuf_storage.airflow_manager.protobuf_files.airflow_to_state_pb2 import (
+    RequestBatchImport,
+)
+from grpc_settings.protobuf_storage.airflow_manager.utils import (
+    BatchImportOptions,
+    decode_batch_import_request,
+    get_rejected_rows,
+    validate_kpi_values_buffer,
+)
+from services.kpi_services.cache import get_kpis_metadata
+from services.kpi_value_services.copy_writer import (
+    ImportCounts,
+    KPIValueColumnBuffer,
+    add_imported_batch,
+    get_imported_batch_counts,
+    upsert_kpi_values,
+)
+from services.kpi_value_services.current_state import (
+    demote_outdated_current_kpi_values,
+    refresh_current_values_for_groups,
+)
+from v1.models.kpi_values import KPIValuesStates
+from v1.settings.config import BATCH_IMPORT_QUEUE_SIZE
+
+# marks the end of the stream for the next stage
+END_OF_STREAM = None
+
+
+@dataclass
+class ChunkImportResult:
+    chunk: int
+    counts: ImportCounts
+    # reasons by row index in message
+    rejected_rows: dict[int, str]
+
+
+@dataclass
+class BatchImportResult:
+    counts: ImportCounts = field(default_factory=ImportCounts)
+    already_imported: bool = False
+    chunks: list[ChunkImportResult] = field(default_factory=list)
+
+
+async def decode_stage(
+    request_iterator: AsyncIterator[RequestBatchImport],
+    decoded_queue: asyncio.Queue,
+    options: BatchImportOptions,
+):
+    first_request = True
+    async for req in request_iterator:
+        if first_request:
+            options.read_from_request(req)
+            first_request = False
+        await decoded_queue.put(decode_batch_import_request(req))
+    await decoded_queue.put(END_OF_STREAM)
+
+
+async def validate_partial_chunk(
+    buffer: KPIValueColumnBuffer, session: AsyncSession
+) -> tuple[KPIValueColumnBuffer, dict[int, str]]:
+    """Returns buffer with valid rows and reasons of rejected rows"""
+    kpis_metadata = await get_kpis_metadata(session, set(buffer.kpi_id))
+    rejected_rows = get_rejected_rows(buffer, kpis_metadata)
+    if rejected_rows:
+        buffer = buffer.select_rows(
+            row for row in range(len(buffer)) if row not in rejected_rows
+        )
+    buffer.fill_typed_values(
+        {
+            kpi_id: [metadata.val_type, metadata.multiple]
+            for kpi_id, metadata in kpis_metadata.items()
+        }
+    )
+    return buffer, rejected_rows
+
+
+async def validate_stage(
+    decoded_queue: asyncio.Queue,
+    validated_queue: asyncio.Queue,
+    session: AsyncSession,
+    options: BatchImportOptions,
+):
+    while (buffer := await decoded_queue.get()) is not END_OF_STREAM:
+        if options.partial:
+            await validated_queue.put(
+                await validate_partial_chunk(buffer, session)
+            )
+            continue
+
+        # firstly we get all requested kpi, to check if kpi already exists
+        # because if kpi is not exists it`s useless to validate future data
+        requested_kpi_ids = set(buffer.kpi_id)
+
+        # but as base for value validation -- we need to collect info about him: val_type and multiple attrs.
+        kpis_metadata = await get_kpis_metadata(session, requested_kpi_ids)
+
+        # structure like {1: [str, True]}
+        kpis_and_val_types = {
+            kpi_id: [metadata.val_type, metadata.multiple]
+            for kpi_id, metadata in kpis_metadata.items()
+        }
+
+        # get difference between exists kpis and requested
+        kpi_which_not_exist = requested_kpi_ids.difference(
+            set(kpis_and_val_types)
+        )
+        if kpi_which_not_exist:
+            raise BatchImportValidationError(
+                f"There are kpis, which don't exist: {kpi_which_not_exist}"
+            )
+
+        try:
+            validate_kpi_values_buffer(buffer, kpis_and_val_types)
+        except ValueError as message_error:
+            raise BatchImportValidationError(str(message_error))
+        buffer.fill_typed_values(kpis_and_val_types)
+
+        await validated_queue.put((buffer, {}))
+    await validated_queue.put(END_OF_STREAM)
+
+
+async def write_chunk(
+    session: AsyncSession, buffer: KPIValueColumnBuffer, conflict_mode: str
+) -> ImportCounts:
+    counts = await upsert_kpi_values(session, buffer, conflict_mode)
+    # new current values replace previous current values of the same group
+    current_groups = buffer.get_groups(state=KPIValuesStates.CURRENT.value)
+    await demote_outdated_current_kpi_values(session, current_groups)
+    # existing values of any group could be updated
+    await refresh_current_values_for_groups(session, buffer.get_groups())
+    return counts
+
+
+async def write_partial_chunk(
+    session: AsyncSession,
+    buffer: KPIValueColumnBuffer,
+    rejected_rows: dict[int, str],
+    chunk: int,
+    options: BatchImportOptions,
+) -> ChunkImportResult:
+    """Writes and commits valid rows of one message. If they can't be written, all rows are rejected."""
+    chunk_batch_id = options.get_chunk_batch_id(chunk)
+    imported_counts = await get_imported_batch_counts(session, chunk_batch_id)
+    if imported_counts is not None:
+        return ChunkImportResult(chunk, imported_counts, rejected_rows)
+
+    try:
+        counts = await write_chunk(session, buffer, options.conflict_mode)
+        add_imported_batch(session, chunk_batch_id, counts)
+        await session.commit()
+    # COPY is executed by asyncpg connection directly, its errors aren't wrapped by SQLAlchemy
+    except (SQLAlchemyError, asyncpg.PostgresError) as e:
+        await session.rollback()
+        rows_count = len(buffer) + len(rejected_rows)
+        reason = f"Message can't be written: {e}"
+        return ChunkImportResult(
+            chunk,
+            ImportCounts(),
+            {row: rejected_rows.get(row, reason) for row in range(rows_count)},
+        )
+    return ChunkImportResult(chunk, counts, rejected_rows)
+
+
+async def write_stage(
+    validated_queue: asyncio.Queue,
+    session: AsyncSession,
+    options: BatchImportOptions,
+) -> BatchImportResult:
+    """In regular mode stream is written in session transaction, if batch was already imported
+    stream is read, but not written. In partial mode every message is committed separately.
+    """
+    result = BatchImportResult()
+    imported_counts = None
+    chunk = 0
+    while (item := await validated_queue.get()) is not END_OF_STREAM:
+        buffer, rejected_rows = item
+        if options.partial:
+            chunk_result = await write_partial_chunk(
+                session, buffer, rejected_rows, chunk, options
+            )
+            result.counts.add(chunk_result.counts)
+            result.chunks.append(chunk_result)
+            chunk += 1
+            continue
+
+        # options are read with the first message
+        if chunk == 0:
+            imported_counts = await get_imported_batch_counts(
+                session, options.batch_id
+            )
+        chunk += 1
+        if imported_counts is not None:
+            continue
+        result.counts.add(
+            await write_chunk(session, buffer, options.conflict_mode)
+        )
+
+    if options.partial:
+        return result
+    if imported_counts is not None:
+        return BatchImportResult(counts=imported_counts, already_imported=True)
+    add_imported_batch(session, options.batch_id, result.counts)
+    return result
+
+
+async def run_batch_import_pipeline(
+    request_iterator: AsyncIterator[RequestBatchImport],
+    read_session: AsyncSession,
+    write_session: AsyncSession,
+    queue_size: int = BATCH_IMPORT_QUEUE_SIZE,
+) -> BatchImportResult:
+    """Imports stream into write_session transaction, otherwise raises BatchImportValidationError.
+    Transaction is not committed, it is the caller's responsibility.
+    In partial mode messages are committed by pipeline and invalid rows don't raise error.
+    """
+    decoded_queue = asyncio.Queue(maxsize=queue_size)
+    validated_queue = asyncio.Queue(maxsize=queue_size)
+    options = BatchImportOptions()
+
+    try:
+        # if one of the stages fails, others will be cancelled
+        async with asyncio.TaskGroup() as task_group:
+            task_group.create_task(
+                decode_stage(request_iterator, decoded_queue, options)
+            )
+            task_group.create_task(
+                validate_stage(
+                    decoded_queue, validated_queue, read_session, options
+                )
+            )
+            write_task = task_group.create_task(
+                write_stage(validated_queue, write_session, options)
+            )
+    except ExceptionGroup as error_group:
+        # error of the failed stage is raised as is, not wrapped into the group
+        raise error_group.exceptions[0]
+    return write_task.result()
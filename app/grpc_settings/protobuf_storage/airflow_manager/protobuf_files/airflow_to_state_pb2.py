@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
 # source: airflow_to_state.proto
+# Protobuf Python Version: 5.26.1
 """Generated protocol buffer code."""
-from google.protobuf.internal import builder as _builder
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import descriptor_pool as _descriptor_pool
 from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
 # @@protoc_insertion_point(imports)
 
 _sym_db = _symbol_database.Default()
@@ -14,21 +15,31 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import timestamp_pb2 as google_dot_protobuf_dot_timestamp__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16\x61irflow_to_state.proto\x12\x0cobject_state\x1a\x1fgoogle/protobuf/timestamp.proto\"\xa5\x01\n\x03KPI\x12\x0e\n\x06kpi_id\x18\x01 \x01(\x03\x12\x11\n\tobject_id\x18\x02 \x01(\x03\x12\x16\n\x0egranularity_id\x18\x03 \x01(\x03\x12\r\n\x05value\x18\x04 \x01(\t\x12/\n\x0brecord_time\x18\x05 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12#\n\x05state\x18\x06 \x01(\x0e\x32\x14.object_state.States\"9\n\x12RequestBatchImport\x12#\n\x08kpi_data\x18\x01 \x03(\x0b\x32\x11.object_state.KPI\"G\n\x13ResponseBatchImport\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x14\n\x07message\x18\x02 \x01(\tH\x00\x88\x01\x01\x42\n\n\x08_message*2\n\x06States\x12\x0b\n\x07\x63urrent\x10\x00\x12\x0e\n\nhistorical\x10\x01\x12\x0b\n\x07planned\x10\x02\x32o\n\x15\x41irflowToStateManager\x12V\n\x0b\x42\x61tchImport\x12 .object_state.RequestBatchImport\x1a!.object_state.ResponseBatchImport\"\x00(\x01\x62\x06proto3')
-
-_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
-_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'airflow_to_state_pb2', globals())
-if _descriptor._USE_C_DESCRIPTORS == False:
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16\x61irflow_to_state.proto\x12\x0cobject_state\x1a\x1fgoogle/protobuf/timestamp.proto\"\xa5\x01\n\x03KPI\x12\x0e\n\x06kpi_id\x18\x01 \x01(\x03\x12\x11\n\tobject_id\x18\x02 \x01(\x03\x12\x16\n\x0egranularity_id\x18\x03 \x01(\x03\x12\r\n\x05value\x18\x04 \x01(\t\x12/\n\x0brecord_time\x18\x05 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12#\n\x05state\x18\x06 \x01(\x0e\x32\x14.object_state.States\"\xa2\x01\n\x12RequestBatchImport\x12#\n\x08kpi_data\x18\x01 \x03(\x0b\x32\x11.object_state.KPI\x12\x15\n\x08\x62\x61tch_id\x18\x02 \x01(\tH\x00\x88\x01\x01\x12\x32\n\rconflict_mode\x18\x03 \x01(\x0e\x32\x1b.object_state.ConflictModes\x12\x0f\n\x07partial\x18\x04 \x01(\x08\x42\x0b\n\t_batch_id\"*\n\x0bRejectedRow\x12\x0b\n\x03row\x18\x01 \x01(\x03\x12\x0e\n\x06reason\x18\x02 \x01(\t\"r\n\x0b\x43hunkResult\x12\r\n\x05\x63hunk\x18\x01 \x01(\x03\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x02 \x01(\x03\x12\x10\n\x08rejected\x18\x03 \x01(\x03\x12\x30\n\rrejected_rows\x18\x04 \x03(\x0b\x32\x19.object_state.RejectedRow\"\xa6\x01\n\x13ResponseBatchImport\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x14\n\x07message\x18\x02 \x01(\tH\x00\x88\x01\x01\x12\x10\n\x08inserted\x18\x03 \x01(\x03\x12\x0f\n\x07updated\x18\x04 \x01(\x03\x12\x0f\n\x07skipped\x18\x05 \x01(\x03\x12)\n\x06\x63hunks\x18\x06 \x03(\x0b\x32\x19.object_state.ChunkResultB\n\n\x08_message\"\x9e\x02\n\x16RequestStreamKPIValues\x12\x0f\n\x07kpi_ids\x18\x01 \x03(\x03\x12\x12\n\nobject_ids\x18\x02 \x03(\x03\x12\x17\n\x0fgranularity_ids\x18\x03 \x03(\x03\x12\x32\n\tdate_from\x18\x04 \x01(\x0b\x32\x1a.google.protobuf.TimestampH\x00\x88\x01\x01\x12\x30\n\x07\x64\x61te_to\x18\x05 \x01(\x0b\x32\x1a.google.protobuf.TimestampH\x01\x88\x01\x01\x12(\n\x05state\x18\x06 \x01(\x0e\x32\x14.object_state.StatesH\x02\x88\x01\x01\x12\x12\n\nchunk_size\x18\x07 \x01(\x05\x42\x0c\n\n_date_fromB\n\n\x08_date_toB\x08\n\x06_state\"\xa0\x01\n\x0eKPIValuesChunk\x12\n\n\x02id\x18\x01 \x03(\x03\x12\x0e\n\x06kpi_id\x18\x02 \x03(\x03\x12\x11\n\tobject_id\x18\x03 \x03(\x03\x12\x16\n\x0egranularity_id\x18\x04 \x03(\x03\x12\r\n\x05value\x18\x05 \x03(\t\x12\x13\n\x0brecord_time\x18\x06 \x03(\x03\x12#\n\x05state\x18\x07 \x03(\x0e\x32\x14.object_state.States*2\n\x06States\x12\x0b\n\x07\x63urrent\x10\x00\x12\x0e\n\nhistorical\x10\x01\x12\x0b\n\x07planned\x10\x02*%\n\rConflictModes\x12\n\n\x06update\x10\x00\x12\x08\n\x04skip\x10\x01\x32\xca\x01\n\x15\x41irflowToStateManager\x12V\n\x0b\x42\x61tchImport\x12 .object_state.RequestBatchImport\x1a!.object_state.ResponseBatchImport\"\x00(\x01\x12Y\n\x0fStreamKPIValues\x12$.object_state.RequestStreamKPIValues\x1a\x1c.object_state.KPIValuesChunk\"\x00\x30\x01\x62\x06proto3')
 
-  DESCRIPTOR._options = None
-  _STATES._serialized_start=373
-  _STATES._serialized_end=423
-  _KPI._serialized_start=74
-  _KPI._serialized_end=239
-  _REQUESTBATCHIMPORT._serialized_start=241
-  _REQUESTBATCHIMPORT._serialized_end=298
-  _RESPONSEBATCHIMPORT._serialized_start=300
-  _RESPONSEBATCHIMPORT._serialized_end=371
-  _AIRFLOWTOSTATEMANAGER._serialized_start=425
-  _AIRFLOWTOSTATEMANAGER._serialized_end=536
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'airflow_to_state_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_STATES']._serialized_start=1187
+  _globals['_STATES']._serialized_end=1237
+  _globals['_CONFLICTMODES']._serialized_start=1239
+  _globals['_CONFLICTMODES']._serialized_end=1276
+  _globals['_KPI']._serialized_start=74
+  _globals['_KPI']._serialized_end=239
+  _globals['_REQUESTBATCHIMPORT']._serialized_start=242
+  _globals['_REQUESTBATCHIMPORT']._serialized_end=404
+  _globals['_REJECTEDROW']._serialized_start=406
+  _globals['_REJECTEDROW']._serialized_end=448
+  _globals['_CHUNKRESULT']._serialized_start=450
+  _globals['_CHUNKRESULT']._serialized_end=564
+  _globals['_RESPONSEBATCHIMPORT']._serialized_start=567
+  _globals['_RESPONSEBATCHIMPORT']._serialized_end=733
+  _globals['_REQUESTSTREAMKPIVALUES']._serialized_start=736
+  _globals['_REQUESTSTREAMKPIVALUES']._serialized_end=1022
+  _globals['_KPIVALUESCHUNK']._serialized_start=1025
+  _globals['_KPIVALUESCHUNK']._serialized_end=1185
+  _globals['_AIRFLOWTOSTATEMANAGER']._serialized_start=1279
+  _globals['_AIRFLOWTOSTATEMANAGER']._serialized_end=1481
 # @@protoc_insertion_point(module_scope)
@@ -6,39 +6,119 @@ from google.protobuf import message as _message
 from typing import ClassVar as _ClassVar, Iterable as _Iterable, Mapping as _Mapping, Optional as _Optional, Union as _Union
 
 DESCRIPTOR: _descriptor.FileDescriptor
+
+class States(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = ()
+    current: _ClassVar[States]
+    historical: _ClassVar[States]
+    planned: _ClassVar[States]
+
+class ConflictModes(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = ()
+    update: _ClassVar[ConflictModes]
+    skip: _ClassVar[ConflictModes]
 current: States
 historical: States
 planned: States
+update: ConflictModes
+skip: ConflictModes
 
 class KPI(_message.Message):
-    __slots__ = ["granularity_id", "kpi_id", "object_id", "record_time", "state", "value"]
-    GRANULARITY_ID_FIELD_NUMBER: _ClassVar[int]
+    __slots__ = ("kpi_id", "object_id", "granularity_id", "value", "record_time", "state")
     KPI_ID_FIELD_NUMBER: _ClassVar[int]
     OBJECT_ID_FIELD_NUMBER: _ClassVar[int]
+    GRANULARITY_ID_FIELD_NUMBER: _ClassVar[int]
+    VALUE_FIELD_NUMBER: _ClassVar[int]
     RECORD_TIME_FIELD_NUMBER: _ClassVar[int]
     STATE_FIELD_NUMBER: _ClassVar[int]
-    VALUE_FIELD_NUMBER: _ClassVar[int]
-    granularity_id: int
     kpi_id: int
     object_id: int
+    granularity_id: int
+    value: str
     record_time: _timestamp_pb2.Timestamp
     state: States
-    value: str
     def __init__(self, kpi_id: _Optional[int] = ..., object_id: _Optional[int] = ..., granularity_id: _Optional[int] = ..., value: _Optional[str] = ..., record_time: _Optional[_Union[_timestamp_pb2.Timestamp, _Mapping]] = ..., state: _Optional[_Union[States, str]] = ...) -> None: ...
 
 class RequestBatchImport(_message.Message):
-    __slots__ = ["kpi_data"]
+    __slots__ = ("kpi_data", "batch_id", "conflict_mode", "partial")
     KPI_DATA_FIELD_NUMBER: _ClassVar[int]
+    BATCH_ID_FIELD_NUMBER: _ClassVar[int]
+    CONFLICT_MODE_FIELD_NUMBER: _ClassVar[int]
+    PARTIAL_FIELD_NUMBER: _ClassVar[int]
     kpi_data: _containers.RepeatedCompositeFieldContainer[KPI]
-    def __init__(self, kpi_data: _Optional[_Iterable[_Union[KPI, _Mapping]]] = ...) -> None: ...
+    batch_id: str
+    conflict_mode: ConflictModes
+    partial: bool
+    def __init__(self, kpi_data: _Optional[_Iterable[_Union[KPI, _Mapping]]] = ..., batch_id: _Optional[str] = ..., conflict_mode: _Optional[_Union[ConflictModes, str]] = ..., partial: bool = ...) -> None: ...
+
+class RejectedRow(_message.Message):
+    __slots__ = ("row", "reason")
+    ROW_FIELD_NUMBER: _ClassVar[int]
+    REASON_FIELD_NUMBER: _ClassVar[int]
+    row: int
+    reason: str
+    def __init__(self, row: _Optional[int] = ..., reason: _Optional[str] = ...) -> None: ...
+
+class ChunkResult(_message.Message):
+    __slots__ = ("chunk", "accepted", "rejected", "rejected_rows")
+    CHUNK_FIELD_NUMBER: _ClassVar[int]
+    ACCEPTED_FIELD_NUMBER: _ClassVar[int]
+    REJECTED_FIELD_NUMBER: _ClassVar[int]
+    REJECTED_ROWS_FIELD_NUMBER: _ClassVar[int]
+    chunk: int
+    accepted: int
+    rejected: int
+    rejected_rows: _containers.RepeatedCompositeFieldContainer[RejectedRow]
+    def __init__(self, chunk: _Optional[int] = ..., accepted: _Optional[int] = ..., rejected: _Optional[int] = ..., rejected_rows: _Optional[_Iterable[_Union[RejectedRow, _Mapping]]] = ...) -> None: ...
 
 class ResponseBatchImport(_message.Message):
-    __slots__ = ["message", "status"]
-    MESSAGE_FIELD_NUMBER: _ClassVar[int]
+    __slots__ = ("status", "message", "inserted", "updated", "skipped", "chunks")
     STATUS_FIELD_NUMBER: _ClassVar[int]
-    message: str
+    MESSAGE_FIELD_NUMBER: _ClassVar[int]
+    INSERTED_FIELD_NUMBER: _ClassVar[int]
+    UPDATED_FIELD_NUMBER: _ClassVar[int]
+    SKIPPED_FIELD_NUMBER: _ClassVar[int]
+    CHUNKS_FIELD_NUMBER: _ClassVar[int]
     status: str
-    def __init__(self, status: _Optional[str] = ..., message: _Optional[str] = ...) -> None: ...
+    message: str
+    inserted: int
+    updated: int
+    skipped: int
+    chunks: _containers.RepeatedCompositeFieldContainer[ChunkResult]
+    def __init__(self, status: _Optional[str] = ..., message: _Optional[str] = ..., inserted: _Optional[int] = ..., updated: _Optional[int] = ..., skipped: _Optional[int] = ..., chunks: _Optional[_Iterable[_Union[ChunkResult, _Mapping]]] = ...) -> None: ...
 
-class States(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
-    __slots__ = []
+class RequestStreamKPIValues(_message.Message):
+    __slots__ = ("kpi_ids", "object_ids", "granularity_ids", "date_from", "date_to", "state", "chunk_size")
+    KPI_IDS_FIELD_NUMBER: _ClassVar[int]
+    OBJECT_IDS_FIELD_NUMBER: _ClassVar[int]
+    GRANULARITY_IDS_FIELD_NUMBER: _ClassVar[int]
+    DATE_FROM_FIELD_NUMBER: _ClassVar[int]
+    DATE_TO_FIELD_NUMBER: _ClassVar[int]
+    STATE_FIELD_NUMBER: _ClassVar[int]
+    CHUNK_SIZE_FIELD_NUMBER: _ClassVar[int]
+    kpi_ids: _containers.RepeatedScalarFieldContainer[int]
+    object_ids: _containers.RepeatedScalarFieldContainer[int]
+    granularity_ids: _containers.RepeatedScalarFieldContainer[int]
+    date_from: _timestamp_pb2.Timestamp
+    date_to: _timestamp_pb2.Timestamp
+    state: States
+    chunk_size: int
+    def __init__(self, kpi_ids: _Optional[_Iterable[int]] = ..., object_ids: _Optional[_Iterable[int]] = ..., granularity_ids: _Optional[_Iterable[int]] = ..., date_from: _Optional[_Union[_timestamp_pb2.Timestamp, _Mapping]] = ..., date_to: _Optional[_Union[_timestamp_pb2.Timestamp, _Mapping]] = ..., state: _Optional[_Union[States, str]] = ..., chunk_size: _Optional[int] = ...) -> None: ...
+
+class KPIValuesChunk(_message.Message):
+    __slots__ = ("id", "kpi_id", "object_id", "granularity_id", "value", "record_time", "state")
+    ID_FIELD_NUMBER: _ClassVar[int]
+    KPI_ID_FIELD_NUMBER: _ClassVar[int]
+    OBJECT_ID_FIELD_NUMBER: _ClassVar[int]
+    GRANULARITY_ID_FIELD_NUMBER: _ClassVar[int]
+    VALUE_FIELD_NUMBER: _ClassVar[int]
+    RECORD_TIME_FIELD_NUMBER: _ClassVar[int]
+    STATE_FIELD_NUMBER: _ClassVar[int]
+    id: _containers.RepeatedScalarFieldContainer[int]
+    kpi_id: _containers.RepeatedScalarFieldContainer[int]
+    object_id: _containers.RepeatedScalarFieldContainer[int]
+    granularity_id: _containers.RepeatedScalarFieldContainer[int]
+    value: _containers.RepeatedScalarFieldContainer[str]
+    record_time: _containers.RepeatedScalarFieldContainer[int]
+    state: _containers.RepeatedScalarFieldContainer[States]
+    def __init__(self, id: _Optional[_Iterable[int]] = ..., kpi_id: _Optional[_Iterable[int]] = ..., object_id: _Optional[_Iterable[int]] = ..., granularity_id: _Optional[_Iterable[int]] = ..., value: _Optional[_Iterable[str]] = ..., record_time: _Optional[_Iterable[int]] = ..., state: _Optional[_Iterable[_Union[States, str]]] = ...) -> None: ...
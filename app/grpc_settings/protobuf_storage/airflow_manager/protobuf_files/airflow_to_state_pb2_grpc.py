@@ -19,6 +19,11 @@ class AirflowToStateManagerStub(object):
                 request_serializer=airflow__to__state__pb2.RequestBatchImport.SerializeToString,
                 response_deserializer=airflow__to__state__pb2.ResponseBatchImport.FromString,
                 )
+        self.StreamKPIValues = channel.unary_stream(
+                '/object_state.AirflowToStateManager/StreamKPIValues',
+                request_serializer=airflow__to__state__pb2.RequestStreamKPIValues.SerializeToString,
+                response_deserializer=airflow__to__state__pb2.KPIValuesChunk.FromString,
+                )
 
 
 class AirflowToStateManagerServicer(object):
@@ -30,6 +35,12 @@ class AirflowToStateManagerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamKPIValues(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_AirflowToStateManagerServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -38,6 +49,11 @@ def add_AirflowToStateManagerServicer_to_server(servicer, server):
                     request_deserializer=airflow__to__state__pb2.RequestBatchImport.FromString,
                     response_serializer=airflow__to__state__pb2.ResponseBatchImport.SerializeToString,
             ),
+            'StreamKPIValues': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamKPIValues,
+                    request_deserializer=airflow__to__state__pb2.RequestStreamKPIValues.FromString,
+                    response_serializer=airflow__to__state__pb2.KPIValuesChunk.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'object_state.AirflowToStateManager', rpc_method_handlers)
@@ -64,3 +80,20 @@ class AirflowToStateManager(object):
             airflow__to__state__pb2.ResponseBatchImport.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def StreamKPIValues(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/object_state.AirflowToStateManager/StreamKPIValues',
+            airflow__to__state__pb2.RequestStreamKPIValues.SerializeToString,
+            airflow__to__state__pb2.KPIValuesChunk.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
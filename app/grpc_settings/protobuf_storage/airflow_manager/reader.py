@@ -0,0 +1,140 @@
+"""Bulk read of KPI values for StreamKPIValues.
+
+KPI values are read with server-side cursor in chunks of chunk_size rows, every chunk is sent
+as one columnar KPIValuesChunk message. Next chunk is fetched only after previous message is
+written to the stream, so slow client holds the cursor instead of filling server memory.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from sqlalchemy import BigInteger, Integer, Select, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from grpc_settings.protobuf_storage.airflow_manager.protobuf_files.airflow_to_state_pb2 import (
+    KPIValuesChunk,
+    RequestStreamKPIValues,
+)
+from grpc_settings.protobuf_storage.airflow_manager.utils import PROTO_STATES
+from services.kpi_value_services.export import stream_rows
+from v1.database.schemas import KPIValue
+from v1.settings.config import (
+    STREAM_KPI_VALUES_CHUNK_SIZE,
+    STREAM_KPI_VALUES_MAX_CHUNK_SIZE,
+)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+PROTO_STATES_BY_NAME = {state: number for number, state in PROTO_STATES.items()}
+# object_id column is int4, but object_ids of request are int64
+OBJECT_ID_MIN = -(2**31)
+OBJECT_ID_MAX = 2**31 - 1
+
+
+def validate_stream_kpi_values_request(req: RequestStreamKPIValues):
+    """Raises ValueError if request filters can't be compared with KPI values columns"""
+    invalid_object_ids = [
+        object_id
+        for object_id in req.object_ids
+        if not OBJECT_ID_MIN <= object_id <= OBJECT_ID_MAX
+    ]
+    if invalid_object_ids:
+        raise ValueError(
+            f"object_ids must be in range [{OBJECT_ID_MIN}, {OBJECT_ID_MAX}], "
+            f"invalid object_ids: {invalid_object_ids[:10]}"
+        )
+
+
+def get_stream_kpi_values_statement(req: RequestStreamKPIValues) -> Select:
+    """Returns select of KPI values by request filters, in order of natural key index.
+    Lists are passed as array parameters of ANY, so statement has the same parameters for any list size.
+    """
+    where_conditions = []
+    if req.kpi_ids:
+        where_conditions.append(
+            KPIValue.kpi_id
+            == any_(
+                bindparam("kpi_ids", list(req.kpi_ids), type_=ARRAY(BigInteger))
+            )
+        )
+    if req.object_ids:
+        where_conditions.append(
+            KPIValue.object_id
+            == any_(
+                bindparam(
+                    "object_ids", list(req.object_ids), type_=ARRAY(Integer)
+                )
+            )
+        )
+    if req.granularity_ids:
+        where_conditions.append(
+            KPIValue.granularity_id
+            == any_(
+                bindparam(
+                    "granularity_ids",
+                    list(req.granularity_ids),
+                    type_=ARRAY(BigInteger),
+                )
+            )
+        )
+    if req.HasField("date_from"):
+        where_conditions.append(
+            KPIValue.record_time >= req.date_from.ToDatetime(timezone.utc)
+        )
+    if req.HasField("date_to"):
+        where_conditions.append(
+            KPIValue.record_time <= req.date_to.ToDatetime(timezone.utc)
+        )
+    if req.HasField("state"):
+        where_conditions.append(KPIValue.state == PROTO_STATES[req.state])
+
+    return (
+        select(
+            KPIValue.id,
+            KPIValue.kpi_id,
+            KPIValue.object_id,
+            KPIValue.granularity_id,
+            KPIValue.value,
+            KPIValue.record_time,
+            KPIValue.state,
+        )
+        .where(*where_conditions)
+        .order_by(
+            KPIValue.kpi_id,
+            KPIValue.granularity_id,
+            KPIValue.object_id,
+            KPIValue.record_time.desc(),
+        )
+    )
+
+
+def get_chunk_size(req: RequestStreamKPIValues) -> int:
+    if req.chunk_size <= 0:
+        return STREAM_KPI_VALUES_CHUNK_SIZE
+    return min(req.chunk_size, STREAM_KPI_VALUES_MAX_CHUNK_SIZE)
+
+
+def get_kpi_values_chunk(rows) -> KPIValuesChunk:
+    """Converts rows of get_stream_kpi_values_statement into columnar message"""
+    ids, kpi_ids, object_ids, granularity_ids, values, record_times, states = (
+        zip(*rows)
+    )
+    return KPIValuesChunk(
+        id=ids,
+        kpi_id=kpi_ids,
+        object_id=object_ids,
+        granularity_id=granularity_ids,
+        value=values,
+        record_time=[
+            (record_time - EPOCH) // timedelta(microseconds=1)
+            for record_time in record_times
+        ],
+        state=[PROTO_STATES_BY_NAME[state] for state in states],
+    )
+
+
+async def stream_kpi_values_chunks(
+    req: RequestStreamKPIValues,
+) -> AsyncIterator[KPIValuesChunk]:
+    stmt = get_stream_kpi_values_statement(req)
+    async for rows in stream_rows(stmt, chunk_size=get_chunk_size(req)):
+        yield get_kpi_values_chunk(rows)
@@ -1,19 +1,60 @@
-import datetime
+import logging
 from typing import AsyncIterator
 
 import grpc
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 
+from exception_manager.manager import BatchImportValidationError
+from grpc_settings.protobuf_storage.airflow_manager.pipeline import (
+    BatchImportResult,
+    run_batch_import_pipeline,
+)
 from grpc_settings.protobuf_storage.airflow_manager.protobuf_files.airflow_to_state_pb2 import (
+    ChunkResult,
+    KPIValuesChunk,
+    RejectedRow,
     RequestBatchImport,
+    RequestStreamKPIValues,
     ResponseBatchImport,
 )
 from grpc_settings.protobuf_storage.airflow_manager.protobuf_files.airflow_to_state_pb2_grpc import (
     AirflowToStateManagerServicer,
 )
+from grpc_settings.protobuf_storage.airflow_manager.reader import (
+    stream_kpi_values_chunks,
+    validate_stream_kpi_values_request,
+)
 from v1.database.database import get_session
-from v1.database.schemas import KPI, KPIValue
-from v1.utils.val_type_validators import get_value_validate_funct_for_kpi
+
+
+def get_batch_import_response(result: BatchImportResult) -> ResponseBatchImport:
+    response = ResponseBatchImport(
+        status="OK",
+        inserted=result.counts.inserted,
+        updated=result.counts.updated,
+        skipped=result.counts.skipped,
+    )
+    if result.already_imported:
+        response.message = "Batch was already imported"
+
+    for chunk_result in result.chunks:
+        counts = chunk_result.counts
+        response.chunks.append(
+            ChunkResult(
+                chunk=chunk_result.chunk,
+                accepted=counts.inserted + counts.updated + counts.skipped,
+                rejected=len(chunk_result.rejected_rows),
+                rejected_rows=[
+                    RejectedRow(row=row, reason=reason)
+                    for row, reason in sorted(
+                        chunk_result.rejected_rows.items()
+                    )
+                ],
+            )
+        )
+        if chunk_result.rejected_rows:
+            response.status = "PARTIAL"
+    return response
 
 
 class AirflowManager(AirflowToStateManagerServicer):
@@ -23,81 +64,42 @@ class AirflowManager(AirflowToStateManagerServicer):
         context: grpc.ServicerContext,
     ) -> ResponseBatchImport:
         # MAIN PROCESS
-        async for session in get_session():
-            async for req in request_iterator:
-                # firstly we get all requested kpi, to check if kpi already exists
-                # because if kpi is not exists it`s useless to validate future data
-                # we store them in list, not in set, because it future we will use them
-                # and if we store them in set we will lose sequence
-                requested_kpi_ids = set()
-                for kpi_item in req.kpi_data:
-                    requested_kpi_ids.add(kpi_item.kpi_id)
-
-                # get existed kpi_ids
-                stmt = select(KPI.id).where(KPI.id.in_(requested_kpi_ids))
-                exists_kpi_ids = await session.execute(stmt)
-                exists_kpi_ids = exists_kpi_ids.scalars().all()
-
-                # get difference between exists kpis and requested
-                kpi_which_not_exist = requested_kpi_ids.difference(
-                    set(exists_kpi_ids)
-                )
-                if kpi_which_not_exist:
+        # validation reads KPIs with its own session, because write session is busy with COPY
+        async for write_session in get_session():
+            async for read_session in get_session():
+                try:
+                    result = await run_batch_import_pipeline(
+                        request_iterator=request_iterator,
+                        read_session=read_session,
+                        write_session=write_session,
+                    )
+                except BatchImportValidationError as message_error:
                     return ResponseBatchImport(
-                        status="ERROR",
-                        message=f"There are kpis, which "
-                        f"don't exist: {kpi_which_not_exist}",
+                        status="ERROR", message=str(message_error)
                     )
-                # after we make main validation -- kpi_id existing check
-                # we need to validate status firstly, because if status wrong -- we can't validate value by val_type
-                # which is harder operation
-
-                # but as base for value validation -- we need to collect info about him: val_type and multiple attrs.
-                stmt = select(KPI.id, KPI.val_type, KPI.multiple).where(
-                    KPI.id.in_(requested_kpi_ids)
+                except Exception as error:
+                    logging.exception("BatchImport failed")
+                    await context.abort(
+                        grpc.StatusCode.INTERNAL,
+                        f"Batch import failed: {error}",
+                    )
+            try:
+                await write_session.commit()
+            except IntegrityError:
+                # the same batch_id is imported by another stream at the same time
+                return ResponseBatchImport(
+                    status="ERROR", message="Batch is already being imported"
                 )
-                response = await session.execute(stmt)
-                response = response.fetchall()
-
-                # structure like {1: [str, True]}
-                kpis_and_val_types = {
-                    res[0]: [res[1], res[2]] for res in response
-                }
+        return get_batch_import_response(result)
 
-                for kpi_item in req.kpi_data:
-                    # value validation by val_type and multiple attrs
-                    try:
-                        val_type_validation_func = (
-                            get_value_validate_funct_for_kpi(
-                                kpi_val_type=kpis_and_val_types.get(
-                                    kpi_item.kpi_id
-                                )[0],
-                                kpi_multiple=kpis_and_val_types.get(
-                                    kpi_item.kpi_id
-                                )[1],
-                            )
-                        )
-                        val_type_validation_func(kpi_item.value)
-                    except ValueError as message_error:
-                        message_error = str(message_error)
-                        return ResponseBatchImport(
-                            status="ERROR",
-                            message=message_error
-                            + f"For kpi_id = {kpi_item.kpi_id}.",
-                        )
-
-                    states = {0: "current", 1: "historical", 2: "planned"}
-                    kpi = KPIValue(
-                        kpi_id=kpi_item.kpi_id,
-                        granularity_id=kpi_item.granularity_id,
-                        object_id=kpi_item.object_id,
-                        value=kpi_item.value,
-                        record_time=datetime.datetime.fromtimestamp(
-                            kpi_item.record_time.seconds
-                        ),
-                        state=states[kpi_item.state],
-                    )
-                    session.add(kpi)
-                await session.flush()
-            await session.commit()
-        return ResponseBatchImport(status="OK")
+    async def StreamKPIValues(
+        self,
+        request: RequestStreamKPIValues,
+        context: grpc.ServicerContext,
+    ) -> AsyncIterator[KPIValuesChunk]:
+        try:
+            validate_stream_kpi_values_request(request)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        async for chunk in stream_kpi_values_chunks(request):
+            yield chunk
@@ -0,0 +1,103 @@
+import datetime
+
+from grpc_settings.protobuf_storage.airflow_manager.protobuf_files.airflow_to_state_pb2 import (
+    RequestBatchImport,
+)
+from services.kpi_services.cache import KPIMetadata
+from services.kpi_value_services.copy_writer import KPIValueColumnBuffer
+from v1.utils.val_type_validators import get_value_validate_funct_for_kpi
+
+PROTO_STATES = {0: "current", 1: "historical", 2: "planned"}
+PROTO_CONFLICT_MODES = {0: "update", 1: "skip"}
+
+
+class BatchImportOptions:
+    """Options of BatchImport stream, which are read from its first message"""
+
+    def __init__(self):
+        self.batch_id: str | None = None
+        self.conflict_mode: str = PROTO_CONFLICT_MODES[0]
+        self.partial: bool = False
+
+    def read_from_request(self, req: RequestBatchImport):
+        if req.HasField("batch_id"):
+            self.batch_id = req.batch_id
+        self.conflict_mode = PROTO_CONFLICT_MODES[req.conflict_mode]
+        self.partial = req.partial
+
+    def get_chunk_batch_id(self, chunk: int) -> str | None:
+        """In partial mode every message is imported once"""
+        if self.batch_id is None:
+            return None
+        return f"{self.batch_id}/{chunk}"
+
+
+def decode_batch_import_request(
+    req: RequestBatchImport,
+) -> KPIValueColumnBuffer:
+    """Converts protobuf KPI messages into columnar buffer"""
+    buffer = KPIValueColumnBuffer()
+    for kpi_item in req.kpi_data:
+        buffer.append(
+            kpi_id=kpi_item.kpi_id,
+            object_id=kpi_item.object_id,
+            granularity_id=kpi_item.granularity_id,
+            value=kpi_item.value,
+            record_time=datetime.datetime.fromtimestamp(
+                kpi_item.record_time.seconds
+            ),
+            state=PROTO_STATES[kpi_item.state],
+        )
+    return buffer
+
+
+def validate_kpi_values_buffer(
+    buffer: KPIValueColumnBuffer, kpis_and_val_types: dict
+):
+    """Validates buffer values by val_type and multiple attrs of their KPIs, otherwise raises ValueError.
+    kpis_and_val_types has structure like {1: [str, True]}
+    """
+    # validators are the same for all values of one kpi, so we don't need to get them for every value
+    validators = {
+        kpi_id: get_value_validate_funct_for_kpi(
+            kpi_val_type=val_type, kpi_multiple=multiple
+        )
+        for kpi_id, (val_type, multiple) in kpis_and_val_types.items()
+    }
+
+    for kpi_id, value in zip(buffer.kpi_id, buffer.value):
+        try:
+            validators[kpi_id](value)
+        except ValueError as message_error:
+            raise ValueError(f"{message_error}For kpi_id = {kpi_id}.")
+
+
+def get_rejected_rows(
+    buffer: KPIValueColumnBuffer, kpis_metadata: dict[int, KPIMetadata]
+) -> dict[int, str]:
+    """Returns reasons of invalid rows of buffer by row index"""
+    validators = {
+        kpi_id: get_value_validate_funct_for_kpi(
+            kpi_val_type=metadata.val_type, kpi_multiple=metadata.multiple
+        )
+        for kpi_id, metadata in kpis_metadata.items()
+    }
+
+    rejected_rows = {}
+    rows = zip(buffer.kpi_id, buffer.granularity_id, buffer.value)
+    for row, (kpi_id, granularity_id, value) in enumerate(rows):
+        metadata = kpis_metadata.get(kpi_id)
+        if metadata is None:
+            rejected_rows[row] = f"KPI with id = {kpi_id} doesn't exist."
+            continue
+        if granularity_id not in metadata.granularity_ids:
+            rejected_rows[row] = (
+                f"KPI with id = {kpi_id} has no "
+                f"Granularity with id = {granularity_id}."
+            )
+            continue
+        try:
+            validators[kpi_id](value)
+        except ValueError as message_error:
+            rejected_rows[row] = f"{message_error}For kpi_id = {kpi_id}."
+    return rejected_rows
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -5,14 +6,40 @@ from starlette.middleware.cors import CORSMiddleware
 
 from common_settings.config import TITLE, PREFIX
 from init_app import create_app
+from services.batch_job_services.service import run_batch_jobs_worker
+from services.kpi_services.cache import listen_kpi_metadata_invalidations
+from services.kpi_value_services.retention import run_kpi_values_compaction
+from services.partition_services.service import (
+    maintain_kpi_values_partitions,
+    run_kpi_values_partition_maintenance,
+)
 from v1.database.database import init_tables
 from v1.main import app as app_v1
+from v1.settings.config import (
+    BATCH_JOBS_WORKERS,
+    KPI_METADATA_CACHE_SYNC_ENABLED,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_tables()
+    await maintain_kpi_values_partitions()
+    background_tasks = [
+        asyncio.create_task(run_kpi_values_partition_maintenance()),
+        asyncio.create_task(run_kpi_values_compaction()),
+    ]
+    background_tasks.extend(
+        asyncio.create_task(run_batch_jobs_worker())
+        for _ in range(BATCH_JOBS_WORKERS)
+    )
+    if KPI_METADATA_CACHE_SYNC_ENABLED:
+        background_tasks.append(
+            asyncio.create_task(listen_kpi_metadata_invalidations())
+        )
     yield
+    for task in background_tasks:
+        task.cancel()
 
 
 app = create_app(root_path=PREFIX, title=TITLE, lifespan=lifespan)
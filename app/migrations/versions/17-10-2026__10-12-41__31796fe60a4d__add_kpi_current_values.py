@@ -0,0 +1,48 @@
+"""Add kpi current values
+
+Revision ID: 31796fe60a4d
+Revises: 3ed206a37e48
+Create Date: 2026-10-17 10:12:41.215037+03:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '31796fe60a4d'
+down_revision = '3ed206a37e48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('kpi_current_values',
+    sa.Column('object_id', sa.Integer(), nullable=False),
+    sa.Column('kpi_id', sa.BigInteger(), nullable=False),
+    sa.Column('granularity_id', sa.BigInteger(), nullable=False),
+    sa.Column('kpi_value_id', sa.BigInteger(), nullable=False),
+    sa.Column('value', sa.String(), nullable=False),
+    sa.Column('record_time', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['granularity_id'], ['granularity.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['kpi_id'], ['kpi.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('object_id', 'kpi_id', 'granularity_id')
+    )
+    op.create_index(op.f('ix_kpi_current_values_kpi_id'), 'kpi_current_values', ['kpi_id'], unique=False)
+
+    # fill table with the latest current value of every object, kpi and granularity
+    op.execute(
+        """
+        INSERT INTO kpi_current_values (object_id, kpi_id, granularity_id, kpi_value_id, value, record_time)
+        SELECT DISTINCT ON (object_id, kpi_id, granularity_id)
+            object_id, kpi_id, granularity_id, id, value, record_time
+        FROM kpi_values
+        WHERE state = 'current'
+        ORDER BY object_id, kpi_id, granularity_id, record_time DESC, id DESC
+        """
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_kpi_current_values_kpi_id'), table_name='kpi_current_values')
+    op.drop_table('kpi_current_values')
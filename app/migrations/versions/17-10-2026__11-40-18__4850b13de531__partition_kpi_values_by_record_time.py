@@ -0,0 +1,131 @@
+"""Partition kpi values by record time
+
+Revision ID: 4850b13de531
+Revises: 31796fe60a4d
+Create Date: 2026-10-17 11:40:18.604113+03:00
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4850b13de531'
+down_revision = '31796fe60a4d'
+branch_labels = None
+depends_on = None
+
+PARTITIONS_AHEAD_MONTHS = 3
+KPI_VALUES_COLUMNS = 'id, kpi_id, granularity_id, object_id, value, record_time, state'
+KPI_VALUES_INDEXES = ('granularity_id', 'kpi_id', 'object_id', 'record_time', 'state')
+
+
+def add_months(month_start, months):
+    month_index = month_start.month - 1 + months
+    return month_start.replace(year=month_start.year + month_index // 12, month=month_index % 12 + 1)
+
+
+def create_month_partition(month_start):
+    partition_name = f'kpi_values_y{month_start.year}m{month_start.month:02d}'
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS {partition_name} PARTITION OF kpi_values "
+        f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{add_months(month_start, 1).isoformat()}')"
+    )
+
+
+def rename_indexes(table_name, new_table_name):
+    op.execute(f'ALTER INDEX {table_name}_pkey RENAME TO {new_table_name}_pkey')
+    for column in KPI_VALUES_INDEXES:
+        op.execute(f'ALTER INDEX ix_{table_name}_{column} RENAME TO ix_{new_table_name}_{column}')
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    # keep old table until data is copied, sequence of ids is reused by the new table
+    op.execute('ALTER TABLE kpi_values RENAME TO kpi_values_unpartitioned')
+    rename_indexes('kpi_values', 'kpi_values_unpartitioned')
+    op.execute('ALTER SEQUENCE kpi_values_id_seq OWNED BY NONE')
+
+    # record_time is partition key and part of primary key, so it can't be null.
+    # Null record_time was the latest one in state calculation, so it is replaced by now()
+    op.execute(
+        """
+        CREATE TABLE kpi_values (
+            id BIGINT NOT NULL DEFAULT nextval('kpi_values_id_seq'),
+            kpi_id BIGINT NOT NULL,
+            granularity_id BIGINT NOT NULL,
+            object_id INTEGER NOT NULL,
+            value VARCHAR NOT NULL,
+            record_time TIMESTAMP WITH TIME ZONE NOT NULL,
+            state VARCHAR NOT NULL,
+            PRIMARY KEY (id, record_time),
+            FOREIGN KEY(kpi_id) REFERENCES kpi (id) ON DELETE CASCADE,
+            FOREIGN KEY(granularity_id) REFERENCES granularity (id) ON DELETE CASCADE
+        ) PARTITION BY RANGE (record_time)
+        """
+    )
+    op.execute('ALTER SEQUENCE kpi_values_id_seq OWNED BY kpi_values.id')
+    op.execute('CREATE TABLE kpi_values_default PARTITION OF kpi_values DEFAULT')
+
+    months = conn.execute(
+        sa.text(
+            "SELECT DISTINCT date_trunc('month', record_time AT TIME ZONE 'UTC') "
+            "FROM kpi_values_unpartitioned WHERE record_time IS NOT NULL"
+        )
+    ).scalars().all()
+    current_month_start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_starts = {month.replace(tzinfo=timezone.utc) for month in months}
+    month_starts.update(add_months(current_month_start, i) for i in range(PARTITIONS_AHEAD_MONTHS + 1))
+    for month_start in sorted(month_starts):
+        create_month_partition(month_start)
+
+    op.execute(
+        f"""
+        INSERT INTO kpi_values ({KPI_VALUES_COLUMNS})
+        SELECT id, kpi_id, granularity_id, object_id, value, COALESCE(record_time, now()), state
+        FROM kpi_values_unpartitioned
+        """
+    )
+    op.drop_table('kpi_values_unpartitioned')
+
+    for column in KPI_VALUES_INDEXES:
+        op.create_index(op.f(f'ix_kpi_values_{column}'), 'kpi_values', [column], unique=False)
+
+
+def downgrade():
+    op.execute('ALTER TABLE kpi_values RENAME TO kpi_values_partitioned')
+    op.execute('ALTER INDEX kpi_values_pkey RENAME TO kpi_values_partitioned_pkey')
+    for column in KPI_VALUES_INDEXES:
+        op.drop_index(op.f(f'ix_kpi_values_{column}'), table_name='kpi_values_partitioned')
+    op.execute('ALTER SEQUENCE kpi_values_id_seq OWNED BY NONE')
+
+    op.execute(
+        """
+        CREATE TABLE kpi_values (
+            id BIGINT NOT NULL DEFAULT nextval('kpi_values_id_seq'),
+            kpi_id BIGINT NOT NULL,
+            granularity_id BIGINT NOT NULL,
+            object_id INTEGER NOT NULL,
+            value VARCHAR NOT NULL,
+            record_time TIMESTAMP WITH TIME ZONE,
+            state VARCHAR NOT NULL,
+            CONSTRAINT kpi_values_pkey PRIMARY KEY (id),
+            FOREIGN KEY(kpi_id) REFERENCES kpi (id) ON DELETE CASCADE,
+            FOREIGN KEY(granularity_id) REFERENCES granularity (id) ON DELETE CASCADE
+        )
+        """
+    )
+    op.execute('ALTER SEQUENCE kpi_values_id_seq OWNED BY kpi_values.id')
+    op.execute(
+        f"""
+        INSERT INTO kpi_values ({KPI_VALUES_COLUMNS})
+        SELECT {KPI_VALUES_COLUMNS} FROM kpi_values_partitioned
+        """
+    )
+    op.drop_table('kpi_values_partitioned')
+
+    for column in KPI_VALUES_INDEXES:
+        op.create_index(op.f(f'ix_kpi_values_{column}'), 'kpi_values', [column], unique=False)
@@ -0,0 +1,39 @@
+"""Add kpi values composite indexes
+
+Revision ID: c0a85f3e6d14
+Revises: 9b1e4c7d2a60
+Create Date: 2026-10-17 13:02:51.907264+03:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c0a85f3e6d14'
+down_revision = '9b1e4c7d2a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # kpi_id index is a prefix of the composite index
+    op.drop_index('ix_kpi_values_kpi_id', table_name='kpi_values')
+    op.create_index(
+        'ix_kpi_values_kpi_id_granularity_id_object_id_record_time', 'kpi_values',
+        ['kpi_id', 'granularity_id', 'object_id', sa.text('record_time DESC')],
+        unique=False, postgresql_include=['value']
+    )
+    # unique index of partitioned table must contain record_time, so one current value
+    # per object, kpi and granularity is kept by kpi_current_values
+    op.create_index(
+        'ix_kpi_values_current_kpi_id_object_id_granularity_id', 'kpi_values',
+        ['kpi_id', 'object_id', 'granularity_id', sa.text('record_time DESC'), sa.text('id DESC')],
+        unique=False, postgresql_where=sa.text("state = 'current'")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_kpi_values_current_kpi_id_object_id_granularity_id', table_name='kpi_values')
+    op.drop_index('ix_kpi_values_kpi_id_granularity_id_object_id_record_time', table_name='kpi_values')
+    op.create_index('ix_kpi_values_kpi_id', 'kpi_values', ['kpi_id'], unique=False)
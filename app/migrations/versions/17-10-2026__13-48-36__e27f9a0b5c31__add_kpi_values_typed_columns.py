@@ -0,0 +1,109 @@
+"""Add kpi values typed columns
+
+Revision ID: e27f9a0b5c31
+Revises: c0a85f3e6d14
+Create Date: 2026-10-17 13:48:36.120448+03:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e27f9a0b5c31'
+down_revision = 'c0a85f3e6d14'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 100000
+
+# casts are the same as v1.utils.val_type_columns converters. Values, which can't be converted
+# safely, are left NULL: regular expressions guard casts, so backfill never fails on stored value
+NUMERIC_PATTERN = r'^\s*[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d{1,4})?\s*$'
+NAIVE_DATETIME_PATTERN = r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$'
+AWARE_DATETIME_PATTERN = r'^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}(:?\d{2})?)$'
+# multiple value is python list repr of strings without escapes, numbers, bools and None
+JSON_ITEM_PATTERN = r"'([^'\\]*)'|" r'"([^"\\]*)"|' r'(True|False|None|[+-]?\d+(\.\d+)?([eE][+-]?\d{1,4})?)'
+JSON_LIST_PATTERN = rf'^\[\s*(({JSON_ITEM_PATTERN})(\s*,\s*({JSON_ITEM_PATTERN}))*)?\s*\]$'
+
+CAST_PATTERNS = dict(
+    numeric_pattern=NUMERIC_PATTERN,
+    naive_datetime_pattern=NAIVE_DATETIME_PATTERN,
+    aware_datetime_pattern=AWARE_DATETIME_PATTERN,
+    json_item_pattern=JSON_ITEM_PATTERN,
+    json_list_pattern=JSON_LIST_PATTERN,
+)
+
+TYPED_COLUMN_BACKFILLS = (
+    (
+        'value_numeric',
+        "NOT kpi.multiple AND kpi.val_type IN ('int', 'float')",
+        'CASE WHEN kpi_values.value ~ :numeric_pattern THEN kpi_values.value::numeric END',
+    ),
+    (
+        'value_bool',
+        "NOT kpi.multiple AND kpi.val_type = 'bool'",
+        "CASE kpi_values.value WHEN 'True' THEN true WHEN 'False' THEN false END",
+    ),
+    (
+        'value_datetime',
+        "NOT kpi.multiple AND kpi.val_type IN ('date', 'datetime')",
+        # naive values are considered as UTC
+        """CASE
+            WHEN kpi_values.value ~ :aware_datetime_pattern THEN kpi_values.value::timestamptz
+            WHEN kpi_values.value ~ :naive_datetime_pattern THEN kpi_values.value::timestamp AT TIME ZONE 'UTC'
+        END""",
+    ),
+    (
+        'value_json',
+        'kpi.multiple',
+        """CASE WHEN kpi_values.value ~ :json_list_pattern THEN (
+            SELECT coalesce(jsonb_agg(
+                CASE
+                    WHEN item[1] IS NOT NULL THEN to_jsonb(item[1])
+                    WHEN item[2] IS NOT NULL THEN to_jsonb(item[2])
+                    WHEN item[3] IN ('True', 'False') THEN to_jsonb(item[3] = 'True')
+                    WHEN item[3] = 'None' THEN 'null'::jsonb
+                    ELSE to_jsonb(item[3]::numeric)
+                END ORDER BY position
+            ), '[]'::jsonb)
+            FROM regexp_matches(kpi_values.value, :json_item_pattern, 'g') WITH ORDINALITY AS items(item, position)
+        ) END""",
+    ),
+)
+
+
+def backfill_typed_columns():
+    conn = op.get_bind()
+    min_id, max_id = conn.execute(sa.text('SELECT min(id), max(id) FROM kpi_values')).one()
+    if min_id is None:
+        return
+
+    # every batch of ids is committed separately, so backfill doesn't hold locks of the whole table
+    with op.get_context().autocommit_block():
+        for column_name, kpi_condition, cast_expression in TYPED_COLUMN_BACKFILLS:
+            update_batch = sa.text(
+                f'UPDATE kpi_values SET {column_name} = {cast_expression} '
+                f'FROM kpi WHERE kpi.id = kpi_values.kpi_id AND {kpi_condition} '
+                'AND kpi_values.id >= :start_id AND kpi_values.id < :end_id'
+            )
+            for start_id in range(min_id, max_id + 1, BACKFILL_BATCH_SIZE):
+                conn.execute(
+                    update_batch, dict(start_id=start_id, end_id=start_id + BACKFILL_BATCH_SIZE, **CAST_PATTERNS)
+                )
+
+
+def upgrade():
+    op.add_column('kpi_values', sa.Column('value_numeric', sa.Numeric(), nullable=True))
+    op.add_column('kpi_values', sa.Column('value_bool', sa.Boolean(), nullable=True))
+    op.add_column('kpi_values', sa.Column('value_datetime', sa.TIMESTAMP(timezone=True), nullable=True))
+    op.add_column('kpi_values', sa.Column('value_json', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    backfill_typed_columns()
+
+
+def downgrade():
+    op.drop_column('kpi_values', 'value_json')
+    op.drop_column('kpi_values', 'value_datetime')
+    op.drop_column('kpi_values', 'value_bool')
+    op.drop_column('kpi_values', 'value_numeric')
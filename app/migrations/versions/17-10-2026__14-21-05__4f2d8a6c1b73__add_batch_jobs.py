@@ -0,0 +1,43 @@
+"""Add batch jobs
+
+Revision ID: 4f2d8a6c1b73
+Revises: e27f9a0b5c31
+Create Date: 2026-10-17 14:21:05.318240+03:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4f2d8a6c1b73'
+down_revision = 'e27f9a0b5c31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'batch_jobs',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('job_type', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('stage', sa.String(), nullable=True),
+        sa.Column('params', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('processed_rows', sa.BigInteger(), nullable=False),
+        sa.Column('total_rows', sa.BigInteger(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('started_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('heartbeat_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_batch_jobs_status', 'batch_jobs', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_batch_jobs_status', table_name='batch_jobs')
+    op.drop_table('batch_jobs')
@@ -0,0 +1,85 @@
+"""Add kpi values natural key
+
+Revision ID: b8e3f15a2c90
+Revises: 4f2d8a6c1b73
+Create Date: 2026-10-17 15:07:42.541903+03:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e3f15a2c90'
+down_revision = '4f2d8a6c1b73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # one KPI value per natural key is kept: current one, otherwise the last saved one.
+    # Planned values are kept apart from actual values of the same record_time
+    op.execute(
+        """
+        DELETE FROM kpi_values
+        USING (
+            SELECT id, record_time
+            FROM (
+                SELECT id, record_time, row_number() OVER (
+                    PARTITION BY kpi_id, object_id, granularity_id, record_time, state = 'planned'
+                    ORDER BY state = 'current' DESC, id DESC
+                ) AS row_number
+                FROM kpi_values
+            ) AS ranked
+            WHERE row_number > 1
+        ) AS duplicates
+        WHERE kpi_values.id = duplicates.id AND kpi_values.record_time = duplicates.record_time
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM kpi_current_values
+        WHERE NOT EXISTS (SELECT 1 FROM kpi_values WHERE kpi_values.id = kpi_current_values.kpi_value_id)
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO kpi_current_values (object_id, kpi_id, granularity_id, kpi_value_id, value, record_time)
+        SELECT DISTINCT ON (object_id, kpi_id, granularity_id)
+            object_id, kpi_id, granularity_id, id, value, record_time
+        FROM kpi_values
+        WHERE state = 'current'
+        ORDER BY object_id, kpi_id, granularity_id, record_time DESC, id DESC
+        ON CONFLICT (object_id, kpi_id, granularity_id) DO NOTHING
+        """
+    )
+
+    op.drop_index('ix_kpi_values_kpi_id_granularity_id_object_id_record_time', table_name='kpi_values')
+    op.create_index(
+        'uq_kpi_values_kpi_id_granularity_id_object_id_record_time', 'kpi_values',
+        ['kpi_id', 'granularity_id', 'object_id', sa.text('record_time DESC'), sa.text("(state = 'planned')")],
+        unique=True, postgresql_include=['value']
+    )
+
+    op.create_table(
+        'kpi_value_import_batches',
+        sa.Column('batch_id', sa.String(), nullable=False),
+        sa.Column('inserted', sa.BigInteger(), nullable=False),
+        sa.Column('updated', sa.BigInteger(), nullable=False),
+        sa.Column('skipped', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('batch_id')
+    )
+    op.add_column('batch_jobs', sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade():
+    op.drop_column('batch_jobs', 'result')
+    op.drop_table('kpi_value_import_batches')
+    op.drop_index('uq_kpi_values_kpi_id_granularity_id_object_id_record_time', table_name='kpi_values')
+    op.create_index(
+        'ix_kpi_values_kpi_id_granularity_id_object_id_record_time', 'kpi_values',
+        ['kpi_id', 'granularity_id', 'object_id', sa.text('record_time DESC')],
+        unique=False, postgresql_include=['value']
+    )
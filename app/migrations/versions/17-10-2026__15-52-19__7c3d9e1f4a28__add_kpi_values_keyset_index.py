@@ -0,0 +1,27 @@
+"""Add kpi values keyset index
+
+Revision ID: 7c3d9e1f4a28
+Revises: b8e3f15a2c90
+Create Date: 2026-10-17 15:52:19.418305+03:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3d9e1f4a28'
+down_revision = 'b8e3f15a2c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pages of KPI values of KPI are read by (record_time, id) without sorting all values of KPI
+    op.create_index(
+        'ix_kpi_values_kpi_id_record_time_id', 'kpi_values',
+        ['kpi_id', 'record_time', 'id'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_kpi_values_kpi_id_record_time_id', table_name='kpi_values')
@@ -0,0 +1,293 @@
+"""Durable queue of batch jobs.
+
+Jobs are stored in batch_jobs table. Every API worker runs BATCH_JOBS_WORKERS workers, which claim
+pending jobs with SELECT ... FOR UPDATE SKIP LOCKED, so every job is executed by one worker only.
+Running job updates heartbeat_at, job without heartbeat for BATCH_JOBS_STALE_TIMEOUT seconds is considered
+abandoned and is claimed again, until it has BATCH_JOBS_MAX_ATTEMPTS attempts.
+Failed job is retried after BATCH_JOBS_RETRY_DELAY, doubled after every attempt. Job with invalid file
+fails at once, because every attempt fails the same way.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.kpi_value_services.copy_writer import (
+    add_imported_batch,
+    get_imported_batch_counts,
+)
+from services.kpi_value_services.current_state import get_max_kpi_value_id
+from services.kpi_value_services.file_import import write_csv_file
+from v1.database.database import session_maker
+from v1.database.schemas import BatchJob
+from v1.models.batch_jobs import BatchJobStages, BatchJobStatuses, BatchJobTypes
+from v1.models.kpi_values import KPIValuesConflictModes
+from v1.routers.batch.utils import update_state_for_all_objects
+from v1.settings.config import (
+    BATCH_JOBS_MAX_ATTEMPTS,
+    BATCH_JOBS_POLL_INTERVAL,
+    BATCH_JOBS_RETRY_DELAY,
+    BATCH_JOBS_STALE_TIMEOUT,
+)
+
+
+async def create_batch_job(
+    session: AsyncSession,
+    job_type: BatchJobTypes,
+    params: dict,
+    total_rows: int | None = None,
+) -> BatchJob:
+    """Creates pending job, transaction is committed"""
+    job = BatchJob(
+        job_type=job_type.value,
+        status=BatchJobStatuses.PENDING.value,
+        params=params,
+        total_rows=total_rows,
+        processed_rows=0,
+        attempts=0,
+        created_at=datetime.now(timezone.utc),
+    )
+    session.add(job)
+    await session.commit()
+    return job
+
+
+async def fail_exhausted_batch_jobs(session: AsyncSession):
+    """Fails abandoned running jobs, which have no attempts left"""
+    now = datetime.now(timezone.utc)
+    stmt = (
+        update(BatchJob)
+        .where(
+            BatchJob.status == BatchJobStatuses.RUNNING.value,
+            BatchJob.heartbeat_at
+            < now - timedelta(seconds=BATCH_JOBS_STALE_TIMEOUT),
+            BatchJob.attempts >= BATCH_JOBS_MAX_ATTEMPTS,
+        )
+        .values(
+            status=BatchJobStatuses.FAILED.value,
+            error="Job was abandoned by worker",
+            finished_at=now,
+        )
+        .returning(BatchJob.params)
+    )
+    res = await session.execute(stmt)
+    for params in res.scalars().all():
+        remove_job_file(params)
+
+
+async def claim_batch_job(session: AsyncSession) -> BatchJob | None:
+    """Returns the oldest pending or abandoned job, marked as running. Transaction is committed."""
+    now = datetime.now(timezone.utc)
+    await fail_exhausted_batch_jobs(session)
+    stmt = (
+        select(BatchJob)
+        .where(
+            or_(
+                and_(
+                    BatchJob.status == BatchJobStatuses.PENDING.value,
+                    or_(
+                        BatchJob.next_run_at.is_(None),
+                        BatchJob.next_run_at <= now,
+                    ),
+                ),
+                and_(
+                    BatchJob.status == BatchJobStatuses.RUNNING.value,
+                    BatchJob.heartbeat_at
+                    < now - timedelta(seconds=BATCH_JOBS_STALE_TIMEOUT),
+                ),
+            ),
+            BatchJob.attempts < BATCH_JOBS_MAX_ATTEMPTS,
+        )
+        .order_by(BatchJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    res = await session.execute(stmt)
+    job = res.scalar()
+    if job is not None:
+        job.status = BatchJobStatuses.RUNNING.value
+        job.attempts += 1
+        job.started_at = now
+        job.heartbeat_at = now
+    await session.commit()
+    return job
+
+
+def get_batch_job_next_run_at(attempts: int) -> datetime:
+    """Returns time of the next attempt of job, which failed attempts times"""
+    delay = BATCH_JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+    return datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+
+async def update_batch_job(job_id: int, **values):
+    """Updates job in separate short transaction"""
+    async with session_maker() as session:
+        await session.execute(
+            update(BatchJob).where(BatchJob.id == job_id).values(**values)
+        )
+        await session.commit()
+
+
+async def send_batch_job_heartbeats(job_id: int):
+    """Updates heartbeat_at of running job. Runs until cancelled."""
+    while True:
+        await asyncio.sleep(BATCH_JOBS_STALE_TIMEOUT / 3)
+        try:
+            await update_batch_job(
+                job_id, heartbeat_at=datetime.now(timezone.utc)
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Heartbeat of batch job %s failed", job_id)
+
+
+def remove_job_file(params: dict):
+    path = params.get("path")
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+async def execute_kpi_value_import(job: BatchJob):
+    """Writes job file and recalculates states of groups touched by the file.
+    Values and stage updating_states are committed together, so retry doesn't write the file twice.
+    """
+    if job.stage != BatchJobStages.UPDATING_STATES.value:
+
+        async def on_chunk_written(rows_count: int):
+            await update_batch_job(job.id, processed_rows=rows_count)
+
+        async with session_maker() as session:
+            batch_id = job.params.get("batch_id")
+            imported_counts = await get_imported_batch_counts(session, batch_id)
+            if imported_counts is not None:
+                await update_batch_job(
+                    job.id,
+                    result={
+                        **asdict(imported_counts),
+                        "message": "Batch was already imported",
+                    },
+                )
+                return
+
+            after_id = await get_max_kpi_value_id(session)
+            kpi_ids, counts = await write_csv_file(
+                session,
+                job.params["path"],
+                on_chunk_written,
+                job.params.get(
+                    "conflict_mode", KPIValuesConflictModes.UPDATE.value
+                ),
+            )
+            add_imported_batch(session, batch_id, counts)
+            job.params = {
+                **job.params,
+                "kpi_ids": sorted(kpi_ids),
+                "after_id": after_id,
+            }
+            await session.execute(
+                update(BatchJob)
+                .where(BatchJob.id == job.id)
+                .values(
+                    stage=BatchJobStages.UPDATING_STATES.value,
+                    processed_rows=counts.inserted
+                    + counts.updated
+                    + counts.skipped,
+                    params=job.params,
+                    result=asdict(counts),
+                )
+            )
+            await session.commit()
+
+    await execute_kpi_value_statuses_reload(job)
+
+
+async def execute_kpi_value_statuses_reload(job: BatchJob):
+    await update_batch_job(job.id, stage=BatchJobStages.UPDATING_STATES.value)
+
+    async def on_kpi_updated(kpi_id: int, updated_kpis_count: int):
+        if job.job_type == BatchJobTypes.RELOAD_KPI_VALUE_STATUSES.value:
+            await update_batch_job(job.id, processed_rows=updated_kpis_count)
+
+    async with session_maker() as session:
+        await update_state_for_all_objects(
+            job.params["kpi_ids"],
+            session,
+            after_id=job.params.get("after_id"),
+            on_kpi_updated=on_kpi_updated,
+        )
+
+
+BATCH_JOB_EXECUTORS = {
+    BatchJobTypes.KPI_VALUE_IMPORT.value: execute_kpi_value_import,
+    BatchJobTypes.RELOAD_KPI_VALUE_STATUSES.value: execute_kpi_value_statuses_reload,
+}
+
+
+async def execute_batch_job(job: BatchJob):
+    """Executes claimed job and saves its result"""
+    logging.info(
+        "Batch job %s (%s) started, attempt %s",
+        job.id,
+        job.job_type,
+        job.attempts,
+    )
+    heartbeats = asyncio.create_task(send_batch_job_heartbeats(job.id))
+    try:
+        await BATCH_JOB_EXECUTORS[job.job_type](job)
+    except asyncio.CancelledError:
+        # job is claimed again by another worker after BATCH_JOBS_STALE_TIMEOUT
+        raise
+    except Exception as e:
+        logging.exception("Batch job %s failed", job.id)
+        # ValueError is raised for invalid file data
+        if job.attempts < BATCH_JOBS_MAX_ATTEMPTS and not isinstance(
+            e, ValueError
+        ):
+            await update_batch_job(
+                job.id,
+                status=BatchJobStatuses.PENDING.value,
+                error=str(e),
+                next_run_at=get_batch_job_next_run_at(job.attempts),
+            )
+        else:
+            await update_batch_job(
+                job.id,
+                status=BatchJobStatuses.FAILED.value,
+                error=str(e),
+                finished_at=datetime.now(timezone.utc),
+            )
+            remove_job_file(job.params)
+    else:
+        await update_batch_job(
+            job.id,
+            status=BatchJobStatuses.DONE.value,
+            error=None,
+            finished_at=datetime.now(timezone.utc),
+        )
+        remove_job_file(job.params)
+        logging.info("Batch job %s finished", job.id)
+    finally:
+        heartbeats.cancel()
+
+
+async def run_batch_jobs_worker():
+    """Claims and executes batch jobs one by one. Runs until cancelled."""
+    while True:
+        try:
+            async with session_maker() as session:
+                job = await claim_batch_job(session)
+            if job is None:
+                await asyncio.sleep(BATCH_JOBS_POLL_INTERVAL)
+                continue
+            await execute_batch_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Batch jobs worker failed")
+            await asyncio.sleep(BATCH_JOBS_POLL_INTERVAL)
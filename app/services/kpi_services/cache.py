@@ -0,0 +1,220 @@
+"""In-process cache of KPI metadata, which is needed to validate and (de)serialize KPI values.
+
+Cache items expire after KPI_METADATA_CACHE_TTL seconds. KPI and granularity write endpoints
+mark changed KPIs in session, and their items are invalidated after commit.
+If KPI_METADATA_CACHE_SYNC_ENABLED, invalidations are also sent to other workers through Postgres LISTEN/NOTIFY.
+
+Cached items are shared by all sessions, so they are read and written only for sessions
+without data permission filter (admin or no jwt). Other sessions always load metadata from db.
+"""
+
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from typing import Iterable
+
+from fastapi import HTTPException
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from v1.database.database import (
+    engine,
+    get_chunked_values_by_sqlalchemy_limit,
+)
+from v1.database.schemas import KPI, Granularity
+from v1.security.data.permission import db_admins
+from v1.security.data.utils import get_user_permissions
+from v1.settings.config import (
+    KPI_METADATA_CACHE_SYNC_ENABLED,
+    KPI_METADATA_CACHE_TTL,
+)
+
+KPI_METADATA_CHANNEL = "kpi_metadata_invalidation"
+SESSION_CHANGED_KPI_IDS_KEY = "changed_kpi_ids"
+LISTENER_RECONNECT_SECONDS = 5
+
+KPIMetadata = namedtuple(
+    "KPIMetadata",
+    ["id", "name", "val_type", "multiple", "object_type", "granularity_ids"],
+)
+
+
+class KPIMetadataCache:
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        # structure like {kpi_id: (expires_at, KPIMetadata)}
+        self._items: dict[int, tuple[float, KPIMetadata]] = {}
+        # incremented by every invalidation, items loaded before it are stale
+        self.generation = 0
+
+    def get(self, kpi_id: int) -> KPIMetadata | None:
+        item = self._items.get(kpi_id)
+        if item is None:
+            return None
+        expires_at, metadata = item
+        if expires_at < time.monotonic():
+            self._items.pop(kpi_id, None)
+            return None
+        return metadata
+
+    def set(self, metadata: KPIMetadata):
+        self._items[metadata.id] = (time.monotonic() + self.ttl, metadata)
+
+    def set_loaded(self, items: Iterable[KPIMetadata], generation: int):
+        """Saves items loaded from db, if there were no invalidations since generation"""
+        if generation != self.generation:
+            return
+        for metadata in items:
+            self.set(metadata)
+
+    def invalidate(self, kpi_ids: Iterable[int] | None = None):
+        """Removes items for kpi_ids, or all items if kpi_ids is None"""
+        self.generation += 1
+        if kpi_ids is None:
+            self._items.clear()
+            return
+        for kpi_id in kpi_ids:
+            self._items.pop(kpi_id, None)
+
+
+kpi_metadata_cache = KPIMetadataCache(ttl=KPI_METADATA_CACHE_TTL)
+
+
+async def load_kpis_metadata(
+    session: AsyncSession, kpi_ids: Iterable[int]
+) -> dict[int, KPIMetadata]:
+    """Returns KPIMetadata from db for existing kpi_ids"""
+    kpis = []
+    granularity_ids = {}
+    for chunk in get_chunked_values_by_sqlalchemy_limit(kpi_ids):
+        stmt = select(
+            KPI.id, KPI.name, KPI.val_type, KPI.multiple, KPI.object_type
+        ).where(KPI.id.in_(chunk))
+        kpis.extend(await session.execute(stmt))
+
+        stmt = select(Granularity.kpi_id, Granularity.id).where(
+            Granularity.kpi_id.in_(chunk)
+        )
+        for kpi_id, granularity_id in await session.execute(stmt):
+            granularity_ids.setdefault(kpi_id, set()).add(granularity_id)
+
+    return {
+        kpi_id: KPIMetadata(
+            id=kpi_id,
+            name=name,
+            val_type=val_type,
+            multiple=multiple,
+            object_type=object_type,
+            granularity_ids=frozenset(granularity_ids.get(kpi_id, ())),
+        )
+        for kpi_id, name, val_type, multiple, object_type in kpis
+    }
+
+
+def is_cache_allowed(session: AsyncSession) -> bool:
+    """Returns True if KPI selects of session are not filtered by data permissions"""
+    jwt = session.info.get("jwt", None)
+    if not jwt:
+        return True
+    return bool(set(get_user_permissions(jwt)) & db_admins)
+
+
+async def get_kpis_metadata(
+    session: AsyncSession, kpi_ids: Iterable[int]
+) -> dict[int, KPIMetadata]:
+    """Returns KPIMetadata for existing kpi_ids. Missed items are loaded from db by one query per chunk."""
+    if not is_cache_allowed(session):
+        return await load_kpis_metadata(session, set(kpi_ids))
+
+    result = {}
+    missed_kpi_ids = set()
+    for kpi_id in kpi_ids:
+        metadata = kpi_metadata_cache.get(kpi_id)
+        if metadata is None:
+            missed_kpi_ids.add(kpi_id)
+        else:
+            result[kpi_id] = metadata
+
+    if missed_kpi_ids:
+        generation = kpi_metadata_cache.generation
+        loaded = await load_kpis_metadata(session, missed_kpi_ids)
+        kpi_metadata_cache.set_loaded(loaded.values(), generation)
+        result.update(loaded)
+    return result
+
+
+async def get_kpi_metadata_or_raise_error(
+    kpi_id: int, session: AsyncSession
+) -> KPIMetadata:
+    """Returns KPIMetadata if kpi with id = kpi_id exists, otherwise raises error."""
+    kpis_metadata = await get_kpis_metadata(session, [kpi_id])
+    if kpi_id not in kpis_metadata:
+        raise HTTPException(
+            status_code=422, detail=f"KPI with id = {kpi_id} does not exist!"
+        )
+    return kpis_metadata[kpi_id]
+
+
+async def mark_kpi_metadata_changed(
+    session: AsyncSession, kpi_ids: Iterable[int]
+):
+    """Cache items of kpi_ids will be invalidated after session commit.
+    Must be called before commit, because NOTIFY is sent in the session transaction.
+    """
+    kpi_ids = set(kpi_ids)
+    session.info.setdefault(SESSION_CHANGED_KPI_IDS_KEY, set()).update(kpi_ids)
+
+    if KPI_METADATA_CACHE_SYNC_ENABLED:
+        payload = ",".join(str(kpi_id) for kpi_id in kpi_ids)
+        await session.execute(
+            select(func.pg_notify(KPI_METADATA_CHANNEL, payload))
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_changed_kpi_metadata(session):
+    changed_kpi_ids = session.info.pop(SESSION_CHANGED_KPI_IDS_KEY, None)
+    if changed_kpi_ids:
+        kpi_metadata_cache.invalidate(changed_kpi_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_changed_kpi_metadata(session):
+    session.info.pop(SESSION_CHANGED_KPI_IDS_KEY, None)
+
+
+def on_kpi_metadata_notification(connection, pid, channel, payload: str):
+    if not payload:
+        kpi_metadata_cache.invalidate()
+        return
+    kpi_metadata_cache.invalidate(int(kpi_id) for kpi_id in payload.split(","))
+
+
+async def listen_kpi_metadata_invalidations():
+    """Invalidates cache items, which were changed by other workers. Runs until cancelled."""
+    while True:
+        try:
+            async with engine.connect() as connection:
+                raw_connection = await connection.get_raw_connection()
+                asyncpg_connection = raw_connection.driver_connection
+                await asyncpg_connection.add_listener(
+                    KPI_METADATA_CHANNEL, on_kpi_metadata_notification
+                )
+                # notifications could be missed while listener was disconnected
+                kpi_metadata_cache.invalidate()
+                try:
+                    while not asyncpg_connection.is_closed():
+                        await asyncio.sleep(LISTENER_RECONNECT_SECONDS)
+                finally:
+                    if not asyncpg_connection.is_closed():
+                        await asyncpg_connection.remove_listener(
+                            KPI_METADATA_CHANNEL, on_kpi_metadata_notification
+                        )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("KPI metadata cache listener failed")
+            kpi_metadata_cache.invalidate()
+        await asyncio.sleep(LISTENER_RECONNECT_SECONDS)
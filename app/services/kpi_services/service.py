@@ -4,6 +4,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from exception_manager.manager import NotFoundError, KPIUpdateError
+from services.kpi_services.cache import mark_kpi_metadata_changed
+from services.kpi_value_services.current_state import (
+    refresh_current_values_for_kpis,
+)
 from v1.database.database import get_chunked_values_by_sqlalchemy_limit
 from v1.database.schemas import KPI, KPIValue, possible_brach_types
 from v1.models.kpi import (
@@ -120,6 +124,7 @@ async def delete_kpi_instance_by_id(session: AsyncSession, kpi_id: int):
         await session.delete(granularity)
 
     await session.delete(kpi_inst)
+    await mark_kpi_metadata_changed(session, [kpi_id])
     await session.commit()
 
 
@@ -157,8 +162,12 @@ async def update_kpi_instance(
                     await session.delete(kpi_value)
                 else:
                     kpi_value.value = serializer(value)
+                    kpi_value.set_typed_values(kpi.val_type, kpi_inst.multiple)
                     session.add(kpi_value)
 
+            await session.flush()
+            await refresh_current_values_for_kpis(session, [kpi_id])
+
         else:
             errors.append(
                 f"You are trying to change KPI val_type. Current val_type ='{kpi_inst.val_type}'. "
@@ -194,6 +203,7 @@ async def update_kpi_instance(
 
     await update_kpi_links(session=session, kpi_id=kpi_id, main_kpi=kpi_inst)
 
+    await mark_kpi_metadata_changed(session, [kpi_id])
     await session.commit()
     kpi_inst.__dict__["related_kpis"] = related_kpis
 
@@ -0,0 +1,336 @@
+"""Bulk writing of KPI values with binary COPY.
+
+Imports upsert KPI values by natural key (kpi_id, object_id, granularity_id, record_time,
+state = 'planned'), so planned value and actual value of the same record_time are kept separately:
+buffer is copied into temporary table and moved into kpi_values with INSERT ... ON CONFLICT.
+"""
+
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+from sqlalchemy import (
+    and_,
+    case,
+    column,
+    func,
+    literal_column,
+    or_,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from v1.database.schemas import KPIValue, KPIValueImportBatch
+from v1.models.kpi_values import KPIValuesConflictModes, KPIValuesStates
+from v1.utils.val_type_columns import (
+    TYPED_VALUE_COLUMNS,
+    get_typed_value_columns,
+)
+
+KPI_VALUES_COPY_COLUMNS = (
+    "kpi_id",
+    "object_id",
+    "granularity_id",
+    "value",
+    "record_time",
+    "state",
+    *TYPED_VALUE_COLUMNS,
+)
+KPI_VALUES_NATURAL_KEY = (
+    "kpi_id",
+    "object_id",
+    "granularity_id",
+    "record_time",
+)
+
+
+def get_natural_key(columns) -> list:
+    """Returns natural key expressions of columns, the same as of unique index of kpi_values"""
+    is_planned = columns["state"] == literal_column(
+        f"'{KPIValuesStates.PLANNED.value}'"
+    )
+    return [
+        *(columns[name] for name in KPI_VALUES_NATURAL_KEY),
+        is_planned.self_group(),
+    ]
+
+
+# temporary table lives until the end of transaction, so it works through pgbouncer in transaction mode
+IMPORT_TABLE_NAME = "kpi_values_import"
+import_table = table(
+    IMPORT_TABLE_NAME, *(column(name) for name in KPI_VALUES_COPY_COLUMNS)
+)
+
+
+@dataclass
+class ImportCounts:
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+
+    def add(self, other: "ImportCounts"):
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.skipped += other.skipped
+
+
+class KPIValueColumnBuffer:
+    """Columnar buffer with kpi_values rows, which are waiting to be copied into db"""
+
+    def __init__(self):
+        self.kpi_id: list[int] = []
+        self.object_id: list[int] = []
+        self.granularity_id: list[int] = []
+        self.value: list[str] = []
+        self.record_time: list[datetime] = []
+        self.state: list[str] = []
+        # typed columns are filled after validation, when val_type of KPIs is known
+        self.value_numeric: list[Decimal | None] = []
+        self.value_bool: list[bool | None] = []
+        self.value_datetime: list[datetime | None] = []
+        self.value_json: list[str | None] = []
+
+    def __len__(self) -> int:
+        return len(self.kpi_id)
+
+    def append(
+        self,
+        kpi_id: int,
+        object_id: int,
+        granularity_id: int,
+        value: str,
+        record_time: datetime,
+        state: str,
+    ):
+        self.kpi_id.append(kpi_id)
+        self.object_id.append(object_id)
+        self.granularity_id.append(granularity_id)
+        self.value.append(value)
+        self.record_time.append(record_time)
+        self.state.append(state)
+
+    def select_rows(self, rows: Iterable[int]) -> "KPIValueColumnBuffer":
+        """Returns new buffer with rows of this buffer. Typed columns are not copied."""
+        buffer = KPIValueColumnBuffer()
+        for row in rows:
+            buffer.append(
+                kpi_id=self.kpi_id[row],
+                object_id=self.object_id[row],
+                granularity_id=self.granularity_id[row],
+                value=self.value[row],
+                record_time=self.record_time[row],
+                state=self.state[row],
+            )
+        return buffer
+
+    def fill_typed_values(self, kpis_and_val_types: dict):
+        """Fills typed columns of all buffered values.
+        kpis_and_val_types has structure like {1: [str, True]}
+        """
+        for kpi_id, value in zip(self.kpi_id, self.value):
+            val_type, multiple = kpis_and_val_types[kpi_id]
+            typed_values = get_typed_value_columns(val_type, multiple, value)
+            self.value_numeric.append(typed_values["value_numeric"])
+            self.value_bool.append(typed_values["value_bool"])
+            self.value_datetime.append(typed_values["value_datetime"])
+            # asyncpg copies jsonb from text
+            value_json = typed_values["value_json"]
+            self.value_json.append(
+                json.dumps(value_json) if value_json is not None else None
+            )
+
+    def get_groups(self, state: str | None = None) -> set[tuple[int, int, int]]:
+        """Returns (kpi_id, object_id, granularity_id) of buffered rows, optionally only with particular state"""
+        return {
+            (kpi_id, object_id, granularity_id)
+            for kpi_id, object_id, granularity_id, row_state in zip(
+                self.kpi_id, self.object_id, self.granularity_id, self.state
+            )
+            if state is None or row_state == state
+        }
+
+    def records(self) -> Iterator[tuple]:
+        """Returns rows in the same order as KPI_VALUES_COPY_COLUMNS"""
+        return zip(
+            self.kpi_id,
+            self.object_id,
+            self.granularity_id,
+            self.value,
+            self.record_time,
+            self.state,
+            self.value_numeric,
+            self.value_bool,
+            self.value_datetime,
+            self.value_json,
+        )
+
+
+async def get_asyncpg_connection(session: AsyncSession):
+    """Returns asyncpg connection which is used by session in current transaction"""
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+async def copy_kpi_values_into_import_table(
+    session: AsyncSession, buffer: KPIValueColumnBuffer
+):
+    """Creates empty temporary import table for current transaction and copies buffer into it"""
+    columns = ", ".join(KPI_VALUES_COPY_COLUMNS)
+    await session.execute(
+        text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {IMPORT_TABLE_NAME} ON COMMIT DROP "
+            f"AS SELECT {columns} FROM {KPIValue.__tablename__} WITH NO DATA"
+        )
+    )
+    await session.execute(text(f"TRUNCATE {IMPORT_TABLE_NAME}"))
+
+    asyncpg_connection = await get_asyncpg_connection(session)
+    await asyncpg_connection.copy_records_to_table(
+        IMPORT_TABLE_NAME,
+        records=buffer.records(),
+        columns=KPI_VALUES_COPY_COLUMNS,
+    )
+
+
+def select_unique_import_rows():
+    """Returns the last copied row for every natural key of import table"""
+    key_columns = get_natural_key(import_table.c)
+    return (
+        select(*import_table.c)
+        .distinct(*key_columns)
+        .order_by(*key_columns, literal_column("ctid").desc())
+    )
+
+
+async def count_unique_and_existing_rows(
+    session: AsyncSession,
+) -> tuple[int, int]:
+    """Returns count of unique import rows and count of them, which natural key already exists in kpi_values"""
+    unique_rows = select_unique_import_rows().subquery("unique_rows")
+    stmt = select(func.count(), func.count(KPIValue.id)).select_from(
+        unique_rows.outerjoin(
+            KPIValue,
+            and_(
+                *(
+                    kpi_value_key == unique_rows_key
+                    for kpi_value_key, unique_rows_key in zip(
+                        get_natural_key(KPIValue.__table__.c),
+                        get_natural_key(unique_rows.c),
+                    )
+                )
+            ),
+        )
+    )
+    res = await session.execute(stmt)
+    return tuple(res.one())
+
+
+def get_upsert_statement(conflict_mode: str):
+    stmt = insert(KPIValue).from_select(
+        KPI_VALUES_COPY_COLUMNS, select_unique_import_rows()
+    )
+    index_elements = get_natural_key(KPIValue.__table__.c)
+    if conflict_mode == KPIValuesConflictModes.SKIP.value:
+        return stmt.on_conflict_do_nothing(index_elements=index_elements)
+
+    # the same value, which is sent as historical again, stays current
+    state = case(
+        (
+            and_(
+                KPIValue.state == KPIValuesStates.CURRENT.value,
+                stmt.excluded.state == KPIValuesStates.HISTORICAL.value,
+            ),
+            KPIValue.state,
+        ),
+        else_=stmt.excluded.state,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={
+            "value": stmt.excluded.value,
+            "state": state,
+            **{name: stmt.excluded[name] for name in TYPED_VALUE_COLUMNS},
+            # imported value replaces rolled up one
+            "rollup_count": None,
+        },
+        # unchanged KPI values are skipped
+        where=or_(
+            KPIValue.value.is_distinct_from(stmt.excluded.value),
+            KPIValue.state.is_distinct_from(state),
+        ),
+    )
+
+
+async def upsert_kpi_values(
+    session: AsyncSession,
+    buffer: KPIValueColumnBuffer,
+    conflict_mode: str = KPIValuesConflictModes.UPDATE.value,
+) -> ImportCounts:
+    """Writes buffer into kpi_values, KPI values with existing natural key are updated or skipped
+    by conflict_mode. Rows with the same natural key in buffer are written once, the last one wins.
+    Upsert is executed in the session transaction.
+    """
+    if not len(buffer):
+        return ImportCounts()
+
+    await copy_kpi_values_into_import_table(session, buffer)
+    if conflict_mode == KPIValuesConflictModes.UPDATE.value:
+        unique_count, existing_count = await count_unique_and_existing_rows(
+            session
+        )
+
+    upserted = (
+        get_upsert_statement(conflict_mode)
+        .returning(KPIValue.id)
+        .cte("upserted")
+    )
+    res = await session.execute(select(func.count()).select_from(upserted))
+    written_count = res.scalar()
+
+    if conflict_mode == KPIValuesConflictModes.UPDATE.value:
+        inserted = unique_count - existing_count
+    else:
+        inserted = written_count
+    updated = written_count - inserted
+    return ImportCounts(
+        inserted=inserted,
+        updated=updated,
+        skipped=len(buffer) - inserted - updated,
+    )
+
+
+async def get_imported_batch_counts(
+    session: AsyncSession, batch_id: str | None
+) -> ImportCounts | None:
+    """Returns counts of already imported batch with batch_id, None if it is not imported yet"""
+    if batch_id is None:
+        return None
+    batch = await session.get(KPIValueImportBatch, batch_id)
+    if batch is None:
+        return None
+    return ImportCounts(
+        inserted=batch.inserted, updated=batch.updated, skipped=batch.skipped
+    )
+
+
+def add_imported_batch(
+    session: AsyncSession, batch_id: str | None, counts: ImportCounts
+):
+    """Marks batch as imported in the session transaction, so batch and its values are committed together"""
+    if batch_id is None:
+        return
+    session.add(
+        KPIValueImportBatch(
+            batch_id=batch_id,
+            inserted=counts.inserted,
+            updated=counts.updated,
+            skipped=counts.skipped,
+            created_at=datetime.now(timezone.utc),
+        )
+    )
@@ -0,0 +1,310 @@
+"""Set-based maintenance of KPI values with state = current.
+
+Groups of KPI values are identified by (kpi_id, object_id, granularity_id) and passed to Postgres
+as arrays, so one statement handles all touched groups.
+States of groups are recalculated in batches of STATES_RECOMPUTE_BATCH_SIZE groups. Only groups touched
+after watermark (id of KPI value) are recalculated, only KPI values with changed state are updated.
+"""
+
+from typing import Iterable
+
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    and_,
+    bindparam,
+    case,
+    delete,
+    exists,
+    func,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from v1.database.schemas import KPIValue, KPICurrentValue
+from v1.models.kpi_values import KPIValuesStates
+
+STATES_RECOMPUTE_BATCH_SIZE = 10000
+# planned values keep their state
+RECOMPUTED_STATES = (
+    KPIValuesStates.CURRENT.value,
+    KPIValuesStates.HISTORICAL.value,
+)
+
+
+def get_groups_subquery(groups: Iterable[tuple[int, int, int]]):
+    """Returns subquery with columns kpi_id, object_id, granularity_id built from unnest of arrays"""
+    kpi_ids, object_ids, granularity_ids = [], [], []
+    for kpi_id, object_id, granularity_id in set(groups):
+        kpi_ids.append(kpi_id)
+        object_ids.append(object_id)
+        granularity_ids.append(granularity_id)
+
+    return select(
+        func.unnest(
+            bindparam("group_kpi_ids", kpi_ids, type_=ARRAY(BigInteger))
+        ).label("kpi_id"),
+        func.unnest(
+            bindparam("group_object_ids", object_ids, type_=ARRAY(Integer))
+        ).label("object_id"),
+        func.unnest(
+            bindparam(
+                "group_granularity_ids",
+                granularity_ids,
+                type_=ARRAY(BigInteger),
+            )
+        ).label("granularity_id"),
+    ).subquery("groups")
+
+
+def join_groups_condition(groups_subquery):
+    return and_(
+        KPIValue.kpi_id == groups_subquery.c.kpi_id,
+        KPIValue.object_id == groups_subquery.c.object_id,
+        KPIValue.granularity_id == groups_subquery.c.granularity_id,
+    )
+
+
+async def demote_outdated_current_kpi_values(
+    session: AsyncSession, groups: Iterable[tuple[int, int, int]]
+) -> int:
+    """Keeps only the latest current KPI value in every group, other current values become historical.
+    Returns count of demoted KPI values.
+    """
+    groups = set(groups)
+    if not groups:
+        return 0
+
+    groups_subquery = get_groups_subquery(groups)
+    ranked_current = (
+        select(
+            KPIValue.id,
+            func.row_number()
+            .over(
+                partition_by=(
+                    KPIValue.kpi_id,
+                    KPIValue.object_id,
+                    KPIValue.granularity_id,
+                ),
+                order_by=(KPIValue.record_time.desc(), KPIValue.id.desc()),
+            )
+            .label("row_number"),
+        )
+        .join(groups_subquery, join_groups_condition(groups_subquery))
+        .where(KPIValue.state == KPIValuesStates.CURRENT.value)
+        .subquery("ranked_current")
+    )
+
+    stmt = (
+        update(KPIValue)
+        .where(
+            KPIValue.id == ranked_current.c.id, ranked_current.c.row_number > 1
+        )
+        .values(state=KPIValuesStates.HISTORICAL.value)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    return result.rowcount
+
+
+async def get_max_kpi_value_id(session: AsyncSession) -> int:
+    """Returns watermark of KPI values, which are already saved"""
+    res = await session.execute(select(func.coalesce(func.max(KPIValue.id), 0)))
+    return res.scalar()
+
+
+async def get_touched_groups_batch(
+    session: AsyncSession,
+    kpi_ids: list[int],
+    after_id: int | None = None,
+    start_after: tuple[int, int, int] | None = None,
+    batch_size: int = STATES_RECOMPUTE_BATCH_SIZE,
+) -> list[tuple[int, int, int]]:
+    """Returns up to batch_size groups of kpi_ids with KPI values with id > after_id, all groups if after_id is None.
+    Groups are (kpi_id, granularity_id, object_id) in index order, start_after is the last group of previous batch.
+    """
+    stmt = (
+        select(KPIValue.kpi_id, KPIValue.granularity_id, KPIValue.object_id)
+        .where(KPIValue.kpi_id.in_(kpi_ids))
+        .distinct()
+        .order_by(KPIValue.kpi_id, KPIValue.granularity_id, KPIValue.object_id)
+        .limit(batch_size)
+    )
+    if after_id is not None:
+        stmt = stmt.where(KPIValue.id > after_id)
+    if start_after is not None:
+        stmt = stmt.where(
+            tuple_(KPIValue.kpi_id, KPIValue.granularity_id, KPIValue.object_id)
+            > tuple_(*start_after)
+        )
+    res = await session.execute(stmt)
+    return [tuple(row) for row in res.all()]
+
+
+async def recompute_states_for_groups(
+    session: AsyncSession,
+    groups: Iterable[tuple[int, int, int]],
+) -> int:
+    """Makes the latest not planned KPI value of every group current and other ones historical.
+    Only KPI values with changed state are updated. Returns count of updated KPI values.
+    """
+    groups = set(groups)
+    if not groups:
+        return 0
+
+    groups_subquery = get_groups_subquery(groups)
+    latest = (
+        select(
+            KPIValue.id,
+            KPIValue.kpi_id,
+            KPIValue.object_id,
+            KPIValue.granularity_id,
+        )
+        .join(groups_subquery, join_groups_condition(groups_subquery))
+        .where(KPIValue.state.in_(RECOMPUTED_STATES))
+        .distinct(KPIValue.kpi_id, KPIValue.object_id, KPIValue.granularity_id)
+        .order_by(
+            KPIValue.kpi_id,
+            KPIValue.object_id,
+            KPIValue.granularity_id,
+            KPIValue.record_time.desc(),
+            KPIValue.id.desc(),
+        )
+        .subquery("latest")
+    )
+
+    is_latest = KPIValue.id == latest.c.id
+    stmt = (
+        update(KPIValue)
+        .where(
+            KPIValue.kpi_id == latest.c.kpi_id,
+            KPIValue.object_id == latest.c.object_id,
+            KPIValue.granularity_id == latest.c.granularity_id,
+            or_(
+                and_(
+                    is_latest,
+                    KPIValue.state == KPIValuesStates.HISTORICAL.value,
+                ),
+                and_(
+                    ~is_latest,
+                    KPIValue.state == KPIValuesStates.CURRENT.value,
+                ),
+            ),
+        )
+        .values(
+            state=case(
+                (is_latest, KPIValuesStates.CURRENT.value),
+                else_=KPIValuesStates.HISTORICAL.value,
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    return result.rowcount
+
+
+def select_latest_current_kpi_values():
+    """Returns select of the latest current KPI value for every group, in KPI_CURRENT_VALUES_COLUMNS order"""
+    return (
+        select(
+            KPIValue.object_id,
+            KPIValue.kpi_id,
+            KPIValue.granularity_id,
+            KPIValue.id,
+            KPIValue.value,
+            KPIValue.record_time,
+        )
+        .where(KPIValue.state == KPIValuesStates.CURRENT.value)
+        .distinct(KPIValue.object_id, KPIValue.kpi_id, KPIValue.granularity_id)
+        .order_by(
+            KPIValue.object_id,
+            KPIValue.kpi_id,
+            KPIValue.granularity_id,
+            KPIValue.record_time.desc(),
+            KPIValue.id.desc(),
+        )
+    )
+
+
+KPI_CURRENT_VALUES_COLUMNS = [
+    KPICurrentValue.object_id,
+    KPICurrentValue.kpi_id,
+    KPICurrentValue.granularity_id,
+    KPICurrentValue.kpi_value_id,
+    KPICurrentValue.value,
+    KPICurrentValue.record_time,
+]
+
+
+async def refresh_current_values_for_groups(
+    session: AsyncSession, groups: Iterable[tuple[int, int, int]]
+):
+    """Upserts kpi_current_values of groups from kpi_values with state = current.
+    Groups without current KPI value are removed from kpi_current_values.
+    """
+    groups = set(groups)
+    if not groups:
+        return
+
+    groups_subquery = get_groups_subquery(groups)
+    current_kpi_value_exists = exists().where(
+        KPIValue.kpi_id == KPICurrentValue.kpi_id,
+        KPIValue.object_id == KPICurrentValue.object_id,
+        KPIValue.granularity_id == KPICurrentValue.granularity_id,
+        KPIValue.state == KPIValuesStates.CURRENT.value,
+    )
+    stmt = delete(KPICurrentValue).where(
+        KPICurrentValue.kpi_id == groups_subquery.c.kpi_id,
+        KPICurrentValue.object_id == groups_subquery.c.object_id,
+        KPICurrentValue.granularity_id == groups_subquery.c.granularity_id,
+        ~current_kpi_value_exists,
+    )
+    await session.execute(
+        stmt, execution_options={"synchronize_session": False}
+    )
+
+    latest_current = select_latest_current_kpi_values().join(
+        groups_subquery, join_groups_condition(groups_subquery)
+    )
+    stmt = insert(KPICurrentValue).from_select(
+        KPI_CURRENT_VALUES_COLUMNS, latest_current
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            KPICurrentValue.object_id,
+            KPICurrentValue.kpi_id,
+            KPICurrentValue.granularity_id,
+        ],
+        set_={
+            "kpi_value_id": stmt.excluded.kpi_value_id,
+            "value": stmt.excluded.value,
+            "record_time": stmt.excluded.record_time,
+        },
+    )
+    await session.execute(stmt)
+
+
+async def refresh_current_values_for_kpis(
+    session: AsyncSession, kpi_ids: Iterable[int]
+):
+    """Rebuilds kpi_current_values of kpi_ids from kpi_values with state = current"""
+    kpi_ids = list(kpi_ids)
+    if not kpi_ids:
+        return
+
+    stmt = delete(KPICurrentValue).where(KPICurrentValue.kpi_id.in_(kpi_ids))
+    await session.execute(
+        stmt, execution_options={"synchronize_session": False}
+    )
+
+    latest_current = select_latest_current_kpi_values().where(
+        KPIValue.kpi_id.in_(kpi_ids)
+    )
+    stmt = insert(KPICurrentValue).from_select(
+        KPI_CURRENT_VALUES_COLUMNS, latest_current
+    )
+    await session.execute(stmt)
@@ -0,0 +1,163 @@
+"""Streaming export of KPI values.
+
+Rows are read with server-side cursor and written in chunks, so memory doesn't depend on export size.
+Export opens its own session, because session of request dependency is closed before response is streamed.
+Statements are executed by session connection, so rows are not converted into ORM objects.
+"""
+
+import csv
+import io
+from typing import AsyncIterator, Callable
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.requests import Request
+from sqlalchemy import Select
+
+from v1.database.database import get_session
+from v1.models.kpi_values import KPIValuesExportFormats
+from v1.utils.json_rows import dumps_json
+
+EXPORT_CHUNK_SIZE = 10000
+
+KPI_VALUES_ARROW_TYPES = {
+    "object_id": pa.int32(),
+    "kpi_id": pa.int64(),
+    "granularity_id": pa.int64(),
+    "record_time": pa.timestamp("us", tz="UTC"),
+    "value": pa.string(),
+    "state": pa.string(),
+    "id": pa.int64(),
+}
+
+EXPORT_FORMATS_MEDIA_TYPES = {
+    KPIValuesExportFormats.CSV.value: ("text/csv", "csv"),
+    KPIValuesExportFormats.PARQUET.value: (
+        "application/vnd.apache.parquet",
+        "parquet",
+    ),
+    KPIValuesExportFormats.ARROW_IPC.value: (
+        "application/vnd.apache.arrow.stream",
+        "arrows",
+    ),
+}
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file, which keeps written bytes until they are taken by pop"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def get_csv_chunk(rows) -> bytes:
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    return output.getvalue().encode()
+
+
+def get_arrow_schema(stmt: Select) -> pa.Schema:
+    return pa.schema(
+        [
+            (column.name, KPI_VALUES_ARROW_TYPES[column.name])
+            for column in stmt.selected_columns
+        ]
+    )
+
+
+def get_record_batch(rows, schema: pa.Schema) -> pa.RecordBatch:
+    """Converts rows into columnar record batch"""
+    columns = zip(*rows)
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(column, type=field.type)
+            for column, field in zip(columns, schema)
+        ],
+        schema=schema,
+    )
+
+
+async def stream_rows(
+    stmt: Select, request: Request = None, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[list]:
+    """Yields lists of up to chunk_size rows of stmt"""
+    async for session in get_session(request):
+        # KPI values have no data permissions, so rows are read without ORM
+        connection = await session.connection()
+        result = await connection.stream(
+            stmt.execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+
+async def stream_csv(
+    stmt: Select, request: Request = None, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Yields CSV with header and rows of stmt, chunk by chunk"""
+    # header is sent before query is executed
+    yield get_csv_chunk([[column.name for column in stmt.selected_columns]])
+    async for rows in stream_rows(stmt, request, chunk_size):
+        yield get_csv_chunk(rows)
+
+
+async def stream_ndjson(
+    stmt: Select,
+    row_to_dict: Callable[..., dict],
+    request: Request = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """Yields rows of stmt as newline delimited JSON objects, chunk by chunk"""
+    async for rows in stream_rows(stmt, request, chunk_size):
+        yield b"".join(dumps_json(row_to_dict(row)) + b"\n" for row in rows)
+
+
+async def stream_arrow(
+    stmt: Select,
+    export_format: str,
+    request: Request = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """Yields Arrow IPC stream or Parquet file with rows of stmt.
+    Every chunk of rows becomes record batch of IPC stream or row group of Parquet file.
+    """
+    schema = get_arrow_schema(stmt)
+    sink = ChunkSink()
+    if export_format == KPIValuesExportFormats.PARQUET.value:
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    yield sink.pop()
+    async for rows in stream_rows(stmt, request, chunk_size):
+        writer.write_batch(get_record_batch(rows, schema))
+        yield sink.pop()
+    writer.close()
+    yield sink.pop()
+
+
+def stream_kpi_values(
+    stmt: Select, export_format: str, request: Request = None
+) -> AsyncIterator[bytes]:
+    if export_format == KPIValuesExportFormats.CSV.value:
+        return stream_csv(stmt, request)
+    return stream_arrow(stmt, export_format, request)
@@ -0,0 +1,143 @@
+"""Import of KPI values from CSV files of batch jobs.
+
+Files are kept in BATCH_JOBS_FILES_DIR and read in chunks of BATCH_IMPORT_CHUNK_SIZE lines.
+Streaming upload is read twice: firstly all chunks are validated, then they are upserted
+by natural key in one transaction. Only one chunk is kept in memory at the same time.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Awaitable, Callable, Iterator
+
+import pandas as pd
+from fastapi import UploadFile
+from pandas import DataFrame
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.kpi_services.cache import get_kpis_metadata
+from services.kpi_value_services.copy_writer import (
+    ImportCounts,
+    KPIValueColumnBuffer,
+    upsert_kpi_values,
+)
+from services.kpi_value_services.current_state import (
+    recompute_states_for_groups,
+    refresh_current_values_for_groups,
+)
+from v1.models.kpi_values import KPIValuesConflictModes
+from v1.routers.batch.utils import (
+    get_csv_delimiter,
+    process_file_data_for_batch_import,
+)
+from v1.settings.config import BATCH_IMPORT_CHUNK_SIZE, BATCH_JOBS_FILES_DIR
+
+
+def create_job_file():
+    """Returns new file in BATCH_JOBS_FILES_DIR. File must be removed by caller."""
+    os.makedirs(BATCH_JOBS_FILES_DIR, exist_ok=True)
+    return tempfile.NamedTemporaryFile(
+        dir=BATCH_JOBS_FILES_DIR,
+        prefix="kpi_values_import_",
+        suffix=".csv",
+        delete=False,
+    )
+
+
+def copy_upload_to_job_file(upload: UploadFile) -> str:
+    """Returns path of job file with upload content"""
+    upload.file.seek(0)
+    with create_job_file() as job_file:
+        shutil.copyfileobj(upload.file, job_file)
+    return job_file.name
+
+
+def save_data_frame_to_job_file(df: DataFrame) -> str:
+    """Returns path of job file with df in CSV"""
+    with create_job_file() as job_file:
+        df.to_csv(job_file, index=False)
+    return job_file.name
+
+
+def read_csv_chunks(
+    path: str, chunk_size: int = BATCH_IMPORT_CHUNK_SIZE
+) -> Iterator[DataFrame]:
+    """Returns iterator of file chunks. Index of chunks continues previous chunk, like in the whole file"""
+    with open(path, "rb") as file:
+        delimiter = get_csv_delimiter(file.readline())
+    return pd.read_csv(
+        path, dtype="str", delimiter=delimiter, chunksize=chunk_size
+    )
+
+
+async def iterate_chunks(chunks: Iterator[DataFrame]):
+    """Parses chunks in thread, so event loop is not blocked by parsing"""
+    while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+        yield chunk
+
+
+def get_buffer_from_data_frame(df: DataFrame) -> KPIValueColumnBuffer:
+    buffer = KPIValueColumnBuffer()
+    buffer.kpi_id = df["kpi_id"].astype("int64").tolist()
+    buffer.object_id = df["object_id"].astype("int64").tolist()
+    buffer.granularity_id = df["granularity_id"].astype("int64").tolist()
+    # values are serialized as str, like in regular import
+    buffer.value = df["value"].astype(str).tolist()
+    buffer.record_time = [
+        datetime.fromisoformat(record_time) for record_time in df["record_time"]
+    ]
+    buffer.state = df["state"].tolist()
+    return buffer
+
+
+async def validate_csv_file(path: str, session: AsyncSession):
+    """Validates file chunk by chunk, raises ValueError with errors of the first invalid chunk"""
+    with read_csv_chunks(path) as chunks:
+        async for chunk in iterate_chunks(chunks):
+            await process_file_data_for_batch_import(
+                df_file_data=chunk, session=session
+            )
+
+
+async def write_csv_file(
+    session: AsyncSession,
+    path: str,
+    on_chunk_written: Callable[[int], Awaitable] | None = None,
+    conflict_mode: str = KPIValuesConflictModes.UPDATE.value,
+) -> tuple[set[int], ImportCounts]:
+    """Upserts validated file into kpi_values, transaction is not committed.
+    Returns ids of imported KPIs and import counts.
+    """
+    kpi_ids = set()
+    counts = ImportCounts()
+    rows_count = 0
+    with read_csv_chunks(path) as chunks:
+        async for chunk in iterate_chunks(chunks):
+            buffer = get_buffer_from_data_frame(chunk)
+            kpis_metadata = await get_kpis_metadata(session, set(buffer.kpi_id))
+            buffer.fill_typed_values(
+                {
+                    kpi_id: [metadata.val_type, metadata.multiple]
+                    for kpi_id, metadata in kpis_metadata.items()
+                }
+            )
+            chunk_counts = await upsert_kpi_values(
+                session, buffer, conflict_mode
+            )
+            if chunk_counts.updated:
+                # updated values keep their id, so they are not found by watermark of inserted values
+                groups = buffer.get_groups()
+                await recompute_states_for_groups(session, groups)
+                await refresh_current_values_for_groups(session, groups)
+            counts.add(chunk_counts)
+            rows_count += len(buffer)
+            kpi_ids.update(kpis_metadata)
+            logging.info(
+                "KPI values import %s: %s rows written", path, rows_count
+            )
+            if on_chunk_written is not None:
+                await on_chunk_written(rows_count)
+    return kpi_ids, counts
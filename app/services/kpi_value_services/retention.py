@@ -0,0 +1,384 @@
+"""Retention and rollup of historical KPI values.
+
+Granularity with retention_seconds keeps raw historical KPI values only for retention_seconds.
+Older values are aggregated into rollup_granularity_id with rollup_aggregation, one value per object
+and bucket of rollup granularity seconds, or deleted if rollup is not set. If bucket already has value
+of rollup granularity, e.g. after late values, new aggregate is merged into it.
+Values without value_numeric, e.g. nan, are only counted by count aggregation, other aggregations skip them.
+They are deleted with other rolled up values, so they don't block the next windows.
+Values are processed in bounded batches, every batch is committed in separate transaction.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import (
+    BigInteger,
+    Float,
+    Integer,
+    String,
+    case,
+    delete,
+    func,
+    literal,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from services.kpi_value_services.copy_writer import get_natural_key
+from v1.database.database import session_maker
+from v1.database.schemas import KPI, Granularity, KPICurrentValue, KPIValue
+from v1.models.granularity import GranularityRollupAggregations
+from v1.models.kpi import KpiValTypes
+from v1.models.kpi_values import KPIValuesStates
+from v1.settings.config import (
+    KPI_VALUES_COMPACTION_BATCH_SIZE,
+    KPI_VALUES_COMPACTION_INTERVAL,
+)
+from v1.utils.val_type_columns import NUMERIC_VAL_TYPES
+
+ROLLUP_VAL_TYPES = NUMERIC_VAL_TYPES
+ROLLUP_AGGREGATION_FUNCTIONS = {
+    GranularityRollupAggregations.AVG.value: func.avg,
+    GranularityRollupAggregations.MIN.value: func.min,
+    GranularityRollupAggregations.MAX.value: func.max,
+}
+# any constant, same for all workers, so only one of them compacts granularity at the same time
+COMPACTION_LOCK_ID = 7_310_002
+
+
+def get_bucket_start(record_time: datetime, bucket_seconds: int) -> datetime:
+    """Returns start of bucket which contains record_time, buckets are aligned to unix epoch"""
+    timestamp = record_time.timestamp() // bucket_seconds * bucket_seconds
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+def get_bucket_start_expression(bucket_seconds: int):
+    """Same as get_bucket_start, but for KPIValue.record_time in db"""
+    epoch = func.extract("epoch", KPIValue.record_time)
+    return func.to_timestamp(
+        func.floor(epoch / bucket_seconds) * bucket_seconds
+    )
+
+
+def get_rollup_numeric_expression(val_type: str, aggregation: str):
+    """Returns aggregated value_numeric, int values stay int"""
+    if aggregation == GranularityRollupAggregations.COUNT.value:
+        return func.count(KPIValue.id)
+
+    value = ROLLUP_AGGREGATION_FUNCTIONS[aggregation](KPIValue.value_numeric)
+    if val_type == KpiValTypes.INT.value:
+        value = func.round(value)
+    return value
+
+
+def get_rollup_count_expression(aggregation: str):
+    """Returns count of raw values, which the aggregate is based on"""
+    if aggregation == GranularityRollupAggregations.COUNT.value:
+        return func.count(KPIValue.id)
+    return func.count(KPIValue.value_numeric)
+
+
+def get_existing_rollup_count_expression(existing):
+    return case(
+        (existing.value_numeric.is_(None), 0),
+        else_=func.coalesce(existing.rollup_count, 1),
+    )
+
+
+def get_merged_numeric_expression(
+    val_type: str, aggregation: str, existing, rolled_up
+):
+    """Returns existing rolled up value_numeric merged with the new rolled_up one of the same bucket.
+    Existing value without rollup_count, e.g. ingested directly into rollup granularity, counts as one value.
+    """
+    if aggregation == GranularityRollupAggregations.COUNT.value:
+        return (
+            func.coalesce(existing.value_numeric, 0) + rolled_up.value_numeric
+        )
+    if aggregation == GranularityRollupAggregations.MIN.value:
+        return func.least(existing.value_numeric, rolled_up.value_numeric)
+    if aggregation == GranularityRollupAggregations.MAX.value:
+        return func.greatest(existing.value_numeric, rolled_up.value_numeric)
+
+    existing_count = get_existing_rollup_count_expression(existing)
+    value = (
+        func.coalesce(existing.value_numeric, 0) * existing_count
+        + rolled_up.value_numeric * rolled_up.rollup_count
+    ) / (existing_count + rolled_up.rollup_count)
+    if val_type == KpiValTypes.INT.value:
+        value = func.round(value)
+    return value
+
+
+def get_rollup_value_expression(val_type: str, numeric_value):
+    """Returns numeric_value serialized in the same way as values of val_type"""
+    if val_type == KpiValTypes.FLOAT.value:
+        numeric_value = numeric_value.cast(Float)
+    return numeric_value.cast(String)
+
+
+def expired_kpi_values_conditions(granularity_id: int, before: datetime):
+    return (
+        KPIValue.granularity_id == granularity_id,
+        KPIValue.state == KPIValuesStates.HISTORICAL.value,
+        KPIValue.record_time < before,
+    )
+
+
+async def get_retention_policies(session: AsyncSession):
+    """Returns granularities with retention_seconds and info about their KPI and rollup granularity"""
+    rollup_granularity = aliased(Granularity)
+    stmt = (
+        select(
+            Granularity.id,
+            Granularity.retention_seconds,
+            Granularity.rollup_granularity_id,
+            Granularity.rollup_aggregation,
+            KPI.val_type,
+            KPI.multiple,
+            rollup_granularity.seconds.label("rollup_seconds"),
+        )
+        .join(KPI, KPI.id == Granularity.kpi_id)
+        .outerjoin(
+            rollup_granularity,
+            rollup_granularity.id == Granularity.rollup_granularity_id,
+        )
+        .where(Granularity.retention_seconds.is_not(None))
+        .order_by(Granularity.id)
+    )
+    res = await session.execute(stmt)
+    return res.all()
+
+
+async def lock_granularity_compaction(
+    session: AsyncSession, granularity_id: int
+) -> bool:
+    """Takes transaction lock of granularity compaction. Returns False if it is taken by another worker"""
+    stmt = select(
+        func.pg_try_advisory_xact_lock(
+            literal(COMPACTION_LOCK_ID, Integer),
+            literal(granularity_id, Integer),
+        )
+    )
+    res = await session.execute(stmt)
+    return res.scalar()
+
+
+async def delete_expired_kpi_values_batch(
+    session: AsyncSession,
+    granularity_id: int,
+    before: datetime,
+    batch_size: int,
+) -> int:
+    """Deletes up to batch_size historical KPI values older than before. Returns count of deleted values"""
+    batch = (
+        select(KPIValue.id, KPIValue.record_time)
+        .where(*expired_kpi_values_conditions(granularity_id, before))
+        .limit(batch_size)
+    )
+    stmt = delete(KPIValue).where(
+        tuple_(KPIValue.id, KPIValue.record_time).in_(batch)
+    )
+    res = await session.execute(
+        stmt, execution_options={"synchronize_session": False}
+    )
+    return res.rowcount
+
+
+async def get_rollup_window_end(
+    session: AsyncSession,
+    granularity_id: int,
+    before: datetime,
+    bucket_seconds: int,
+    batch_size: int,
+) -> datetime | None:
+    """Returns end of the oldest window of about batch_size KPI values to roll up, aligned to bucket end.
+    Returns None if there is nothing to roll up.
+    """
+    conditions = expired_kpi_values_conditions(granularity_id, before)
+    stmt = (
+        select(KPIValue.record_time)
+        .where(*conditions)
+        .order_by(KPIValue.record_time)
+        .offset(batch_size - 1)
+        .limit(1)
+    )
+    res = await session.execute(stmt)
+    last_record_time = res.scalar()
+    if last_record_time is None:
+        res = await session.execute(
+            select(KPIValue.id).where(*conditions).limit(1)
+        )
+        return before if res.scalar() is not None else None
+
+    window_end = get_bucket_start(last_record_time, bucket_seconds) + timedelta(
+        seconds=bucket_seconds
+    )
+    return min(window_end, before)
+
+
+async def rollup_kpi_values_batch(
+    session: AsyncSession, policy, before: datetime
+) -> int:
+    """Saves aggregated historical KPI values older than before into rollup granularity and deletes them.
+    Aggregates of buckets, which already have value of rollup granularity, are merged into it.
+    Returns count of rolled up values.
+    """
+    conditions = expired_kpi_values_conditions(policy.id, before)
+    bucket_start = get_bucket_start_expression(policy.rollup_seconds)
+    aggregation = (
+        policy.rollup_aggregation or GranularityRollupAggregations.AVG.value
+    )
+    numeric_value = get_rollup_numeric_expression(policy.val_type, aggregation)
+    rollup_count = get_rollup_count_expression(aggregation)
+    rollup = (
+        select(
+            KPIValue.kpi_id,
+            KPIValue.object_id,
+            literal(policy.rollup_granularity_id, BigInteger),
+            get_rollup_value_expression(policy.val_type, numeric_value),
+            bucket_start.label("bucket_start"),
+            literal(KPIValuesStates.HISTORICAL.value, String),
+            numeric_value,
+            rollup_count,
+        )
+        .where(*conditions)
+        .group_by(KPIValue.kpi_id, KPIValue.object_id, bucket_start)
+        # aggregate of bucket without numeric values is NULL, bucket is left without rollup value
+        .having(rollup_count > 0)
+    )
+    stmt = insert(KPIValue).from_select(
+        [
+            KPIValue.kpi_id,
+            KPIValue.object_id,
+            KPIValue.granularity_id,
+            KPIValue.value,
+            KPIValue.record_time,
+            KPIValue.state,
+            KPIValue.value_numeric,
+            KPIValue.rollup_count,
+        ],
+        rollup,
+    )
+    # bucket could already have value of rollup granularity, new aggregate is merged into it
+    merged_numeric_value = get_merged_numeric_expression(
+        policy.val_type, aggregation, KPIValue, stmt.excluded
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=get_natural_key(KPIValue.__table__.c),
+        set_={
+            "value": get_rollup_value_expression(
+                policy.val_type, merged_numeric_value
+            ),
+            "value_numeric": merged_numeric_value,
+            "rollup_count": get_existing_rollup_count_expression(KPIValue)
+            + stmt.excluded.rollup_count,
+        },
+    )
+    rolled_up = stmt.returning(KPIValue.id, KPIValue.value).cte("rolled_up")
+    # merged value could be the latest current value of object
+    stmt = (
+        update(KPICurrentValue)
+        .where(KPICurrentValue.kpi_value_id == rolled_up.c.id)
+        .values(value=rolled_up.c.value)
+    )
+    await session.execute(
+        stmt, execution_options={"synchronize_session": False}
+    )
+
+    stmt = delete(KPIValue).where(*conditions)
+    res = await session.execute(
+        stmt, execution_options={"synchronize_session": False}
+    )
+    return res.rowcount
+
+
+def can_rollup(policy) -> bool:
+    return (
+        policy.val_type in ROLLUP_VAL_TYPES
+        and not policy.multiple
+        and bool(policy.rollup_seconds)
+    )
+
+
+async def compact_granularity(
+    policy, batch_size: int = KPI_VALUES_COMPACTION_BATCH_SIZE
+) -> int:
+    """Applies retention policy of granularity. Returns count of rolled up or deleted KPI values"""
+    rollup = policy.rollup_granularity_id is not None
+    if rollup and not can_rollup(policy):
+        # values are kept, because they must not be deleted without rollup
+        logging.warning(
+            "KPI values of granularity with id = %s can't be rolled up, compaction skipped",
+            policy.id,
+        )
+        return 0
+
+    before = datetime.now(timezone.utc) - timedelta(
+        seconds=policy.retention_seconds
+    )
+    if rollup:
+        # only full buckets are rolled up
+        before = get_bucket_start(before, policy.rollup_seconds)
+
+    processed = 0
+    while True:
+        async with session_maker() as session:
+            if not await lock_granularity_compaction(session, policy.id):
+                return processed
+
+            if rollup:
+                window_end = await get_rollup_window_end(
+                    session,
+                    policy.id,
+                    before,
+                    policy.rollup_seconds,
+                    batch_size,
+                )
+                if window_end is None:
+                    return processed
+                count = await rollup_kpi_values_batch(
+                    session, policy, window_end
+                )
+            else:
+                count = await delete_expired_kpi_values_batch(
+                    session, policy.id, before, batch_size
+                )
+            await session.commit()
+
+        processed += count
+        if not count:
+            return processed
+
+
+async def compact_kpi_values():
+    """Applies retention policies of all granularities"""
+    async with session_maker() as session:
+        policies = await get_retention_policies(session)
+
+    for policy in policies:
+        processed = await compact_granularity(policy)
+        if processed:
+            logging.info(
+                "Compacted %s KPI values of granularity with id = %s",
+                processed,
+                policy.id,
+            )
+
+
+async def run_kpi_values_compaction():
+    """Applies retention policies periodically. Runs until cancelled."""
+    while True:
+        await asyncio.sleep(KPI_VALUES_COMPACTION_INTERVAL)
+        try:
+            await compact_kpi_values()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("KPI values compaction failed")
@@ -0,0 +1,139 @@
+"""Management of monthly range partitions of kpi_values.
+
+Every partition contains KPI values with record_time in [month start, next month start) in UTC.
+Values without suitable partition are stored in default partition, they are moved into
+the new partition when it is created.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from v1.database.database import session_maker
+from v1.database.schemas import KPIValue
+from v1.settings.config import (
+    KPI_VALUES_PARTITION_MAINTENANCE_INTERVAL,
+    KPI_VALUES_PARTITIONS_AHEAD_MONTHS,
+)
+
+KPI_VALUES_TABLE = KPIValue.__tablename__
+KPI_VALUES_DEFAULT_PARTITION = f"{KPI_VALUES_TABLE}_default"
+# any constant, same for all workers, so only one of them changes partitions at the same time
+PARTITION_MAINTENANCE_LOCK_ID = 7_310_001
+
+
+def get_month_start(value: datetime) -> datetime:
+    value = value.astimezone(timezone.utc) if value.tzinfo else value
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month_start: datetime, months: int) -> datetime:
+    month_index = month_start.month - 1 + months
+    return month_start.replace(
+        year=month_start.year + month_index // 12, month=month_index % 12 + 1
+    )
+
+
+def get_kpi_values_partition_name(month_start: datetime) -> str:
+    return f"{KPI_VALUES_TABLE}_y{month_start.year}m{month_start.month:02d}"
+
+
+async def partition_exists(session: AsyncSession, partition_name: str) -> bool:
+    stmt = text("SELECT EXISTS (SELECT 1 FROM pg_class WHERE relname = :name)")
+    res = await session.execute(stmt, dict(name=partition_name))
+    return res.scalar()
+
+
+async def create_kpi_values_default_partition(session: AsyncSession):
+    await session.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {KPI_VALUES_DEFAULT_PARTITION} "
+            f"PARTITION OF {KPI_VALUES_TABLE} DEFAULT"
+        )
+    )
+
+
+async def create_kpi_values_month_partition(
+    session: AsyncSession, month_start: datetime
+) -> str | None:
+    """Creates partition for month, if it does not exist. Returns name of created partition.
+    Partition is created as separate table and attached after rows of this month are moved
+    from default partition, because partition can't be created while default partition contains its rows.
+    """
+    partition_name = get_kpi_values_partition_name(month_start)
+    if await partition_exists(session, partition_name):
+        return None
+
+    bounds = dict(
+        month_start=month_start, next_month_start=add_months(month_start, 1)
+    )
+    await session.execute(
+        text(
+            f"CREATE TABLE {partition_name} "
+            f"(LIKE {KPI_VALUES_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    if await partition_exists(session, KPI_VALUES_DEFAULT_PARTITION):
+        await session.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {KPI_VALUES_DEFAULT_PARTITION} "
+                "WHERE record_time >= :month_start AND record_time < :next_month_start "
+                f"RETURNING *) INSERT INTO {partition_name} SELECT * FROM moved"
+            ),
+            bounds,
+        )
+    await session.execute(
+        text(
+            f"ALTER TABLE {KPI_VALUES_TABLE} ATTACH PARTITION {partition_name} "
+            f"FOR VALUES FROM ('{bounds['month_start'].isoformat()}') "
+            f"TO ('{bounds['next_month_start'].isoformat()}')"
+        )
+    )
+    return partition_name
+
+
+async def create_kpi_values_partitions(
+    session: AsyncSession,
+    months_ahead: int = KPI_VALUES_PARTITIONS_AHEAD_MONTHS,
+) -> list[str]:
+    """Creates default partition and partitions from current month to months_ahead.
+    Returns names of created month partitions. Transaction is not committed.
+    """
+    await session.execute(
+        select(func.pg_advisory_xact_lock(PARTITION_MAINTENANCE_LOCK_ID))
+    )
+    await create_kpi_values_default_partition(session)
+
+    current_month_start = get_month_start(datetime.now(timezone.utc))
+    created_partitions = []
+    for months in range(months_ahead + 1):
+        partition_name = await create_kpi_values_month_partition(
+            session, add_months(current_month_start, months)
+        )
+        if partition_name:
+            created_partitions.append(partition_name)
+    return created_partitions
+
+
+async def maintain_kpi_values_partitions():
+    """Creates missing partitions of kpi_values in separate transaction"""
+    async with session_maker() as session:
+        created_partitions = await create_kpi_values_partitions(session)
+        await session.commit()
+    if created_partitions:
+        logging.info("Created kpi_values partitions: %s", created_partitions)
+
+
+async def run_kpi_values_partition_maintenance():
+    """Pre-creates future partitions of kpi_values periodically. Runs until cancelled."""
+    while True:
+        await asyncio.sleep(KPI_VALUES_PARTITION_MAINTENANCE_INTERVAL)
+        try:
+            await maintain_kpi_values_partitions()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("kpi_values partition maintenance failed")
@@ -1,5 +1,6 @@
 from typing import Union
 
+from sqlalchemy import Executable, Row
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
 from v1.security.data.utils import add_security_data
@@ -35,6 +36,16 @@ async def get_session(request: Request = None):
         yield session
 
 
+async def fetch_core_rows(session: AsyncSession, stmt: Executable) -> list[Row]:
+    """Returns rows of column select, executed by session connection as Core statement.
+    Rows are not converted into ORM objects and do_orm_execute listeners are not called,
+    so it must be used only for tables without data permissions.
+    """
+    connection = await session.connection()
+    result = await connection.execute(stmt)
+    return result.all()
+
+
 def get_chunked_values_by_sqlalchemy_limit(
     some_list_with_values: Union[list, set, dict.keys],
 ) -> list[list]:
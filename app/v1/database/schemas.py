@@ -9,10 +9,16 @@ from sqlalchemy import (
     UniqueConstraint,
     CheckConstraint,
     ForeignKeyConstraint,
+    Index,
+    Numeric,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
+from decimal import Decimal
 from sqlalchemy import Column, Integer, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
+
+from v1.utils.val_type_columns import get_typed_value_columns
 
 Base = declarative_base()
 
@@ -88,6 +94,16 @@ class Granularity(Base):
     )
     name: str = Column(String, nullable=False)
     seconds: int = Column(Integer, nullable=True)
+    # historical values older than retention_seconds are rolled up into rollup_granularity_id
+    # with rollup_aggregation, or deleted if rollup is not set. Rollup granularity can't be
+    # deleted while it is used, otherwise rollup silently turns into deletion
+    retention_seconds: int = Column(Integer, nullable=True)
+    rollup_granularity_id: int = Column(
+        BigInteger,
+        ForeignKey("granularity.id", ondelete="RESTRICT"),
+        nullable=True,
+    )
+    rollup_aggregation: str = Column(String, nullable=True)
 
     kpi: Mapped["KPI"] = relationship("KPI", back_populates="granularities")
 
@@ -95,13 +111,16 @@ class Granularity(Base):
 
 
 class KPIValue(Base):
+    """KPI values are stored in table partitioned by range of record_time.
+    Table primary key must contain partition key, but KPI values are still identified by id.
+    """
+
     __tablename__ = "kpi_values"
-    id: int = Column("id", BigInteger, primary_key=True)
+    id: int = Column("id", BigInteger, primary_key=True, autoincrement=True)
     kpi_id: int = Column(
         BigInteger,
         ForeignKey("kpi.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     granularity_id: int = Column(
         BigInteger,
@@ -115,13 +134,73 @@ class KPIValue(Base):
         "record_time",
         TIMESTAMP(timezone=True),
         default=datetime.utcnow,
+        primary_key=True,
+        nullable=False,
         index=True,
     )
     state: str = Column("state", String, nullable=False, index=True)
+    # typed copies of value, see v1.utils.val_type_columns
+    value_numeric: Decimal = Column("value_numeric", Numeric, nullable=True)
+    value_bool: bool = Column("value_bool", Boolean, nullable=True)
+    value_datetime: datetime = Column(
+        "value_datetime", TIMESTAMP(timezone=True), nullable=True
+    )
+    value_json: list = Column("value_json", JSONB, nullable=True)
+    # count of raw values aggregated into value by retention rollup, see
+    # services.kpi_value_services.retention
+    rollup_count: int = Column("rollup_count", BigInteger, nullable=True)
+
+    __table_args__ = (
+        # natural key of KPI value and history of object KPI values, ordered by record_time,
+        # value is read from index. Imports upsert KPI values by this key. Planned value
+        # doesn't collide with actual value of the same record_time.
+        Index(
+            "uq_kpi_values_kpi_id_granularity_id_object_id_record_time",
+            kpi_id,
+            granularity_id,
+            object_id,
+            record_time.desc(),
+            (state == "planned").self_group(),
+            unique=True,
+            postgresql_include=["value"],
+        ),
+        # the latest current KPI values. Index can't be unique, because unique index of
+        # partitioned table must contain record_time, uniqueness is kept by kpi_current_values
+        Index(
+            "ix_kpi_values_current_kpi_id_object_id_granularity_id",
+            kpi_id,
+            object_id,
+            granularity_id,
+            record_time.desc(),
+            id.desc(),
+            postgresql_where=state == "current",
+        ),
+        # keyset pagination of KPI values of KPI by (record_time, id)
+        Index(
+            "ix_kpi_values_kpi_id_record_time_id",
+            kpi_id,
+            record_time,
+            id,
+        ),
+        {"postgresql_partition_by": "RANGE (record_time)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
+
+    @validates("record_time")
+    def validate_record_time(self, key, value):
+        # record_time is partition key, so it can't be null
+        return value if value is not None else datetime.utcnow()
 
     def serialize_before_save(self, serializer_func: callable):
         self.value = serializer_func(self.value)
 
+    def set_typed_values(self, val_type: str, multiple: bool):
+        """Fills typed columns from serialized value"""
+        for column_name, typed_value in get_typed_value_columns(
+            val_type, multiple, self.value
+        ).items():
+            setattr(self, column_name, typed_value)
+
     def deserialize_value(self, deserialize_func: callable):
         self.value = deserialize_func(self.value)
 
@@ -129,6 +208,76 @@ class KPIValue(Base):
         validate_func(self.value)
 
 
+class KPICurrentValue(Base):
+    """Latest KPI value with state = current for every (object_id, kpi_id, granularity_id)"""
+
+    __tablename__ = "kpi_current_values"
+    object_id: int = Column("object_id", Integer, primary_key=True)
+    kpi_id: int = Column(
+        BigInteger,
+        ForeignKey("kpi.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+    granularity_id: int = Column(
+        BigInteger,
+        ForeignKey("granularity.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    kpi_value_id: int = Column("kpi_value_id", BigInteger, nullable=False)
+    value: str = Column("value", String, nullable=False)
+    record_time: datetime = Column(
+        "record_time", TIMESTAMP(timezone=True), nullable=True
+    )
+
+
+class BatchJob(Base):
+    """Background job of batch operations, which is claimed by one of workers"""
+
+    __tablename__ = "batch_jobs"
+    id: int = Column("id", BigInteger, primary_key=True)
+    job_type: str = Column("job_type", String, nullable=False)
+    status: str = Column("status", String, nullable=False, index=True)
+    stage: str = Column("stage", String, nullable=True)
+    params: dict = Column("params", JSONB, nullable=False, default=dict)
+    processed_rows: int = Column(
+        "processed_rows", BigInteger, nullable=False, default=0
+    )
+    total_rows: int = Column("total_rows", BigInteger, nullable=True)
+    error: str = Column("error", String, nullable=True)
+    result: dict = Column("result", JSONB, nullable=True)
+    attempts: int = Column("attempts", Integer, nullable=False, default=0)
+    # failed job is retried not earlier than next_run_at
+    next_run_at: datetime = Column(
+        "next_run_at", TIMESTAMP(timezone=True), nullable=True
+    )
+    created_at: datetime = Column(
+        "created_at", TIMESTAMP(timezone=True), nullable=False
+    )
+    started_at: datetime = Column(
+        "started_at", TIMESTAMP(timezone=True), nullable=True
+    )
+    heartbeat_at: datetime = Column(
+        "heartbeat_at", TIMESTAMP(timezone=True), nullable=True
+    )
+    finished_at: datetime = Column(
+        "finished_at", TIMESTAMP(timezone=True), nullable=True
+    )
+
+
+class KPIValueImportBatch(Base):
+    """Imported batch with client batch_id, batch with the same batch_id is not imported twice"""
+
+    __tablename__ = "kpi_value_import_batches"
+    batch_id: str = Column("batch_id", String, primary_key=True)
+    inserted: int = Column("inserted", BigInteger, nullable=False)
+    updated: int = Column("updated", BigInteger, nullable=False)
+    skipped: int = Column("skipped", BigInteger, nullable=False)
+    created_at: datetime = Column(
+        "created_at", TIMESTAMP(timezone=True), nullable=False
+    )
+
+
 class PermissionTemplate(Base):
     __abstract__ = True
 
@@ -0,0 +1,41 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class BatchJobTypes(Enum):
+    KPI_VALUE_IMPORT = "kpi_value_import"
+    RELOAD_KPI_VALUE_STATUSES = "reload_kpi_value_statuses"
+
+
+class BatchJobStatuses(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class BatchJobStages(Enum):
+    WRITING_VALUES = "writing_values"
+    UPDATING_STATES = "updating_states"
+
+
+class BatchJobInfoModel(BaseModel):
+    id: int
+    job_type: str
+    status: str
+    stage: Optional[str]
+    processed_rows: int
+    total_rows: Optional[int]
+    error: Optional[str]
+    result: Optional[dict]
+    attempts: int
+    next_run_at: Optional[datetime]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
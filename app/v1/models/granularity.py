@@ -1,8 +1,16 @@
+from enum import Enum
 from typing import Optional
 
 from pydantic import BaseModel, Field
 
 
+class GranularityRollupAggregations(str, Enum):
+    AVG = "avg"
+    MIN = "min"
+    MAX = "max"
+    COUNT = "count"
+
+
 class GranularityBaseModel(BaseModel):
     id: int
 
@@ -11,6 +19,12 @@ class GranularityCreateModel(BaseModel):
     kpi_id: int = Field(gt=0)
     name: str = Field(min_length=1)
     seconds: Optional[int] = None
+    retention_seconds: Optional[int] = Field(default=None, gt=0)
+    rollup_granularity_id: Optional[int] = Field(default=None, gt=0)
+    rollup_aggregation: Optional[GranularityRollupAggregations] = None
+
+    class Config:
+        use_enum_values = True
 
 
 class GranularityInfoModel(GranularityCreateModel, GranularityBaseModel):
@@ -18,4 +32,10 @@ class GranularityInfoModel(GranularityCreateModel, GranularityBaseModel):
 
 
 class GranularityUpdateModel(BaseModel):
-    name: str = Field(min_length=1)
+    name: Optional[str] = Field(default=None, min_length=1)
+    retention_seconds: Optional[int] = Field(default=None, gt=0)
+    rollup_granularity_id: Optional[int] = Field(default=None, gt=0)
+    rollup_aggregation: Optional[GranularityRollupAggregations] = None
+
+    class Config:
+        use_enum_values = True
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Any
+from typing import List, Optional, Any
 from pydantic import BaseModel, Field
 
 
@@ -10,6 +10,13 @@ class KPIValuesStates(Enum):
     PLANNED = "planned"
 
 
+class KPIValuesConflictModes(Enum):
+    """What import does with KPI value, which has the same kpi_id, object_id, granularity_id and record_time"""
+
+    UPDATE = "update"
+    SKIP = "skip"
+
+
 class KPIValuesStatesPossibleToCreate(Enum):
     PLANNED = KPIValuesStates.PLANNED.value
     HISTORICAL = KPIValuesStates.HISTORICAL.value
@@ -46,3 +53,31 @@ class KPIValueModelInfo(KPIValuePlannedModelCreateByKPI, KPIValueModelBase):
 
     class Config:
         from_attributes = True
+
+
+class KPIValuesSeriesModel(BaseModel):
+    """KPI values of one KPI and object in columnar form, i-th items of lists belong to the same KPI value"""
+
+    kpi_id: int
+    object_id: int
+    id: List[int]
+    granularity_id: List[int]
+    value: List[Any]
+    record_time: List[datetime]
+    state: List[str]
+
+
+class KPIValuesExportFormats(str, Enum):
+    CSV = "csv"
+    PARQUET = "parquet"
+    ARROW_IPC = "arrow_ipc"
+
+
+class KPIValuesExportColumns(str, Enum):
+    OBJECT_ID = "object_id"
+    KPI_ID = "kpi_id"
+    GRANULARITY_ID = "granularity_id"
+    RECORD_TIME = "record_time"
+    VALUE = "value"
+    STATE = "state"
+    ID = "id"
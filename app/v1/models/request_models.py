@@ -3,6 +3,7 @@ from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
+from v1.models.kpi_values import KPIValuesStates
 from v1.routers.kpi_value.enum_models import AvailableKPIAggregations
 
 
@@ -13,3 +14,20 @@ class KPIAggrRequest(BaseModel):
     aggregation_type: AvailableKPIAggregations
     date_from: Optional[datetime] = None
     date_to: Optional[datetime] = None
+
+
+class KPIValuesBulkRequest(BaseModel):
+    kpi_ids: List[int] = Field(min_length=1)
+    object_ids: List[int] = Field(min_length=1)
+    granularity_ids: Optional[List[int]] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    state: Optional[KPIValuesStates] = None
+
+    class Config:
+        use_enum_values = True
+
+
+class ObjectStatesRequest(BaseModel):
+    object_ids: List[int] = Field(min_length=1)
+    kpi_ids: Optional[List[int]] = None
@@ -1,27 +1,51 @@
+import asyncio
 import io
+import os
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Query, Depends, UploadFile, File, HTTPException
+from fastapi import (
+    APIRouter,
+    Query,
+    Depends,
+    UploadFile,
+    File,
+    HTTPException,
+    Request,
+)
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from starlette.background import BackgroundTasks
 from starlette.responses import StreamingResponse
 
+from services.batch_job_services.service import create_batch_job
+from services.kpi_value_services.file_import import (
+    copy_upload_to_job_file,
+    save_data_frame_to_job_file,
+    validate_csv_file,
+)
+from services.kpi_value_services.export import (
+    EXPORT_FORMATS_MEDIA_TYPES,
+    stream_kpi_values,
+)
 from v1.database.database import get_session
-from v1.database.schemas import KPIValue
+from v1.database.schemas import BatchJob, KPIValue
 import pandas as pd
 
+from v1.models.batch_jobs import BatchJobInfoModel, BatchJobTypes
 from v1.models.kpi import KpiValTypes
-from v1.models.kpi_values import KPIValuesStatesPossibleToCreate
+from v1.models.kpi_values import (
+    KPIValuesConflictModes,
+    KPIValuesExportColumns,
+    KPIValuesExportFormats,
+    KPIValuesStatesPossibleToCreate,
+)
 from v1.routers.batch.utils import (
     CONTENT_TYPES_PANDAS_READER,
     process_file_data_for_batch_import,
     get_pandas_file_reader_or_raise_httperror,
     get_csv_delimiter,
-    update_state_for_all_objects,
-    fast_save_kpi_values_from_data_frame_with_reload_status,
 )
+from v1.routers.batch.validation import validate_int_column
 
 router = APIRouter(prefix="/batch", tags=["Batch operations"])
 
@@ -41,17 +65,29 @@ router = APIRouter(prefix="/batch", tags=["Batch operations"])
         f"value: {[x.value for x in KpiValTypes]},\n\n"
         "record_time: datetime - example 2000-12-12T00:00:00\n\n"
         f"state: {[x.value for x in KPIValuesStatesPossibleToCreate]}\n\n"
+        "streaming: CSV file is validated and saved in chunks with bounded memory, "
+        "Excel files are always read at once.\n\n"
+        "Valid file is saved by batch job, its progress is available by /batch/jobs/{job_id}.\n\n"
+        "KPI values are identified by kpi_id, object_id, granularity_id and record_time. "
+        "on_conflict: existing KPI values are updated or skipped.\n\n"
+        "batch_id: file with the same batch_id is imported once."
     ),
 )
 async def batch_import(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(),
+    streaming: bool = False,
+    on_conflict: KPIValuesConflictModes = KPIValuesConflictModes.UPDATE,
+    batch_id: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
 ):
-    file_data = file.file.read()
+    job_params = {"batch_id": batch_id, "conflict_mode": on_conflict.value}
     pandas_file_reader = get_pandas_file_reader_or_raise_httperror(
         file_mime_type=file.content_type
     )
+    if streaming and pandas_file_reader == pd.read_csv:
+        return await streaming_batch_import(file, session, job_params)
+
+    file_data = file.file.read()
     additional_data = dict()
     if pandas_file_reader == pd.read_csv:
         delimiter = get_csv_delimiter(file_data)
@@ -68,25 +104,71 @@ async def batch_import(
         raise HTTPException(status_code=422, detail=str(error_message))
 
     # if file is valid - save data
-    background_tasks.add_task(
-        fast_save_kpi_values_from_data_frame_with_reload_status,
-        response_df,
-        session,
+    path = await asyncio.to_thread(save_data_frame_to_job_file, response_df)
+    return await create_kpi_value_import_job(
+        path, session, job_params, len(response_df)
     )
+
+
+async def streaming_batch_import(
+    file: UploadFile, session: AsyncSession, job_params: dict
+):
+    """Validates CSV file chunk by chunk and creates job, which writes it"""
+    path = await asyncio.to_thread(copy_upload_to_job_file, file)
+    try:
+        await validate_csv_file(path, session)
+    except ValueError as error_message:
+        os.remove(path)
+        raise HTTPException(status_code=422, detail=str(error_message))
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return await create_kpi_value_import_job(path, session, job_params)
+
+
+async def create_kpi_value_import_job(
+    path: str,
+    session: AsyncSession,
+    job_params: dict,
+    total_rows: int | None = None,
+):
+    try:
+        job = await create_batch_job(
+            session,
+            BatchJobTypes.KPI_VALUE_IMPORT,
+            {**job_params, "path": path},
+            total_rows=total_rows,
+        )
+    except BaseException:
+        os.remove(path)
+        raise
     return {
         "status": "ok",
         "detail": "The file has been uploaded and "
         "will be processed in the background.",
+        "job_id": job.id,
     }
 
 
-@router.get("/kpi_value_export", status_code=200)
+@router.get(
+    "/kpi_value_export",
+    status_code=200,
+    description=(
+        "Exports KPI values as CSV, Parquet or Arrow IPC stream.\n\n"
+        f"Available columns {[x.value for x in KPIValuesExportColumns]}, all by default."
+    ),
+)
 async def batch_export(
     kpi_id: List[int] = Query(default=None),
     object_id: List[int] = Query(default=None),
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
-    session: AsyncSession = Depends(get_session),
+    export_format: KPIValuesExportFormats = Query(
+        default=KPIValuesExportFormats.CSV, alias="format"
+    ),
+    columns: List[KPIValuesExportColumns] = Query(default=None),
+    request: Request = None,
 ):
     where_conditions = []
 
@@ -102,16 +184,13 @@ async def batch_export(
     if date_to:
         where_conditions.append(KPIValue.record_time <= date_to)
 
+    if not columns:
+        columns = list(KPIValuesExportColumns)
+    # the same column could be requested several times
+    columns = dict.fromkeys(column.value for column in columns)
+
     stmt = (
-        select(
-            KPIValue.object_id,
-            KPIValue.kpi_id,
-            KPIValue.granularity_id,
-            KPIValue.record_time,
-            KPIValue.value,
-            KPIValue.state,
-            KPIValue.id,
-        )
+        select(*(getattr(KPIValue, column) for column in columns))
         .where(*where_conditions)
         .order_by(
             KPIValue.object_id,
@@ -120,26 +199,30 @@ async def batch_export(
             KPIValue.record_time,
         )
     )
-    res = await session.execute(stmt)
-    res = res.all()
-
-    df = pd.DataFrame(data=res)
-    output = io.BytesIO()
-    df.to_csv(output, index=False)
-    output.seek(0)
-    headers = {"Content-Disposition": 'attachment; filename="export_data.csv"'}
+    media_type, file_extension = EXPORT_FORMATS_MEDIA_TYPES[export_format.value]
+    headers = {
+        "Content-Disposition": f'attachment; filename="export_data.{file_extension}"'
+    }
 
-    return StreamingResponse(output, headers=headers)
+    return StreamingResponse(
+        stream_kpi_values(stmt, export_format.value, request),
+        media_type=media_type,
+        headers=headers,
+    )
 
 
 @router.post(
     "/reload_kpi_value_statuses_all",
     status_code=200,
-    description=("Reload status for all kpis"),
+    description=(
+        "Reload status for all kpis.\n\n"
+        "after_id: only objects and granularities with KPI values with id > after_id are recalculated, "
+        "all of them by default. Planned values keep their status."
+    ),
 )
 async def update_state(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(),
+    after_id: Optional[int] = None,
     session: AsyncSession = Depends(get_session),
 ):
     file_data = file.file.read()
@@ -163,10 +246,38 @@ async def update_state(
             detail=f"Please add required columns {required_columns}",
         )
 
+    errors = validate_int_column(request_df, "kpi_id")
+    if errors:
+        raise HTTPException(status_code=422, detail=" ".join(errors))
+
     # if file is valid - save data
-    background_tasks.add_task(update_state_for_all_objects, request_df, session)
+    kpi_ids = sorted({int(kpi_id) for kpi_id in request_df["kpi_id"]})
+    job = await create_batch_job(
+        session,
+        BatchJobTypes.RELOAD_KPI_VALUE_STATUSES,
+        {"kpi_ids": kpi_ids, "after_id": after_id},
+        total_rows=len(kpi_ids),
+    )
     return {
         "status": "ok",
         "detail": "The file has been uploaded and "
         "will be processed in the background.",
+        "job_id": job.id,
     }
+
+
+@router.get(
+    "/jobs/{job_id}",
+    status_code=200,
+    response_model=BatchJobInfoModel,
+    description="Returns status and progress of batch job",
+)
+async def get_batch_job(
+    job_id: int, session: AsyncSession = Depends(get_session)
+):
+    job = await session.get(BatchJob, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail=f"Batch job with id = {job_id} not found"
+        )
+    return job
@@ -1,22 +1,31 @@
+import asyncio
 import csv
 import io
-import math
+import logging
+from typing import Awaitable, Callable
 
 import pandas as pd
-from sqlalchemy import select, func, update, desc
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from pandas import DataFrame
 
-from v1.database.database import SQLALCHEMY_LIMIT
-from v1.database.schemas import KPIValue, KPI
-from v1.models.kpi_values import KPIValuesStates
-from v1.utils.val_type_serializers import get_serializer_func_for_kpi
-from sqlalchemy import and_, or_
-from datetime import datetime
+from services.kpi_value_services.current_state import (
+    get_touched_groups_batch,
+    recompute_states_for_groups,
+    refresh_current_values_for_groups,
+)
+from v1.database.database import session_maker
+from v1.database.schemas import KPI
 from v1.models.kpi_values import KPIValuesStatesPossibleToCreate
 from sqlalchemy.orm import selectinload
 
-from v1.utils.val_type_validators import get_value_validate_funct_for_kpi
+from v1.settings.config import STATE_RELOAD_CONCURRENCY
+from v1.routers.batch.validation import (
+    validate_datetime_column,
+    validate_enum_column,
+    validate_granularity_column,
+    validate_int_column,
+    validate_value_column,
+)
 
 
 def get_csv_delimiter(file_data: bytes):
@@ -53,224 +62,6 @@ def get_pandas_file_reader_or_raise_httperror(file_mime_type):
         )
 
 
-async def save_kpi_values_from_data_frame(df: DataFrame, session: AsyncSession):
-    """Creates KPI Values from DataFrame data"""
-    MAX_UPDATE_PER_STEP = 7500
-    MAX_KPI_VALUE_PER_STEP = 32000
-
-    kpi_ids = {int(kpi_id) for kpi_id in df["kpi_id"].unique()}
-    stmt = select(KPI).where(KPI.id.in_(kpi_ids))
-    kpis = await session.execute(stmt)
-    kpis = kpis.scalars().all()
-
-    cache_serializer_by_kpi = {
-        kpi.id: get_serializer_func_for_kpi(kpi.val_type, kpi.multiple)
-        for kpi in kpis
-    }
-
-    for index, row in df.iterrows():
-        kpi_id = int(row.kpi_id)
-        kpi_value = KPIValue(
-            kpi_id=kpi_id,
-            object_id=int(row.object_id),
-            value=row.value,
-            granularity_id=int(row.granularity_id),
-            record_time=datetime.fromisoformat(row.record_time),
-            state=row.state,
-        )
-
-        serializer = cache_serializer_by_kpi.get(kpi_id)
-        kpi_value.serialize_before_save(serializer)
-        session.add(kpi_value)
-
-        if index % 10000 == 0:
-            await session.flush()
-    await session.flush()
-
-    # change last kpi_value for particular kpi and object_id with state 'historical' to state 'current'
-    df_to_check = df[["kpi_id", "object_id", "granularity_id", "state"]]
-    df_to_check = df_to_check[
-        df_to_check["state"] == KPIValuesStates.HISTORICAL.value
-    ]
-
-    if not df_to_check.empty:
-        data = df_to_check.groupby(["kpi_id", "object_id", "granularity_id"])
-        where_condition_current = []
-
-        where_condition_historical = []
-
-        for x in data:
-            kp_id, object_id, granularity_id = (
-                int(x[0][0]),
-                int(x[0][1]),
-                int(x[0][2]),
-            )
-            where_condition_current.append(
-                and_(
-                    KPIValue.kpi_id == kp_id,
-                    KPIValue.object_id == object_id,
-                    KPIValue.granularity_id == granularity_id,
-                    KPIValue.state == KPIValuesStates.CURRENT.value,
-                )
-            )
-
-            where_condition_historical.append(
-                and_(
-                    KPIValue.kpi_id == kp_id,
-                    KPIValue.object_id == object_id,
-                    KPIValue.granularity_id == granularity_id,
-                    KPIValue.state == KPIValuesStates.HISTORICAL.value,
-                )
-            )
-
-        steps = math.ceil(len(where_condition_current) / MAX_UPDATE_PER_STEP)
-
-        for step in range(steps):
-            start = step * MAX_UPDATE_PER_STEP
-            end = start + MAX_UPDATE_PER_STEP
-
-            step_where_conditions = where_condition_current[start:end]
-
-            stmt = select(KPIValue).where(or_(*step_where_conditions))
-            step_kpi_values = await session.execute(stmt)
-            step_kpi_values = step_kpi_values.scalars().all()
-
-            for step_kpi_v in step_kpi_values:
-                step_kpi_v.state = KPIValuesStates.HISTORICAL.value
-                session.add(step_kpi_v)
-            await session.flush()
-
-        all_kpi_value_id_to_update = list()
-        steps = math.ceil(len(where_condition_historical) / MAX_UPDATE_PER_STEP)
-        for step in range(steps):
-            start = step * MAX_UPDATE_PER_STEP
-            end = start + MAX_UPDATE_PER_STEP
-
-            step_where_condition_historical = where_condition_historical[
-                start:end
-            ]
-
-            stmt = (
-                select(
-                    KPIValue.kpi_id,
-                    KPIValue.object_id,
-                    KPIValue.granularity_id,
-                    func.max(KPIValue.record_time),
-                    func.max(KPIValue.id),
-                )
-                .where(or_(*step_where_condition_historical))
-                .group_by(
-                    KPIValue.kpi_id, KPIValue.object_id, KPIValue.granularity_id
-                )
-            )
-
-            step_kpi_value_id_to_update = await session.execute(stmt)
-            step_kpi_value_id_to_update = step_kpi_value_id_to_update.all()
-
-            all_kpi_value_id_to_update.extend(
-                [item[4] for item in step_kpi_value_id_to_update]
-            )
-
-        steps = math.ceil(
-            len(all_kpi_value_id_to_update) / MAX_KPI_VALUE_PER_STEP
-        )
-        for step in range(steps):
-            start = step * MAX_KPI_VALUE_PER_STEP
-            end = start + MAX_KPI_VALUE_PER_STEP
-
-            step_kpi_value_id_to_update = all_kpi_value_id_to_update[start:end]
-
-            stmt = select(KPIValue).where(
-                KPIValue.id.in_(step_kpi_value_id_to_update)
-            )
-            step_kpi_values = await session.execute(stmt)
-            step_kpi_values = step_kpi_values.scalars().all()
-
-            for kpi_value in step_kpi_values:
-                kpi_value.state = KPIValuesStates.CURRENT.value
-                session.add(kpi_value)
-
-            await session.flush()
-    await session.commit()
-
-
-def validate_int_from_df(iteration: int, column_name: str, value: str):
-    try:
-        converted_value = int(value)
-    except BaseException:
-        raise ValueError(
-            f"Error in column - {column_name}, line - {iteration + 1} "
-            f"invalid value - {value}. "
-            f"The values of the {column_name} column must be integers. "
-        )
-    if float(value) != float(converted_value):
-        raise ValueError(
-            f"Error in column - {column_name}, line - {iteration + 1} "
-            f"invalid value - {value}. "
-            f"The values of the {column_name} column must be integers. "
-        )
-    return converted_value
-
-
-def validate_enum_values_from_df(
-    iteration: int, column_name: str, value: str, allowed_values: dict
-):
-    if not allowed_values.get(value):
-        raise ValueError(
-            f"Error in column - {column_name}, line - {iteration + 1} "
-            f"invalid value - {value}. "
-            f"Allowed values: {list(allowed_values)}"
-        )
-    return value
-
-
-def validate_datetime_from_df(iteration: int, column_name: str, value: str):
-    try:
-        datetime.fromisoformat(value)
-        return value
-    except BaseException:
-        raise ValueError(
-            f"Error in column - {column_name}, line - {iteration + 1} "
-            f"invalid value - {value}. "
-            f"Datetime value must be in ISO 8601 format."
-        )
-
-
-def validate_kpi_value_from_df(
-    iteration: int, kpi_id: str, validator_cache: dict, value: str
-):
-    kpi_id = int(kpi_id)
-    kpi_data = validator_cache.get(kpi_id)
-    try:
-        kpi_data["validate_func"](value)
-    except BaseException:
-        raise ValueError(
-            f"Error in column - value, line - {iteration + 1} "
-            f"invalid value - {value}. "
-            f"This value is invalid for KPI with settings:"
-            f" id = {kpi_id}, val_type = {kpi_data['val_type']}, "
-            f"multiple = {kpi_data['multiple']}."
-        )
-
-
-def validate_granularity_from_df(
-    iteration: int, kpi_id: str, granularities_cache: dict, granularity_id: str
-):
-    kpi_id = int(kpi_id)
-
-    granularity_id = validate_int_from_df(
-        iteration=iteration, column_name="granularity_id", value=granularity_id
-    )
-
-    if granularities_cache[kpi_id].get(granularity_id) is None:
-        raise ValueError(
-            f"Error in column - granularity_id, line - {iteration + 1} "
-            f"invalid value - {granularity_id}. "
-            f"Granularity with id = {granularity_id} "
-            f"not founded for KPI with id = {kpi_id}"
-        )
-
-
 async def process_file_data_for_batch_import(df_file_data, session):
     required_columns = {
         "kpi_id",
@@ -281,8 +72,7 @@ async def process_file_data_for_batch_import(df_file_data, session):
         "state",
     }
 
-    allowed_states = {x.value: x.value for x in KPIValuesStatesPossibleToCreate}
-    # if csv get delimiter
+    allowed_states = {x.value for x in KPIValuesStatesPossibleToCreate}
 
     columns = list(df_file_data.columns)
 
@@ -290,11 +80,13 @@ async def process_file_data_for_batch_import(df_file_data, session):
     if difference:
         raise ValueError(f"Missing required columns: {difference}!")
 
-    # validate kpi_id
-    kpi_ids = {
-        validate_int_from_df(i, "kpi_id", x)
-        for i, x in enumerate(df_file_data["kpi_id"])
-    }
+    # validate kpi_id, other columns can't be validated without KPIs
+    errors = validate_int_column(df_file_data, "kpi_id")
+    if errors:
+        raise ValueError(" ".join(errors))
+    kpi_id_column = df_file_data["kpi_id"].astype("int64")
+    kpi_ids = {int(kpi_id) for kpi_id in kpi_id_column.unique()}
+
     stmt = (
         select(KPI)
         .where(KPI.id.in_(kpi_ids))
@@ -303,187 +95,93 @@ async def process_file_data_for_batch_import(df_file_data, session):
     kpis = await session.execute(stmt)
     kpis = kpis.scalars().all()
 
-    validator_cache = {
-        kpi.id: dict(
-            validate_func=get_value_validate_funct_for_kpi(
-                kpi.val_type, kpi.multiple
-            ),
-            val_type=kpi.val_type,
-            multiple=kpi.multiple,
-        )
-        for kpi in kpis
-    }
-
-    granularities_cache = {
-        kpi.id: {gr.id: True for gr in kpi.granularities} for kpi in kpis
+    kpis_settings = {kpi.id: (kpi.val_type, kpi.multiple) for kpi in kpis}
+    granularities_by_kpi = {
+        kpi.id: {gr.id for gr in kpi.granularities} for kpi in kpis
     }
 
     # check if all kpi exist
-    kpi_ids_from_db = set(validator_cache)
+    kpi_ids_from_db = set(kpis_settings)
     if not kpi_ids == kpi_ids_from_db:
         raise ValueError(
             f"Error in column 'kpi_id'. KPIs with ids: {kpi_ids - kpi_ids_from_db} not exist"
         )
 
-    iter_data = enumerate(
-        zip(
-            df_file_data["kpi_id"],
-            df_file_data["object_id"],
-            df_file_data["granularity_id"],
-            df_file_data["value"],
-            df_file_data["record_time"],
-            df_file_data["state"],
-        )
-    )
-
-    [
-        (
-            validate_int_from_df(
-                iteration=i, column_name="object_id", value=values[1]
-            ),
-            validate_granularity_from_df(
-                iteration=i,
-                kpi_id=values[0],
-                granularities_cache=granularities_cache,
-                granularity_id=values[2],
-            ),
-            validate_kpi_value_from_df(
-                iteration=i,
-                kpi_id=values[0],
-                validator_cache=validator_cache,
-                value=values[3],
-            ),
-            validate_datetime_from_df(
-                iteration=i, column_name="record_time", value=values[4]
-            ),
-            validate_enum_values_from_df(
-                iteration=i,
-                column_name="state",
-                value=values[5],
-                allowed_values=allowed_states,
-            ),
-        )
-        for i, values in iter_data
+    errors = [
+        *validate_int_column(df_file_data, "object_id"),
+        *validate_granularity_column(
+            df_file_data, kpi_id_column, granularities_by_kpi
+        ),
+        *validate_value_column(df_file_data, kpi_id_column, kpis_settings),
+        *validate_datetime_column(df_file_data, "record_time"),
+        *validate_enum_column(df_file_data, "state", allowed_states),
     ]
+    if errors:
+        raise ValueError(" ".join(errors))
 
     return df_file_data
 
 
-async def update_state_for_all_objects(df: DataFrame, session: AsyncSession):
-    kpi_ids = {
-        validate_int_from_df(i, "kpi_id", x) for i, x in enumerate(df["kpi_id"])
-    }
-    stmt = (
-        select(KPI)
-        .where(KPI.id.in_(kpi_ids))
-        .options(selectinload(KPI.granularities))
-    )
-    kpis = await session.execute(stmt)
-    kpis = kpis.scalars().all()
-
-    kpi_ids = [kpi.id for kpi in kpis]
-
-    # all kpi values state current to historical
-    stmt = (
-        update(KPIValue)
-        .where(
-            KPIValue.kpi_id.in_(kpi_ids),
-            KPIValue.state == KPIValuesStates.CURRENT.value,
-        )
-        .values(state=KPIValuesStates.HISTORICAL.value)
-    )
-    await session.execute(stmt)
-    await session.commit()
-    print("All current become historical")
-
-    # all kpi values state historical with max datetime become current
-    for kpi_id in kpi_ids:
-        subq = (
-            select(
-                KPIValue.id.label("kpi_value_id"),
-                func.rank()
-                .over(
-                    partition_by=(
-                        KPIValue.kpi_id,
-                        KPIValue.granularity_id,
-                        KPIValue.object_id,
-                    ),
-                    order_by=desc(KPIValue.record_time),
-                )
-                .label("rank"),
-            )
-            .where(KPIValue.kpi_id == kpi_id)
-            .subquery()
-        )
-        stmt = (
-            select(subq.c.kpi_value_id)
-            .where(subq.c.rank == 1)
-            .execution_options(yield_per=SQLALCHEMY_LIMIT)
-        )
-
-        stream = await session.stream_scalars(stmt)
-        async for kpi_data in stream.yield_per(SQLALCHEMY_LIMIT).partitions(
-            SQLALCHEMY_LIMIT
+async def update_state_for_kpi(
+    kpi_id: int, after_id: int | None, semaphore: asyncio.Semaphore
+) -> int:
+    """Recalculates states of KPI values of one KPI in its own session.
+    Every batch of groups is committed in separate transaction. Returns count of changed KPI values.
+    """
+    changed_count = 0
+    last_group = None
+    async with semaphore, session_maker() as session:
+        while batch := await get_touched_groups_batch(
+            session, [kpi_id], after_id, last_group
         ):
-            update_stmt = (
-                update(KPIValue)
-                .where(KPIValue.id.in_(kpi_data))
-                .values(state=KPIValuesStates.CURRENT.value)
-            )
-            await session.execute(update_stmt)
-            await session.flush()
-    await session.commit()
-    print("All max kpi values  become current")
-
-
-async def fast_save_kpi_values_from_data_frame_with_reload_status(
-    df: DataFrame, session: AsyncSession
+            groups = [
+                (kpi_id, object_id, granularity_id)
+                for kpi_id, granularity_id, object_id in batch
+            ]
+            changed_count += await recompute_states_for_groups(session, groups)
+            await refresh_current_values_for_groups(session, groups)
+            await session.commit()
+            last_group = batch[-1]
+    return changed_count
+
+
+async def update_state_for_all_objects(
+    kpi_ids: list[int],
+    session: AsyncSession,
+    after_id: int | None = None,
+    on_kpi_updated: Callable[[int, int], Awaitable] | None = None,
 ):
-    """Creates KPI Values from DataFrame data but dont add status current"""
+    """Recalculates states of KPI values of existing KPIs from kpi_ids, planned values are not changed.
+    With after_id only groups with KPI values with id > after_id are recalculated.
+    Up to STATE_RELOAD_CONCURRENCY KPIs are recalculated at the same time, each in its own session.
+    If one of them fails, the others are cancelled and its error is raised.
+    on_kpi_updated is called with KPI id and count of KPIs updated so far.
+    """
+    stmt = select(KPI.id).where(KPI.id.in_(kpi_ids)).order_by(KPI.id)
+    kpi_ids = await session.execute(stmt)
+    kpi_ids = kpi_ids.scalars().all()
+
+    semaphore = asyncio.Semaphore(STATE_RELOAD_CONCURRENCY)
+    updated_kpis_count = 0
+
+    async def update_kpi(kpi_id: int):
+        nonlocal updated_kpis_count
+        changed_count = await update_state_for_kpi(kpi_id, after_id, semaphore)
+        updated_kpis_count += 1
+        logging.info(
+            "States of KPI with id = %s reloaded, %s kpi values changed (%s/%s KPIs)",
+            kpi_id,
+            changed_count,
+            updated_kpis_count,
+            len(kpi_ids),
+        )
+        if on_kpi_updated is not None:
+            await on_kpi_updated(kpi_id, updated_kpis_count)
 
-    kpi_ids = {int(kpi_id) for kpi_id in df["kpi_id"].unique()}
-    stmt = select(KPI).where(KPI.id.in_(kpi_ids))
-    kpis = await session.execute(stmt)
-    kpis = kpis.scalars().all()
-
-    cache_serializer_by_kpi = {
-        kpi.id: get_serializer_func_for_kpi(kpi.val_type, kpi.multiple)
-        for kpi in kpis
-    }
-
-    iter_data = enumerate(
-        zip(
-            df["kpi_id"],
-            df["object_id"],
-            df["granularity_id"],
-            df["record_time"],
-            df["state"],
-            df["value"],
-        )
-    )
-
-    for index, row in iter_data:
-        kpi_id = int(row[0])
-        object_id = int(row[1])
-        granularity_id = int(row[2])
-        record_time = row[3]
-        state = row[4]
-        value = row[5]
-        kpi_value = KPIValue(
-            kpi_id=kpi_id,
-            object_id=object_id,
-            value=value,
-            granularity_id=granularity_id,
-            record_time=datetime.fromisoformat(record_time),
-            state=state,
-        )
-
-        serializer = cache_serializer_by_kpi.get(kpi_id)
-        kpi_value.serialize_before_save(serializer)
-        session.add(kpi_value)
-
-        if index % 10000 == 0:
-            await session.flush()
-    await session.commit()
-
-    await update_state_for_all_objects(df, session)
+    try:
+        # if reload of one KPI fails, reloads of other KPIs are cancelled
+        async with asyncio.TaskGroup() as task_group:
+            for kpi_id in kpi_ids:
+                task_group.create_task(update_kpi(kpi_id))
+    except ExceptionGroup as error_group:
+        raise error_group.exceptions[0]
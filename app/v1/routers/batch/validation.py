@@ -0,0 +1,238 @@
+"""Vectorized validation of batch import files.
+
+Columns are checked with pandas column operations instead of validating file row by row.
+All invalid lines are collected, error message contains the first MAX_REPORTED_ERRORS lines per column.
+"""
+
+from datetime import datetime
+
+import pandas as pd
+from pandas import DataFrame, Series
+
+from v1.models.kpi import KpiValTypes
+from v1.utils.val_type_validators import (
+    NUL_CHARACTER,
+    get_value_validate_funct_for_kpi,
+)
+
+MAX_REPORTED_ERRORS = 10
+
+INT_PATTERN = r"\s*[+-]?\d+\s*"
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+# date and time are required, offset is optional. Value must be also accepted by datetime.fromisoformat
+ISO_DATETIME_PATTERN = (
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}(:?\d{2})?)?"
+)
+NAN_STRINGS = {"nan", "+nan", "-nan"}
+BOOL_STRINGS = {"False", "True"}
+
+
+def get_column_error(
+    column: Series, invalid_mask: Series, column_name: str, reason: str
+) -> str:
+    """Returns error message with the first MAX_REPORTED_ERRORS invalid lines of column"""
+    invalid_values = column[invalid_mask]
+    lines = [
+        position + 1 for position in invalid_values.index[:MAX_REPORTED_ERRORS]
+    ]
+    values = invalid_values.iloc[:MAX_REPORTED_ERRORS].tolist()
+    more = len(invalid_values) - len(lines)
+    more_message = f" and {more} more" if more > 0 else ""
+    return (
+        f"Error in column - {column_name}, lines - {lines}{more_message} "
+        f"invalid values - {values}. {reason}"
+    )
+
+
+def get_invalid_int_mask(column: Series) -> Series:
+    try:
+        # the same conversion as int(value) for every value
+        column.astype("int64")
+    except (ValueError, TypeError, OverflowError):
+        pass
+    else:
+        return pd.Series(False, index=column.index)
+
+    invalid_mask = ~column.astype("string").str.fullmatch(INT_PATTERN).fillna(
+        False
+    ).astype(bool)
+    # values out of int64 range can't be saved
+    candidates = column[~invalid_mask]
+    invalid_mask[candidates.index] = ~candidates.map(
+        lambda value: INT64_MIN <= int(value) <= INT64_MAX
+    ).astype(bool)
+    return invalid_mask
+
+
+def get_invalid_float_mask(column: Series) -> Series:
+    try:
+        # the same conversion as float(value) for every value
+        column.astype("float64")
+    except (ValueError, TypeError):
+        pass
+    else:
+        return pd.Series(False, index=column.index)
+
+    invalid_mask = (
+        pd.to_numeric(column, errors="coerce").isna() & column.notna()
+    )
+    # float() accepts nan
+    candidates = column[invalid_mask].astype("string").str.strip().str.lower()
+    invalid_mask[candidates.index[candidates.isin(NAN_STRINGS)]] = False
+    return invalid_mask
+
+
+def get_invalid_bool_mask(column: Series) -> Series:
+    return ~column.isin(BOOL_STRINGS)
+
+
+def get_invalid_date_mask(column: Series) -> Series:
+    return pd.to_datetime(column, format="%Y-%m-%d", errors="coerce").isna()
+
+
+def is_invalid_isoformat(value) -> bool:
+    try:
+        datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        return True
+    return False
+
+
+def get_invalid_isoformat_mask(column: Series) -> Series:
+    """Returns mask of values, which are rejected by datetime.fromisoformat, like by datetime validator"""
+    return column.map(is_invalid_isoformat).astype(bool)
+
+
+def get_invalid_datetime_mask(column: Series) -> Series:
+    """Returns mask of values, which are not full ISO 8601 datetimes.
+    Values are parsed by datetime.fromisoformat, like by import writer.
+    """
+    invalid_mask = ~column.astype("string").str.fullmatch(
+        ISO_DATETIME_PATTERN
+    ).fillna(False).astype(bool)
+    candidates = column[~invalid_mask]
+    invalid_mask[candidates.index] = get_invalid_isoformat_mask(candidates)
+    return invalid_mask
+
+
+INVALID_VALUE_MASK_FUNCTIONS = {
+    KpiValTypes.INT.value: get_invalid_int_mask,
+    KpiValTypes.FLOAT.value: get_invalid_float_mask,
+    KpiValTypes.BOOL.value: get_invalid_bool_mask,
+    KpiValTypes.DATE.value: get_invalid_date_mask,
+    KpiValTypes.DATETIME.value: get_invalid_isoformat_mask,
+}
+
+
+def get_invalid_values_mask(
+    column: Series, val_type: str, multiple: bool
+) -> Series:
+    """Returns mask of values, which are invalid for KPI with val_type and multiple"""
+    if not multiple:
+        if val_type == KpiValTypes.STR.value:
+            return column.str.contains(NUL_CHARACTER, regex=False, na=False)
+        if val_type in INVALID_VALUE_MASK_FUNCTIONS:
+            return INVALID_VALUE_MASK_FUNCTIONS[val_type](column)
+
+    # multiple values are validated by regular validator
+    validator = get_value_validate_funct_for_kpi(val_type, multiple)
+
+    def is_invalid(value) -> bool:
+        try:
+            validator(value)
+        except BaseException:
+            return True
+        return False
+
+    return column.map(is_invalid).astype(bool)
+
+
+def validate_int_column(df: DataFrame, column_name: str) -> list[str]:
+    invalid_mask = get_invalid_int_mask(df[column_name])
+    if not invalid_mask.any():
+        return []
+    return [
+        get_column_error(
+            df[column_name],
+            invalid_mask,
+            column_name,
+            f"The values of the {column_name} column must be integers.",
+        )
+    ]
+
+
+def validate_enum_column(
+    df: DataFrame, column_name: str, allowed_values: set
+) -> list[str]:
+    invalid_mask = ~df[column_name].isin(allowed_values)
+    if not invalid_mask.any():
+        return []
+    return [
+        get_column_error(
+            df[column_name],
+            invalid_mask,
+            column_name,
+            f"Allowed values: {list(allowed_values)}",
+        )
+    ]
+
+
+def validate_datetime_column(df: DataFrame, column_name: str) -> list[str]:
+    invalid_mask = get_invalid_datetime_mask(df[column_name])
+    if not invalid_mask.any():
+        return []
+    return [
+        get_column_error(
+            df[column_name],
+            invalid_mask,
+            column_name,
+            "Datetime value must be in ISO 8601 format.",
+        )
+    ]
+
+
+def validate_granularity_column(
+    df: DataFrame, kpi_ids: Series, granularities_by_kpi: dict[int, set[int]]
+) -> list[str]:
+    """Validates granularity_id values and checks that granularity belongs to KPI of the line"""
+    errors = validate_int_column(df, "granularity_id")
+    if errors:
+        return errors
+
+    granularity_ids = df["granularity_id"].astype("int64")
+    invalid_mask = ~granularity_ids.groupby(kpi_ids).transform(
+        lambda group: group.isin(granularities_by_kpi[group.name])
+    )
+    if not invalid_mask.any():
+        return []
+    return [
+        get_column_error(
+            granularity_ids,
+            invalid_mask,
+            "granularity_id",
+            "Granularity not founded for KPI of the line.",
+        )
+    ]
+
+
+def validate_value_column(
+    df: DataFrame, kpi_ids: Series, kpis_settings: dict[int, tuple[str, bool]]
+) -> list[str]:
+    """Validates values grouped by KPI, every KPI group is checked by its val_type"""
+    errors = []
+    for kpi_id, kpi_values in df["value"].groupby(kpi_ids, sort=True):
+        val_type, multiple = kpis_settings[kpi_id]
+        invalid_mask = get_invalid_values_mask(kpi_values, val_type, multiple)
+        if invalid_mask.any():
+            errors.append(
+                get_column_error(
+                    kpi_values,
+                    invalid_mask,
+                    "value",
+                    f"This value is invalid for KPI with settings:"
+                    f" id = {kpi_id}, val_type = {val_type}, "
+                    f"multiple = {multiple}.",
+                )
+            )
+    return errors
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from services.kpi_services.cache import mark_kpi_metadata_changed
 from v1.database.database import get_session
 from v1.database.schemas import Granularity
 from v1.models.granularity import (
@@ -11,7 +12,11 @@ from v1.models.granularity import (
     GranularityCreateModel,
     GranularityUpdateModel,
 )
-from v1.routers.granularity.utils import get_granularity_by_id_or_raise_error
+from v1.routers.granularity.utils import (
+    get_granularity_by_id_or_raise_error,
+    raise_error_if_granularity_is_rollup_target,
+    validate_granularity_rollup,
+)
 from v1.routers.kpi.utils import get_kpi_by_id_or_raise_error
 
 router = APIRouter(prefix="/granularity", tags=["Granularity"])
@@ -45,10 +50,15 @@ async def create_granularity_for_particular_kpi(
             detail=f"Granularity named {granularity.name} already exists",
         )
 
+    await validate_granularity_rollup(
+        granularity.kpi_id, granularity.rollup_granularity_id, session
+    )
+
     granularity_to_save = Granularity(
         **granularity.model_dump(exclude_unset=True)
     )
     session.add(granularity_to_save)
+    await mark_kpi_metadata_changed(session, [granularity.kpi_id])
     await session.commit()
     await session.refresh(granularity_to_save)
 
@@ -70,7 +80,9 @@ async def delete_granularity_by_id(
     granularity_id: int, session: AsyncSession = Depends(get_session)
 ):
     res = await get_granularity_by_id_or_raise_error(granularity_id, session)
+    await raise_error_if_granularity_is_rollup_target(granularity_id, session)
     await session.delete(res)
+    await mark_kpi_metadata_changed(session, [res.kpi_id])
     await session.commit()
     return {
         "msg": f"Granularity with id - {granularity_id} has been successfully deleted."
@@ -89,21 +101,33 @@ async def partial_update_granularity_by_id(
         granularity_id, session
     )
 
-    # check if granularity with new name already exists
-    stmt = select(Granularity).where(
-        Granularity.name == granularity.name,
-        Granularity.kpi_id == granularity_from_db.kpi_id,
-    )
-    granularity_exist = await session.execute(stmt)
-    granularity_exist = granularity_exist.scalars().first()
-
-    if granularity_exist and granularity_exist.id != granularity_from_db.id:
-        raise HTTPException(
-            status_code=422,
-            detail=f"Granularity named {granularity.name} already exists",
+    data_to_update = granularity.model_dump(exclude_unset=True)
+    if data_to_update.get("name") is None:
+        data_to_update.pop("name", None)
+    else:
+        # check if granularity with new name already exists
+        stmt = select(Granularity).where(
+            Granularity.name == granularity.name,
+            Granularity.kpi_id == granularity_from_db.kpi_id,
+        )
+        granularity_exist = await session.execute(stmt)
+        granularity_exist = granularity_exist.scalars().first()
+
+        if granularity_exist and granularity_exist.id != granularity_from_db.id:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Granularity named {granularity.name} already exists",
+            )
+
+    if "rollup_granularity_id" in data_to_update:
+        await validate_granularity_rollup(
+            granularity_from_db.kpi_id,
+            data_to_update["rollup_granularity_id"],
+            session,
+            granularity_id=granularity_id,
         )
 
-    for k, v in granularity.model_dump(exclude_unset=True).items():
+    for k, v in data_to_update.items():
         setattr(granularity_from_db, k, v)
 
     session.add(granularity_from_db)
@@ -2,6 +2,8 @@ from fastapi import HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from services.kpi_services.cache import get_kpi_metadata_or_raise_error
+from services.kpi_value_services.retention import ROLLUP_VAL_TYPES
 from v1.database.schemas import Granularity
 
 
@@ -18,3 +20,76 @@ async def get_granularity_by_id_or_raise_error(
         raise HTTPException(status_code=404, detail="Granularity not founded.")
 
     return res
+
+
+async def validate_granularity_rollup(
+    kpi_id: int,
+    rollup_granularity_id: int | None,
+    session: AsyncSession,
+    granularity_id: int | None = None,
+):
+    """Raises error if KPI values of kpi_id can't be rolled up into rollup_granularity_id."""
+    if rollup_granularity_id is None:
+        return
+
+    if rollup_granularity_id == granularity_id:
+        raise HTTPException(
+            status_code=422,
+            detail="Granularity can't be rolled up into itself",
+        )
+
+    kpi = await get_kpi_metadata_or_raise_error(kpi_id, session)
+    if kpi.multiple or kpi.val_type not in ROLLUP_VAL_TYPES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Values of KPI with id = {kpi_id} can't be rolled up. "
+            f"Only single values of types {sorted(ROLLUP_VAL_TYPES)} are supported",
+        )
+
+    rollup_granularity = await get_granularity_by_id_or_raise_error(
+        rollup_granularity_id, session
+    )
+    if rollup_granularity.kpi_id != kpi_id:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Granularity with id = {rollup_granularity_id} belongs to another KPI",
+        )
+    if not rollup_granularity.seconds:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Granularity with id = {rollup_granularity_id} has no seconds",
+        )
+
+    # values rolled up through the chain of rollup granularities must not come back
+    visited_ids = {rollup_granularity_id}
+    next_id = rollup_granularity.rollup_granularity_id
+    while next_id is not None and next_id not in visited_ids:
+        if next_id == granularity_id:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Granularity with id = {rollup_granularity_id} is rolled up "
+                f"into granularity with id = {granularity_id}",
+            )
+        visited_ids.add(next_id)
+        stmt = select(Granularity.rollup_granularity_id).where(
+            Granularity.id == next_id
+        )
+        res = await session.execute(stmt)
+        next_id = res.scalar()
+
+
+async def raise_error_if_granularity_is_rollup_target(
+    granularity_id: int, session: AsyncSession
+):
+    """Raises error if KPI values of other granularity are rolled up into granularity_id."""
+    stmt = select(Granularity.id).where(
+        Granularity.rollup_granularity_id == granularity_id
+    )
+    res = await session.execute(stmt)
+    referencing_ids = res.scalars().all()
+    if referencing_ids:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Granularity with id = {granularity_id} is rollup granularity of "
+            f"granularities with ids = {referencing_ids}",
+        )
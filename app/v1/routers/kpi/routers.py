@@ -33,6 +33,7 @@ from v1.routers.kpi.utils import (
     get_list_of_kpi_with_related,
 )
 from v1.routers.palette.utils import create_default_palette_for_kpis
+from v1.utils.json_rows import ORJSONRowsResponse, select_model_fields
 
 router = APIRouter(prefix="/kpi", tags=["KPI"])
 
@@ -41,7 +42,7 @@ router = APIRouter(prefix="/kpi", tags=["KPI"])
 async def read_all_kpis(session: AsyncSession = Depends(get_session)):
     """Returns all KPIs"""
     kpis_data = await get_all_kpis_with_related(session=session)
-    return kpis_data
+    return ORJSONRowsResponse(select_model_fields(KPIModelInfo, kpis_data))
 
 
 @router.post("", status_code=201, response_model=KPIModelInfo)
@@ -148,7 +149,7 @@ async def read_kpi_for_special_object_type(
     list_of_kpi = await get_kpi_by_tmo_id(
         session=session, object_type_id=object_type_id, add_related_to_kpi=True
     )
-    return list_of_kpi
+    return ORJSONRowsResponse(select_model_fields(KPIModelInfo, list_of_kpi))
 
 
 @router.post(
@@ -166,7 +167,7 @@ async def read_kpi_by_ids(
     except NotFoundError as error_message:
         raise HTTPException(status_code=422, detail=str(error_message))
 
-    return kpis
+    return ORJSONRowsResponse(select_model_fields(KPIModelInfo, kpis))
 
 
 @router.get(
@@ -3,6 +3,9 @@ from sqlalchemy import func, Integer, Float, String, Boolean, Date, DateTime
 from v1.models.kpi import KpiValTypes
 from v1.routers.kpi_value.enum_models import AvailableKPIAggregations
 
+# max limit of KPI values page
+KPI_VALUES_MAX_PAGE_SIZE = 10000
+
 AGGREGATION_CORRESPONDING_TABLE = {
     AvailableKPIAggregations.AVG.value: func.avg,
     AvailableKPIAggregations.MAX.value: func.max,
@@ -1,33 +1,56 @@
 from datetime import datetime
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects import postgresql
 from sqlalchemy import text
-from v1.database.database import get_session
-from v1.database.schemas import KPIValue, Granularity
+from starlette.responses import StreamingResponse
+from services.kpi_services.cache import (
+    get_kpi_metadata_or_raise_error,
+    get_kpis_metadata,
+)
+from services.kpi_value_services.current_state import (
+    refresh_current_values_for_groups,
+)
+from services.kpi_value_services.export import stream_ndjson
+from v1.database.database import (
+    fetch_core_rows,
+    get_chunked_values_by_sqlalchemy_limit,
+    get_session,
+)
+from v1.database.schemas import KPIValue
 from v1.models.kpi_values import (
     KPIValuesStates,
     KPIValuePlannedModelCreateByKPI,
     KPIValuePlannedModelUpdateByKPI,
     KPIValueHistoricalModelCreateByKPI,
     KPIValueModelInfo,
+    KPIValuesSeriesModel,
 )
-from v1.models.request_models import KPIAggrRequest
-from v1.routers.kpi.utils import get_kpi_by_id_or_raise_error
+from v1.models.request_models import KPIAggrRequest, KPIValuesBulkRequest
+from v1.routers.kpi_value.configs import KPI_VALUES_MAX_PAGE_SIZE
 from v1.routers.kpi_value.enum_models import (
     AvailableAggrKPIValTypes,
     AvailableKPIAggregations,
 )
 from v1.routers.kpi_value.utils import (
+    decode_kpi_values_cursor_or_raise_error,
+    encode_kpi_values_cursor,
     get_kpi_value_by_id_or_raise_error,
+    get_kpi_values_bulk_statement,
     get_current_kpi_value_for_particular_kpi,
+    flush_kpi_value_or_raise_error,
     get_aql_aggregation_function,
     get_corresponding_cast_sql_type,
 )
+from v1.utils.json_rows import ORJSONRowsResponse
+from v1.utils.val_type_columns import NUMERIC_VAL_TYPES
 from v1.utils.val_type_deserializers import (
+    KPI_VALUE_INFO_COLUMNS,
+    get_kpi_value_row_to_dict_func,
+    get_kpi_value_row_value_func,
     get_deserializer_func_for_kpi,
     get_deserialized_kpi_value_inst,
 )
@@ -37,6 +60,43 @@ from v1.utils.val_type_validators import get_value_validate_funct_for_kpi
 router = APIRouter(prefix="/kpi_values")
 
 
+def get_kpi_values_of_kpi_statement(
+    kpi_id: int,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    object_id: Optional[int],
+    granularity_id: Optional[int],
+    cursor: Optional[str],
+):
+    """Returns select of KPI values of kpi_id by filters in (record_time, id) order,
+    with cursor only KPI values after cursor are selected
+    """
+    where_condition = []
+    if date_from is not None:
+        where_condition.append(KPIValue.record_time >= date_from)
+
+    if date_to is not None:
+        where_condition.append(KPIValue.record_time <= date_to)
+
+    if object_id is not None:
+        where_condition.append(KPIValue.object_id == object_id)
+
+    if granularity_id is not None:
+        where_condition.append(KPIValue.granularity_id == granularity_id)
+
+    if cursor is not None:
+        where_condition.append(
+            tuple_(KPIValue.record_time, KPIValue.id)
+            > tuple_(*decode_kpi_values_cursor_or_raise_error(cursor))
+        )
+
+    return (
+        select(*KPI_VALUE_INFO_COLUMNS)
+        .where(KPIValue.kpi_id == kpi_id, *where_condition)
+        .order_by(KPIValue.record_time, KPIValue.id)
+    )
+
+
 @router.get(
     "/common/{kpi_id}",
     summary="Read KPI values for particular KPI",
@@ -50,38 +110,139 @@ async def read_kpi_values_by_kpi_id(
     date_to: Optional[datetime] = None,
     object_id: int = None,
     granularity_id: int = None,
+    limit: Optional[int] = Query(
+        default=None, gt=0, le=KPI_VALUES_MAX_PAGE_SIZE
+    ),
+    cursor: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
 ):
-    """Returns KPI values for particular kpi_id"""
-    kpi_from_db = await get_kpi_by_id_or_raise_error(kpi_id, session)
+    """Returns KPI values for particular kpi_id ordered by record_time and id.
+    With limit returns one page, header X-Next-Cursor contains cursor of the next page,
+    if there can be more KPI values.
+    """
+    kpi_from_db = await get_kpi_metadata_or_raise_error(kpi_id, session)
+
+    stmt = get_kpi_values_of_kpi_statement(
+        kpi_id,
+        date_from,
+        date_to,
+        object_id,
+        granularity_id,
+        cursor,
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = await fetch_core_rows(session, stmt)
+
+    headers = None
+    if limit is not None and len(rows) == limit:
+        headers = {
+            "X-Next-Cursor": encode_kpi_values_cursor(
+                rows[-1].record_time, rows[-1].id
+            )
+        }
 
-    deserializer = get_deserializer_func_for_kpi(
+    kpi_value_row_to_dict = get_kpi_value_row_to_dict_func(
         kpi_from_db.val_type, kpi_from_db.multiple
     )
+    return ORJSONRowsResponse(
+        [kpi_value_row_to_dict(row) for row in rows], headers=headers
+    )
 
-    where_condition = []
-    if date_from is not None:
-        where_condition.append(KPIValue.record_time >= date_from)
 
-    if date_to is not None:
-        where_condition.append(KPIValue.record_time <= date_to)
+@router.get(
+    "/common/{kpi_id}/stream",
+    summary="Stream KPI values for particular KPI",
+    status_code=200,
+    tags=["KPI Values: Common"],
+    response_class=StreamingResponse,
+    description=(
+        "Returns KPI values as newline delimited JSON, one KPI value per line, "
+        "ordered by record_time and id. Values are read and sent in chunks."
+    ),
+)
+async def stream_kpi_values_by_kpi_id(
+    request: Request,
+    kpi_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    object_id: int = None,
+    granularity_id: int = None,
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    kpi_from_db = await get_kpi_metadata_or_raise_error(kpi_id, session)
+    stmt = get_kpi_values_of_kpi_statement(
+        kpi_id,
+        date_from,
+        date_to,
+        object_id,
+        granularity_id,
+        cursor,
+    )
+    return StreamingResponse(
+        stream_ndjson(
+            stmt,
+            get_kpi_value_row_to_dict_func(
+                kpi_from_db.val_type, kpi_from_db.multiple
+            ),
+            request,
+        ),
+        media_type="application/x-ndjson",
+    )
 
-    if object_id is not None:
-        where_condition.append(KPIValue.object_id == object_id)
 
-    if granularity_id is not None:
-        where_condition.append(KPIValue.granularity_id == granularity_id)
+@router.post(
+    "/common/bulk",
+    summary="Read KPI values for several KPIs and objects",
+    status_code=200,
+    tags=["KPI Values: Common"],
+    response_model=List[KPIValuesSeriesModel],
+)
+async def read_kpi_values_bulk(
+    bulk_request: KPIValuesBulkRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Returns KPI values of kpi_ids and object_ids in columnar form, grouped by KPI and object.
+    Values of every group are ordered by record_time and id. Not existing KPIs are skipped.
+    """
+    kpis_metadata = await get_kpis_metadata(session, set(bulk_request.kpi_ids))
+    kpi_value_row_value_funcs = {
+        kpi_id: get_kpi_value_row_value_func(
+            metadata.val_type, metadata.multiple
+        )
+        for kpi_id, metadata in kpis_metadata.items()
+    }
 
-    stmt = (
-        select(KPIValue)
-        .where(KPIValue.kpi_id == kpi_id, *where_condition)
-        .order_by(KPIValue.record_time)
-    )
-    res = await session.execute(stmt)
-    res = res.scalars().all()
-    res = map(lambda x: get_deserialized_kpi_value_inst(x, deserializer), res)
+    if not kpis_metadata:
+        return ORJSONRowsResponse([])
+
+    series = dict()
+    for object_ids in get_chunked_values_by_sqlalchemy_limit(
+        set(bulk_request.object_ids)
+    ):
+        stmt = get_kpi_values_bulk_statement(
+            bulk_request, list(kpis_metadata), object_ids
+        )
+        for row in await fetch_core_rows(session, stmt):
+            item = series.get((row.kpi_id, row.object_id))
+            if item is None:
+                item = series[(row.kpi_id, row.object_id)] = dict(
+                    kpi_id=row.kpi_id,
+                    object_id=row.object_id,
+                    id=[],
+                    granularity_id=[],
+                    value=[],
+                    record_time=[],
+                    state=[],
+                )
+            item["id"].append(row.id)
+            item["granularity_id"].append(row.granularity_id)
+            item["value"].append(kpi_value_row_value_funcs[row.kpi_id](row))
+            item["record_time"].append(row.record_time)
+            item["state"].append(row.state)
 
-    return list(res)
+    return ORJSONRowsResponse(list(series.values()))
 
 
 @router.delete(
@@ -119,6 +280,11 @@ async def delete_kpi_value_by_kpi_value_id(
             session.add(latest_record)
 
     await session.delete(kpi_value)
+    await session.flush()
+    await refresh_current_values_for_groups(
+        session,
+        [(kpi_value.kpi_id, kpi_value.object_id, kpi_value.granularity_id)],
+    )
     await session.commit()
     return {"msg": f"KPIValue with id = {kpi_value_id} deleted successfully!"}
 
@@ -136,7 +302,9 @@ async def read_kpi_value_by_kpi_value_id(
     """Returns KPI value if KPI Value with kpi_value_id exist, otherwise raises error."""
 
     kpi_value = await get_kpi_value_by_id_or_raise_error(kpi_value_id, session)
-    kpi_from_db = await get_kpi_by_id_or_raise_error(kpi_value.kpi_id, session)
+    kpi_from_db = await get_kpi_metadata_or_raise_error(
+        kpi_value.kpi_id, session
+    )
     deserializer = get_deserializer_func_for_kpi(
         kpi_from_db.val_type, kpi_from_db.multiple
     )
@@ -157,11 +325,9 @@ async def create_planned_kpi_value_for_particular_kpi(
     session: AsyncSession = Depends(get_session),
 ):
     """Creates KPI value for particular KPI"""
-    kpi_from_db = await get_kpi_by_id_or_raise_error(kpi_id, session)
+    kpi_from_db = await get_kpi_metadata_or_raise_error(kpi_id, session)
 
-    if kpi_value.granularity_id not in [
-        x.id for x in kpi_from_db.granularities
-    ]:
+    if kpi_value.granularity_id not in kpi_from_db.granularity_ids:
         raise HTTPException(
             status_code=422,
             detail=f"KPI with id = {kpi_id} has no "
@@ -187,8 +353,10 @@ async def create_planned_kpi_value_for_particular_kpi(
     )
     kpi_value_inst.value = valid_value
     kpi_value_inst.serialize_before_save(serializer)
+    kpi_value_inst.set_typed_values(kpi_from_db.val_type, kpi_from_db.multiple)
 
     session.add(kpi_value_inst)
+    await flush_kpi_value_or_raise_error(session)
     await session.commit()
     await session.refresh(kpi_value_inst)
 
@@ -211,7 +379,7 @@ async def update_planned_kpi_value_by_kpi_value_id(
     kpi_value_from_db = await get_kpi_value_by_id_or_raise_error(
         kpi_value_id, session
     )
-    kpi_from_db = await get_kpi_by_id_or_raise_error(
+    kpi_from_db = await get_kpi_metadata_or_raise_error(
         kpi_value_from_db.kpi_id, session
     )
 
@@ -227,8 +395,23 @@ async def update_planned_kpi_value_by_kpi_value_id(
 
     kpi_value_from_db.validate_value(validator)
     kpi_value_from_db.serialize_before_save(serializer)
+    kpi_value_from_db.set_typed_values(
+        kpi_from_db.val_type, kpi_from_db.multiple
+    )
 
     session.add(kpi_value_from_db)
+    await flush_kpi_value_or_raise_error(session)
+    # planned value could be updated by id of current value
+    await refresh_current_values_for_groups(
+        session,
+        [
+            (
+                kpi_value_from_db.kpi_id,
+                kpi_value_from_db.object_id,
+                kpi_value_from_db.granularity_id,
+            )
+        ],
+    )
     await session.commit()
 
     deserializer = get_deserializer_func_for_kpi(
@@ -250,11 +433,9 @@ async def create_historical_kpi_value_for_particular_kpi(
     session: AsyncSession = Depends(get_session),
 ):
     """Creates KPI value for particular KPI"""
-    kpi_from_db = await get_kpi_by_id_or_raise_error(kpi_id, session)
+    kpi_from_db = await get_kpi_metadata_or_raise_error(kpi_id, session)
 
-    if kpi_value.granularity_id not in [
-        x.id for x in kpi_from_db.granularities
-    ]:
+    if kpi_value.granularity_id not in kpi_from_db.granularity_ids:
         raise HTTPException(
             status_code=422,
             detail=f"KPI with id = {kpi_id} has no "
@@ -280,6 +461,7 @@ async def create_historical_kpi_value_for_particular_kpi(
     )
     kpi_value_inst.value = valid_value
     kpi_value_inst.serialize_before_save(serializer)
+    kpi_value_inst.set_typed_values(kpi_from_db.val_type, kpi_from_db.multiple)
 
     current_kpi_value = await get_current_kpi_value_for_particular_kpi(
         kpi_id=kpi_value_inst.kpi_id,
@@ -292,6 +474,10 @@ async def create_historical_kpi_value_for_particular_kpi(
         session.add(current_kpi_value)
 
     session.add(kpi_value_inst)
+    await flush_kpi_value_or_raise_error(session)
+    await refresh_current_values_for_groups(
+        session, [(kpi_id, kpi_value_inst.object_id, kpi_value.granularity_id)]
+    )
 
     await session.commit()
     await session.refresh(kpi_value_inst)
@@ -309,7 +495,7 @@ async def get_aggregated_data_for_special_object_ids(
     aggr_request: KPIAggrRequest, session: AsyncSession = Depends(get_session)
 ):
     """Returns aggregated KPI values for special object_ids"""
-    kpi_from_db = await get_kpi_by_id_or_raise_error(
+    kpi_from_db = await get_kpi_metadata_or_raise_error(
         aggr_request.kpi_id, session
     )
 
@@ -331,14 +517,7 @@ async def get_aggregated_data_for_special_object_ids(
         raise HTTPException(status_code=422, detail=str(e))
 
     # check granularity id
-    stmt = select(Granularity).where(
-        Granularity.id == aggr_request.granularity_id,
-        Granularity.kpi_id == aggr_request.kpi_id,
-    )
-    granularity = await session.execute(stmt)
-    granularity = granularity.scalars().first()
-
-    if not granularity:
+    if aggr_request.granularity_id not in kpi_from_db.granularity_ids:
         raise HTTPException(
             status_code=404,
             detail=f"Granularity with id = {aggr_request.granularity_id} not founded",
@@ -391,11 +570,19 @@ async def get_aggregated_data_for_special_object_ids(
         except NotImplementedError as e:
             raise HTTPException(status_code=422, detail=str(e))
 
+        if kpi_from_db.val_type in NUMERIC_VAL_TYPES:
+            # aggregated natively, result keeps type of KPI values, except avg
+            aggr_value = aggr_func(KPIValue.value_numeric)
+            if (
+                aggr_request.aggregation_type
+                != AvailableKPIAggregations.AVG.value
+            ):
+                aggr_value = aggr_value.cast(sql_cast_type)
+        else:
+            aggr_value = aggr_func(KPIValue.value.cast(sql_cast_type))
+
         stmt = (
-            select(
-                KPIValue.object_id,
-                aggr_func(KPIValue.value.cast(sql_cast_type)),
-            )
+            select(KPIValue.object_id, aggr_value)
             .where(*where_conditions)
             .group_by(KPIValue.object_id)
         )
@@ -403,4 +590,4 @@ async def get_aggregated_data_for_special_object_ids(
         res = res.all()
         res = {x[0]: x[1] if x[1] else 0 for x in res}
 
-    return res
+    return ORJSONRowsResponse(res)
@@ -1,13 +1,22 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import BigInteger, Integer, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from v1.database.schemas import KPIValue
+from v1.database.schemas import KPIValue, KPICurrentValue
 from v1.models.kpi_values import KPIValuesStates
+from v1.models.request_models import KPIValuesBulkRequest
 from v1.routers.kpi_value.configs import (
     AGGREGATION_CORRESPONDING_TABLE,
     CORRESPONDING_SQL_CAST_TYPE_TABLE,
 )
+from v1.utils.val_type_deserializers import KPI_VALUE_INFO_COLUMNS
 
 
 async def get_kpi_value_by_id_or_raise_error(
@@ -24,16 +33,103 @@ async def get_kpi_value_by_id_or_raise_error(
     return kpi_from_db
 
 
+UNIQUE_VIOLATION_SQLSTATE = "23505"
+
+
+async def flush_kpi_value_or_raise_error(session: AsyncSession):
+    """Flushes session, raises error if KPI value with the same kpi_id, object_id, granularity_id
+    and record_time already exists. Planned and actual values of the same record_time don't collide.
+    """
+    try:
+        await session.flush()
+    except IntegrityError as e:
+        await session.rollback()
+        if getattr(e.orig, "pgcode", None) != UNIQUE_VIOLATION_SQLSTATE:
+            raise
+        raise HTTPException(
+            status_code=409,
+            detail="KPIValue with the same kpi_id, object_id, granularity_id, "
+            "record_time and planned state already exists!",
+        )
+
+
+def encode_kpi_values_cursor(record_time: datetime, kpi_value_id: int) -> str:
+    """Returns opaque cursor, which points after KPI value with record_time and kpi_value_id"""
+    data = json.dumps([record_time.isoformat(), kpi_value_id])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_kpi_values_cursor_or_raise_error(
+    cursor: str,
+) -> tuple[datetime, int]:
+    """Returns record_time and id of cursor, otherwise raises error."""
+    try:
+        record_time, kpi_value_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(record_time), int(kpi_value_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=422, detail="Invalid cursor!")
+
+
+def get_kpi_values_bulk_statement(
+    bulk_request: KPIValuesBulkRequest,
+    kpi_ids: list[int],
+    object_ids: list[int],
+):
+    """Returns select of KPI values by bulk_request filters for kpi_ids and object_ids.
+    Lists are passed as array parameters of ANY, so statement has the same parameters for any list size.
+    """
+    where_conditions = [
+        KPIValue.kpi_id
+        == any_(bindparam("kpi_ids", kpi_ids, type_=ARRAY(BigInteger))),
+        KPIValue.object_id
+        == any_(bindparam("object_ids", object_ids, type_=ARRAY(Integer))),
+    ]
+    if bulk_request.granularity_ids:
+        where_conditions.append(
+            KPIValue.granularity_id
+            == any_(
+                bindparam(
+                    "granularity_ids",
+                    bulk_request.granularity_ids,
+                    type_=ARRAY(BigInteger),
+                )
+            )
+        )
+    if bulk_request.date_from is not None:
+        where_conditions.append(KPIValue.record_time >= bulk_request.date_from)
+
+    if bulk_request.date_to is not None:
+        where_conditions.append(KPIValue.record_time <= bulk_request.date_to)
+
+    if bulk_request.state is not None:
+        where_conditions.append(KPIValue.state == bulk_request.state)
+
+    return (
+        select(KPIValue.kpi_id, *KPI_VALUE_INFO_COLUMNS)
+        .where(*where_conditions)
+        .order_by(
+            KPIValue.kpi_id,
+            KPIValue.object_id,
+            KPIValue.record_time,
+            KPIValue.id,
+        )
+    )
+
+
 async def get_current_kpi_value_for_particular_kpi(
     kpi_id: int, object_id: int, granularity_id: int, session: AsyncSession
 ):
     """Returns current kpi_value with state = current, otherwise returns None"""
 
-    stmt = select(KPIValue).where(
-        KPIValue.kpi_id == kpi_id,
-        KPIValue.object_id == object_id,
-        KPIValue.granularity_id == granularity_id,
-        KPIValue.state == KPIValuesStates.CURRENT.value,
+    stmt = (
+        select(KPIValue)
+        .join(KPICurrentValue, KPIValue.id == KPICurrentValue.kpi_value_id)
+        .where(
+            KPICurrentValue.kpi_id == kpi_id,
+            KPICurrentValue.object_id == object_id,
+            KPICurrentValue.granularity_id == granularity_id,
+            KPIValue.state == KPIValuesStates.CURRENT.value,
+        )
     )
     res = await session.execute(stmt)
     return res.scalars().first()
@@ -1,11 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from v1.database.database import get_session
-from v1.database.schemas import KPIValue, KPI
-from v1.models.kpi_values import KPIValuesStates
-from v1.utils.val_type_deserializers import get_deserializer_func_for_kpi
+from v1.models.request_models import ObjectStatesRequest
+from v1.routers.object_state.utils import get_current_object_states
+from v1.utils.json_rows import ORJSONRowsResponse
 
 router = APIRouter(prefix="/object_state", tags=["Object State"])
 
@@ -16,36 +15,25 @@ async def read_current_object_state(
 ):
     """Returns all kpi_values with state = current for particular object_id"""
 
-    stmt = (
-        select(KPIValue, KPI)
-        .join(KPI, KPIValue.kpi_id == KPI.id)
-        .where(
-            KPIValue.object_id == object_id,
-            KPIValue.state == KPIValuesStates.CURRENT.value,
-        )
-    )
-
-    res = await session.execute(stmt)
-    res = res.all()
-
-    if len(res) == 0:
+    object_states = await get_current_object_states(session, [object_id])
+    if object_id not in object_states:
         raise HTTPException(
             status_code=404,
             detail=f"KPIValues for object_id = {object_id} not exist.",
         )
 
-    object_state = dict()
-    object_state["object_id"] = object_id
+    return ORJSONRowsResponse(object_states[object_id])
 
-    for kpi_value, kpi in res:
-        record = object_state.setdefault(kpi.name, [])
 
-        deserializer = get_deserializer_func_for_kpi(kpi.val_type, kpi.multiple)
-        record.append(
-            dict(
-                granularity_id=kpi_value.granularity_id,
-                value=deserializer(kpi_value.value),
-            )
-        )
-
-    return object_state
+@router.post("/current")
+async def read_current_object_states(
+    states_request: ObjectStatesRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Returns kpi_values with state = current for object_ids, optionally only for kpi_ids.
+    Result is dict by object_id, objects without current kpi_values are skipped.
+    """
+    object_states = await get_current_object_states(
+        session, states_request.object_ids, states_request.kpi_ids
+    )
+    return ORJSONRowsResponse(object_states)
@@ -0,0 +1,67 @@
+from typing import Iterable
+
+from sqlalchemy import BigInteger, Integer, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.kpi_services.cache import get_kpis_metadata
+from v1.database.database import (
+    fetch_core_rows,
+    get_chunked_values_by_sqlalchemy_limit,
+)
+from v1.database.schemas import KPICurrentValue
+from v1.utils.val_type_deserializers import get_deserializer_func_for_kpi
+
+
+async def get_current_object_states(
+    session: AsyncSession,
+    object_ids: Iterable[int],
+    kpi_ids: Iterable[int] | None = None,
+) -> dict[int, dict]:
+    """Returns states of objects with current KPI values, like {object_id: {"object_id": 1, kpi_name: [...]}}.
+    Objects are read from kpi_current_values by one query per chunk, optionally only for kpi_ids.
+    """
+    rows = []
+    for chunk in get_chunked_values_by_sqlalchemy_limit(set(object_ids)):
+        stmt = select(
+            KPICurrentValue.object_id,
+            KPICurrentValue.kpi_id,
+            KPICurrentValue.granularity_id,
+            KPICurrentValue.value,
+        ).where(
+            KPICurrentValue.object_id
+            == any_(bindparam("object_ids", chunk, type_=ARRAY(Integer)))
+        )
+        if kpi_ids is not None:
+            stmt = stmt.where(
+                KPICurrentValue.kpi_id
+                == any_(
+                    bindparam("kpi_ids", list(kpi_ids), type_=ARRAY(BigInteger))
+                )
+            )
+        rows.extend(await fetch_core_rows(session, stmt))
+
+    kpis_metadata = await get_kpis_metadata(
+        session, {row.kpi_id for row in rows}
+    )
+    # deserializer is the same for all values of one KPI
+    deserializers = {
+        kpi_id: get_deserializer_func_for_kpi(kpi.val_type, kpi.multiple)
+        for kpi_id, kpi in kpis_metadata.items()
+    }
+
+    object_states = dict()
+    for object_id, kpi_id, granularity_id, value in rows:
+        kpi = kpis_metadata.get(kpi_id)
+        if kpi is None:
+            continue
+        object_state = object_states.setdefault(
+            object_id, {"object_id": object_id}
+        )
+        object_state.setdefault(kpi.name, []).append(
+            dict(
+                granularity_id=granularity_id,
+                value=deserializers[kpi_id](value),
+            )
+        )
+    return object_states
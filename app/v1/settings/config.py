@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 DB_TYPE = os.environ.get("V1_DB_TYPE", "postgresql+asyncpg")
 DB_USER = os.environ.get("V1_DB_USER", "object_state_admin")
@@ -17,3 +18,60 @@ FRONTEND_SETTINGS_HOST = os.environ.get("FRONTEND_SETTINGS_HOST", "localhost")
 FRONTEND_SETTINGS_GRPC_PORT = os.environ.get(
     "FRONTEND_SETTINGS_GRPC_PORT", "50051"
 )
+
+# max count of decoded/validated BatchImport messages, which are waiting for the next stage
+BATCH_IMPORT_QUEUE_SIZE = int(os.environ.get("BATCH_IMPORT_QUEUE_SIZE", "4"))
+# default and max count of KPI values in one message of StreamKPIValues
+STREAM_KPI_VALUES_CHUNK_SIZE = int(
+    os.environ.get("STREAM_KPI_VALUES_CHUNK_SIZE", "10000")
+)
+STREAM_KPI_VALUES_MAX_CHUNK_SIZE = int(
+    os.environ.get("STREAM_KPI_VALUES_MAX_CHUNK_SIZE", "100000")
+)
+
+# KPI METADATA CACHE
+KPI_METADATA_CACHE_TTL = int(os.environ.get("KPI_METADATA_CACHE_TTL", "60"))
+KPI_METADATA_CACHE_SYNC_ENABLED = os.environ.get(
+    "KPI_METADATA_CACHE_SYNC_ENABLED", "False"
+).upper() in ("TRUE", "Y", "YES", "1")
+
+# KPI VALUES PARTITIONS
+KPI_VALUES_PARTITIONS_AHEAD_MONTHS = int(
+    os.environ.get("KPI_VALUES_PARTITIONS_AHEAD_MONTHS", "3")
+)
+KPI_VALUES_PARTITION_MAINTENANCE_INTERVAL = int(
+    os.environ.get("KPI_VALUES_PARTITION_MAINTENANCE_INTERVAL", "3600")
+)
+
+# KPI VALUES RETENTION
+KPI_VALUES_COMPACTION_INTERVAL = int(
+    os.environ.get("KPI_VALUES_COMPACTION_INTERVAL", "3600")
+)
+KPI_VALUES_COMPACTION_BATCH_SIZE = int(
+    os.environ.get("KPI_VALUES_COMPACTION_BATCH_SIZE", "10000")
+)
+
+# count of file lines, which are validated and written at once by streaming batch import
+BATCH_IMPORT_CHUNK_SIZE = int(
+    os.environ.get("BATCH_IMPORT_CHUNK_SIZE", "100000")
+)
+
+# count of KPIs, which states are reloaded at the same time, each KPI uses its own DB connection
+STATE_RELOAD_CONCURRENCY = int(os.environ.get("STATE_RELOAD_CONCURRENCY", "4"))
+
+# BATCH JOBS
+# count of jobs, which are executed at the same time by one API worker
+BATCH_JOBS_WORKERS = int(os.environ.get("BATCH_JOBS_WORKERS", "2"))
+BATCH_JOBS_POLL_INTERVAL = int(os.environ.get("BATCH_JOBS_POLL_INTERVAL", "5"))
+BATCH_JOBS_MAX_ATTEMPTS = int(os.environ.get("BATCH_JOBS_MAX_ATTEMPTS", "3"))
+# delay before retry of failed job, in seconds, it is doubled after every next attempt
+BATCH_JOBS_RETRY_DELAY = int(os.environ.get("BATCH_JOBS_RETRY_DELAY", "30"))
+# running job without heartbeat for this time is considered abandoned and is claimed again
+BATCH_JOBS_STALE_TIMEOUT = int(
+    os.environ.get("BATCH_JOBS_STALE_TIMEOUT", "600")
+)
+# directory with uploaded files of jobs, must be shared by all API instances
+BATCH_JOBS_FILES_DIR = os.environ.get(
+    "BATCH_JOBS_FILES_DIR",
+    os.path.join(tempfile.gettempdir(), "object_state_batch_jobs"),
+)
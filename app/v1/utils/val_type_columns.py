@@ -0,0 +1,89 @@
+"""Typed columns of KPI values.
+
+KPIValue.value keeps serialized value. Depending on KPI.val_type and KPI.multiple the same value is stored
+in one of typed columns, which are used for native aggregation and for reading without literal_eval.
+"""
+
+import math
+from ast import literal_eval
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from v1.models.kpi import KpiValTypes
+
+TYPED_VALUE_COLUMNS = (
+    "value_numeric",
+    "value_bool",
+    "value_datetime",
+    "value_json",
+)
+
+NUMERIC_VAL_TYPES = {KpiValTypes.INT.value, KpiValTypes.FLOAT.value}
+BOOL_VALUES = {"False": False, "True": True}
+
+
+def convert_to_numeric(value: str):
+    try:
+        numeric = Decimal(value)
+    except InvalidOperation:
+        return None
+    return numeric if numeric.is_finite() else None
+
+
+def convert_to_bool(value: str):
+    return BOOL_VALUES.get(value)
+
+
+def convert_to_aware_datetime(value: date | datetime) -> datetime:
+    """Returns datetime with timezone, naive datetime is considered as UTC"""
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def convert_to_datetime(value: str):
+    try:
+        return convert_to_aware_datetime(datetime.fromisoformat(value))
+    except ValueError:
+        return None
+
+
+def convert_to_json_item(item):
+    if isinstance(item, (date, datetime)):
+        return item.isoformat()
+    if isinstance(item, float) and not math.isfinite(item):
+        return None
+    return item
+
+
+def convert_to_json(value: str):
+    try:
+        items = literal_eval(value)
+    except (ValueError, SyntaxError):
+        return None
+    if not isinstance(items, (list, tuple)):
+        return None
+    return [convert_to_json_item(item) for item in items]
+
+
+TYPED_COLUMN_CONVERTERS = {
+    KpiValTypes.INT.value: ("value_numeric", convert_to_numeric),
+    KpiValTypes.FLOAT.value: ("value_numeric", convert_to_numeric),
+    KpiValTypes.BOOL.value: ("value_bool", convert_to_bool),
+    KpiValTypes.DATE.value: ("value_datetime", convert_to_datetime),
+    KpiValTypes.DATETIME.value: ("value_datetime", convert_to_datetime),
+}
+
+
+def get_typed_value_columns(val_type: str, multiple: bool, value: str) -> dict:
+    """Returns dict with all TYPED_VALUE_COLUMNS for serialized value. str values have no typed column."""
+    columns = dict.fromkeys(TYPED_VALUE_COLUMNS)
+    if value is None:
+        return columns
+
+    if multiple:
+        columns["value_json"] = convert_to_json(value)
+    elif val_type in TYPED_COLUMN_CONVERTERS:
+        column_name, converter = TYPED_COLUMN_CONVERTERS[val_type]
+        columns[column_name] = converter(value)
+    return columns
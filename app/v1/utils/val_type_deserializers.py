@@ -76,3 +76,59 @@ def get_deserialized_kpi_value_inst(
     """Returns deserialized KPIValue inst"""
     kpi_value.value = deserializer(kpi_value.value)
     return kpi_value
+
+
+def get_deserialized_multiple_kpi_value_inst(kpi_value: KPIValue):
+    """Returns KPIValue inst of multiple KPI with value from value_json, which is already parsed by db driver"""
+    if kpi_value.value_json is not None:
+        kpi_value.value = kpi_value.value_json
+    else:
+        kpi_value.value = multiple_deserializer(kpi_value.value)
+    return kpi_value
+
+
+# columns of KPIValueModelInfo, value_json is used instead of value for multiple KPIs
+KPI_VALUE_INFO_COLUMNS = (
+    KPIValue.id,
+    KPIValue.object_id,
+    KPIValue.granularity_id,
+    KPIValue.value,
+    KPIValue.value_json,
+    KPIValue.record_time,
+    KPIValue.state,
+)
+
+
+def get_kpi_value_row_value_func(kpi_val_type: KpiValTypes, kpi_multiple: bool):
+    """Returns function, which returns deserialized value of row with value and value_json columns"""
+    deserializer = get_deserializer_func_for_kpi(kpi_val_type, kpi_multiple)
+
+    def kpi_value_row_value(row):
+        if kpi_multiple and row.value_json is not None:
+            return row.value_json
+        return deserializer(row.value)
+
+    return kpi_value_row_value
+
+
+def get_kpi_value_row_to_dict_func(
+    kpi_val_type: KpiValTypes, kpi_multiple: bool
+):
+    """Returns function, which converts row of KPI_VALUE_INFO_COLUMNS into dict
+    with deserialized value, like KPIValueModelInfo
+    """
+    kpi_value_row_value = get_kpi_value_row_value_func(
+        kpi_val_type, kpi_multiple
+    )
+
+    def kpi_value_row_to_dict(row) -> dict:
+        return {
+            "id": row.id,
+            "object_id": row.object_id,
+            "granularity_id": row.granularity_id,
+            "value": kpi_value_row_value(row),
+            "record_time": row.record_time,
+            "state": row.state,
+        }
+
+    return kpi_value_row_to_dict
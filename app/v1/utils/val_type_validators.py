@@ -1,6 +1,9 @@
 from v1.models.kpi import KpiValTypes
 from datetime import datetime
 
+# PostgreSQL text and jsonb can't store NUL character
+NUL_CHARACTER = "\x00"
+
 
 def int_validation(value):
     try:
@@ -28,6 +31,10 @@ def bool_validation(value):
 
 
 def str_validation(value):
+    if isinstance(value, str) and NUL_CHARACTER in value:
+        raise ValueError(
+            f"Incorrect value for str val_type = {value!r}. Value can't contain NUL character"
+        )
     return value
 
 
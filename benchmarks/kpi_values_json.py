@@ -0,0 +1,101 @@
+"""Compares rendering of KPI values read endpoints before and after ORJSONRowsResponse.
+
+Old path: rows are validated and serialized by response_model=List[KPIValueModelInfo]
+and rendered by JSONResponse. New path: rows are converted into dicts and rendered by orjson.
+Database time is not included.
+
+Run from repository root: PYTHONPATH=app python benchmarks/kpi_values_json.py [--rows N]
+"""
+
+import argparse
+import asyncio
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from v1.models.kpi_values import KPIValueModelInfo
+from v1.utils.json_rows import ORJSONRowsResponse
+from v1.utils.val_type_deserializers import get_kpi_value_row_to_dict_func
+
+KPIValueRow = namedtuple(
+    "KPIValueRow",
+    [
+        "id",
+        "object_id",
+        "granularity_id",
+        "value",
+        "value_json",
+        "record_time",
+        "state",
+    ],
+)
+
+RESPONSE_FIELD = create_model_field(
+    name="Response", type_=List[KPIValueModelInfo], mode="serialization"
+)
+
+
+def get_rows(count: int) -> list[KPIValueRow]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        KPIValueRow(
+            id=index,
+            object_id=index % 1000 + 1,
+            granularity_id=1,
+            value=str(index * 0.5),
+            value_json=None,
+            record_time=start + timedelta(minutes=index),
+            state="historical",
+        )
+        for index in range(count)
+    ]
+
+
+def render_with_response_model(rows: list[KPIValueRow]) -> bytes:
+    kpi_value_row_to_dict = get_kpi_value_row_to_dict_func("float", False)
+    content = [kpi_value_row_to_dict(row) for row in rows]
+    content = asyncio.run(
+        serialize_response(
+            field=RESPONSE_FIELD, response_content=content, is_coroutine=True
+        )
+    )
+    return JSONResponse(content).body
+
+
+def render_with_orjson(rows: list[KPIValueRow]) -> bytes:
+    kpi_value_row_to_dict = get_kpi_value_row_to_dict_func("float", False)
+    content = [kpi_value_row_to_dict(row) for row in rows]
+    return ORJSONRowsResponse(content).body
+
+
+def get_best_time(func, rows: list[KPIValueRow], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func(rows)
+        times.append(time.perf_counter() - started_at)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = get_rows(args.rows)
+    old_time = get_best_time(render_with_response_model, rows, args.repeat)
+    new_time = get_best_time(render_with_orjson, rows, args.repeat)
+    print(f"rows: {args.rows}")
+    print(f"response_model + JSONResponse: {old_time:.3f} s")
+    print(f"ORJSONRowsResponse: {new_time:.3f} s")
+    print(f"speedup: {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+from services.batch_job_services.service import (
+    claim_batch_job,
+    create_batch_job,
+)
+from v1.models.batch_jobs import BatchJobStatuses, BatchJobTypes
+
+
+def test_failed_job_is_claimed_after_next_run_at(run_in_session):
+    async def claim_retried_job(session):
+        job = await create_batch_job(
+            session, BatchJobTypes.RELOAD_KPI_VALUE_STATUSES, {"kpi_ids": [1]}
+        )
+        job = await claim_batch_job(session)
+        job.status = BatchJobStatuses.PENDING.value
+        job.next_run_at = datetime.now(timezone.utc) + timedelta(minutes=1)
+        await session.commit()
+        claimed_before_next_run_at = await claim_batch_job(session)
+
+        job.next_run_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await session.commit()
+        claimed_job = await claim_batch_job(session)
+        return claimed_before_next_run_at, claimed_job.id, claimed_job.attempts
+
+    claimed_before_next_run_at, claimed_job_id, attempts = run_in_session(
+        claim_retried_job
+    )
+    assert claimed_before_next_run_at is None
+    assert claimed_job_id == 1
+    assert attempts == 2
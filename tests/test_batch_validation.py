@@ -0,0 +1,52 @@
+import pandas as pd
+
+from v1.routers.batch.validation import (
+    get_invalid_datetime_mask,
+    get_invalid_int_mask,
+    get_invalid_values_mask,
+    validate_int_column,
+)
+
+
+def test_int_mask_rejects_values_out_of_int64_range():
+    column = pd.Series(
+        ["1", "99999999999999999999", " 3 ", "-9223372036854775809"]
+    )
+
+    assert get_invalid_int_mask(column).tolist() == [False, True, False, True]
+
+
+def test_int_column_with_overflowing_id_is_invalid():
+    df = pd.DataFrame({"kpi_id": ["1", "18446744073709551616"]})
+
+    errors = validate_int_column(df, "kpi_id")
+
+    assert len(errors) == 1
+    assert "18446744073709551616" in errors[0]
+
+
+def test_datetime_mask_rejects_partial_datetimes():
+    column = pd.Series(
+        ["2024", "2024-01", "2024-01-01", "2024-01-01T10:00:00+03:00"]
+    )
+
+    assert get_invalid_datetime_mask(column).tolist() == [
+        True,
+        True,
+        True,
+        False,
+    ]
+
+
+def test_str_values_with_nul_character_are_invalid():
+    column = pd.Series(["text", "te\x00xt"])
+
+    assert get_invalid_values_mask(column, "str", False).tolist() == [
+        False,
+        True,
+    ]
+    multiple_column = pd.Series([["text"], ["te\x00xt"]])
+    assert get_invalid_values_mask(multiple_column, "str", True).tolist() == [
+        False,
+        True,
+    ]
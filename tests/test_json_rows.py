@@ -0,0 +1,99 @@
+import asyncio
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from v1.models.kpi_values import KPIValueModelInfo
+from v1.utils.json_rows import ORJSONRowsResponse
+from v1.utils.val_type_deserializers import get_kpi_value_row_to_dict_func
+
+KPIValueRow = namedtuple(
+    "KPIValueRow",
+    [
+        "id",
+        "object_id",
+        "granularity_id",
+        "value",
+        "value_json",
+        "record_time",
+        "state",
+    ],
+)
+
+RECORD_TIMES = [
+    datetime(2024, 1, 1, tzinfo=timezone.utc),
+    datetime(2024, 1, 1, 10, 30, 15, 123456, tzinfo=timezone.utc),
+    datetime(2024, 1, 1, 10, tzinfo=timezone(timedelta(hours=3))),
+]
+
+
+def get_rows(values: list, values_json: list | None = None) -> list:
+    values_json = values_json or [None] * len(values)
+    return [
+        KPIValueRow(
+            id=index,
+            object_id=index + 10,
+            granularity_id=1,
+            value=value,
+            value_json=value_json,
+            record_time=RECORD_TIMES[index % len(RECORD_TIMES)],
+            state="current",
+        )
+        for index, (value, value_json) in enumerate(zip(values, values_json))
+    ]
+
+
+def render_with_response_model(content: list) -> bytes:
+    """Renders content like endpoint with response_model=List[KPIValueModelInfo]"""
+    field = create_model_field(
+        name="Response",
+        type_=List[KPIValueModelInfo],
+        mode="serialization",
+    )
+    content = asyncio.run(
+        serialize_response(
+            field=field, response_content=content, is_coroutine=True
+        )
+    )
+    return JSONResponse(content).body
+
+
+@pytest.mark.parametrize(
+    "val_type, multiple, rows",
+    [
+        ("int", False, get_rows(["1", "-5", "9007199254740993"])),
+        ("float", False, get_rows(["1.5", "-0.1", "1e20", "nan", "inf"])),
+        ("bool", False, get_rows(["True", "False"])),
+        ("str", False, get_rows(["text", "ünicode ✓", 'quote " \\'])),
+        (
+            "datetime",
+            False,
+            get_rows(["2024-01-01 10:00:00", "2024-01-01T10:00:00+03:00"]),
+        ),
+        ("date", False, get_rows(["2024-01-01"])),
+        (
+            "float",
+            True,
+            get_rows(
+                ["[1.5, 2]", "[]", "None"],
+                [[1.5, float("nan")], None, None],
+            ),
+        ),
+        ("str", True, get_rows(["['a', 'b']"], [["a", "ü"]])),
+    ],
+)
+def test_rows_response_is_equal_to_response_model(val_type, multiple, rows):
+    kpi_value_row_to_dict = get_kpi_value_row_to_dict_func(val_type, multiple)
+    content = [kpi_value_row_to_dict(row) for row in rows]
+
+    body = ORJSONRowsResponse(content).body
+    expected_body = render_with_response_model(content)
+
+    # floats can differ only in number format, e.g. 1e20 and 1e+20
+    assert json.loads(body) == json.loads(expected_body)
@@ -0,0 +1,61 @@
+import asyncio
+from dataclasses import replace
+
+from services.kpi_services import cache
+from services.kpi_services.cache import KPIMetadata, get_kpis_metadata
+from v1.security.security_data_models import ClientRoles, UserData
+from v1.security.utils import get_admin_user_model
+
+
+class FakeSession:
+    def __init__(self, jwt=None):
+        self.info = {"jwt": jwt} if jwt else {}
+
+
+def get_kpi_metadata(kpi_id: int, name: str) -> KPIMetadata:
+    return KPIMetadata(
+        id=kpi_id,
+        name=name,
+        val_type="int",
+        multiple=False,
+        object_type=1,
+        granularity_ids=frozenset(),
+    )
+
+
+def get_user_model() -> UserData:
+    return replace(
+        get_admin_user_model(),
+        realm_access=ClientRoles(name="realm_access", roles=["__user"]),
+    )
+
+
+def test_invalidation_during_load_discards_loaded_items(monkeypatch):
+    cache.kpi_metadata_cache.invalidate()
+
+    async def load_kpis_metadata(session, kpi_ids):
+        # KPI is changed and invalidated while it is being loaded
+        cache.kpi_metadata_cache.invalidate([1])
+        return {1: get_kpi_metadata(1, "old")}
+
+    monkeypatch.setattr(cache, "load_kpis_metadata", load_kpis_metadata)
+    result = asyncio.run(get_kpis_metadata(FakeSession(), [1]))
+
+    assert result[1].name == "old"
+    assert cache.kpi_metadata_cache.get(1) is None
+
+
+def test_cache_is_not_used_by_filtered_sessions(monkeypatch):
+    cache.kpi_metadata_cache.invalidate()
+    cache.kpi_metadata_cache.set(get_kpi_metadata(1, "cached"))
+
+    async def load_kpis_metadata(session, kpi_ids):
+        return {}
+
+    monkeypatch.setattr(cache, "load_kpis_metadata", load_kpis_metadata)
+    admin_session = FakeSession(get_admin_user_model())
+    user_session = FakeSession(get_user_model())
+
+    assert 1 in asyncio.run(get_kpis_metadata(admin_session, [1]))
+    assert asyncio.run(get_kpis_metadata(user_session, [1])) == {}
+    assert cache.kpi_metadata_cache.get(1).name == "cached"
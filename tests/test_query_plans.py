@@ -0,0 +1,110 @@
+"""Query-plan regression tests of kpi_values composite indexes"""
+
+import json
+
+import pytest
+from sqlalchemy import func, select, text
+
+from v1.database.schemas import KPIValue
+from v1.models.kpi_values import KPIValuesStates
+
+NATURAL_KEY_INDEX = "uq_kpi_values_kpi_id_granularity_id_object_id_record_time"
+CURRENT_VALUES_INDEX = "ix_kpi_values_current_kpi_id_object_id_granularity_id"
+INDEX_SCANS = {"Index Scan", "Index Only Scan"}
+
+SEED_KPI_VALUES = """
+INSERT INTO kpi (id, name, val_type, multiple) VALUES (1, 'kpi', 'int', false);
+INSERT INTO granularity (id, kpi_id, name, seconds) VALUES (1, 1, 'minute', 60);
+INSERT INTO kpi_values (kpi_id, granularity_id, object_id, value, record_time, state)
+SELECT 1, 1, n % 500, n::text, '2024-01-01'::timestamptz + n * interval '1 minute',
+    CASE WHEN n > 49500 THEN 'current' ELSE 'historical' END
+FROM generate_series(1, 50000) AS n;
+ANALYZE kpi_values;
+"""
+
+HISTORY_OF_OBJECT = (
+    select(KPIValue.value, KPIValue.record_time)
+    .where(
+        KPIValue.kpi_id == 1,
+        KPIValue.granularity_id == 1,
+        KPIValue.object_id == 5,
+    )
+    .order_by(KPIValue.record_time.desc())
+    .limit(10)
+)
+CURRENT_VALUE_OF_OBJECT = (
+    select(KPIValue.id, KPIValue.value)
+    .where(
+        KPIValue.kpi_id == 1,
+        KPIValue.object_id == 5,
+        KPIValue.granularity_id == 1,
+        KPIValue.state == KPIValuesStates.CURRENT.value,
+    )
+    .order_by(KPIValue.record_time.desc(), KPIValue.id.desc())
+    .limit(1)
+)
+# fallback of delete_kpi_value_by_kpi_value_id
+LATEST_NOT_CURRENT_RECORD_TIME = select(func.max(KPIValue.record_time)).where(
+    KPIValue.kpi_id == 1,
+    KPIValue.object_id == 5,
+    KPIValue.granularity_id == 1,
+    KPIValue.state != KPIValuesStates.CURRENT.value,
+)
+
+
+def get_index_scans(plan: dict) -> list[tuple[str, str]]:
+    """Returns (node type, index name) of all index scans of plan tree"""
+    scans = []
+    if plan["Node Type"] in INDEX_SCANS:
+        scans.append((plan["Node Type"], plan["Index Name"]))
+    for child_plan in plan.get("Plans", []):
+        scans.extend(get_index_scans(child_plan))
+    return scans
+
+
+async def get_parent_index_names(session) -> dict[str, str]:
+    """Returns names of partitioned indexes by names of their partition indexes"""
+    res = await session.execute(
+        text(
+            "SELECT partition_index.relname, parent_index.relname FROM pg_inherits "
+            "JOIN pg_class AS partition_index ON partition_index.oid = pg_inherits.inhrelid "
+            "JOIN pg_class AS parent_index ON parent_index.oid = pg_inherits.inhparent "
+            "WHERE parent_index.relkind = 'I'"
+        )
+    )
+    return dict(res.all())
+
+
+@pytest.mark.parametrize(
+    "stmt, index_name",
+    [
+        (HISTORY_OF_OBJECT, NATURAL_KEY_INDEX),
+        (CURRENT_VALUE_OF_OBJECT, CURRENT_VALUES_INDEX),
+        (LATEST_NOT_CURRENT_RECORD_TIME, NATURAL_KEY_INDEX),
+    ],
+    ids=["history_of_object", "current_value", "latest_not_current"],
+)
+def test_query_uses_composite_index(run_in_session, stmt, index_name):
+    async def explain(session):
+        for seed_stmt in SEED_KPI_VALUES.split(";"):
+            if seed_stmt.strip():
+                await session.execute(text(seed_stmt))
+        await session.commit()
+
+        compiled = stmt.compile(
+            dialect=session.bind.dialect,
+            compile_kwargs={"literal_binds": True},
+        )
+        res = await session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+        plan = res.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        parent_index_names = await get_parent_index_names(session)
+        return [
+            (node_type, parent_index_names.get(name, name))
+            for node_type, name in get_index_scans(plan[0]["Plan"])
+        ]
+
+    index_scans = run_in_session(explain)
+    assert index_scans
+    assert all(name == index_name for _, name in index_scans), index_scans
@@ -0,0 +1,159 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import insert, select
+
+from services.kpi_value_services.retention import rollup_kpi_values_batch
+from v1.database.schemas import KPI, Granularity, KPICurrentValue, KPIValue
+from v1.utils.val_type_columns import convert_to_numeric
+
+BUCKET_START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+BEFORE = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+def get_policy(aggregation: str, val_type: str = "float"):
+    return SimpleNamespace(
+        id=1,
+        rollup_granularity_id=2,
+        rollup_aggregation=aggregation,
+        rollup_seconds=3600,
+        val_type=val_type,
+        multiple=False,
+    )
+
+
+async def add_kpi_values(
+    session, raw_values: list[str], rollup_value: dict | None, val_type: str
+):
+    await session.execute(
+        insert(KPI).values(id=1, name="kpi", val_type=val_type, multiple=False)
+    )
+    await session.execute(
+        insert(Granularity).values(
+            [
+                dict(id=2, kpi_id=1, name="hour", seconds=3600),
+                dict(
+                    id=1,
+                    kpi_id=1,
+                    name="minute",
+                    seconds=60,
+                    retention_seconds=60,
+                    rollup_granularity_id=2,
+                ),
+            ]
+        )
+    )
+    await session.execute(
+        insert(KPIValue).values(
+            [
+                dict(
+                    kpi_id=1,
+                    object_id=1,
+                    granularity_id=1,
+                    value=value,
+                    value_numeric=convert_to_numeric(value),
+                    record_time=BUCKET_START.replace(minute=minute),
+                    state="historical",
+                )
+                for minute, value in enumerate(raw_values)
+            ]
+        )
+    )
+    if rollup_value is None:
+        await session.commit()
+        return None
+
+    res = await session.execute(
+        insert(KPIValue)
+        .values(
+            kpi_id=1,
+            object_id=1,
+            granularity_id=2,
+            value_numeric=convert_to_numeric(rollup_value["value"]),
+            record_time=BUCKET_START,
+            **rollup_value,
+        )
+        .returning(KPIValue.id)
+    )
+    rollup_value_id = res.scalar()
+    await session.commit()
+    return rollup_value_id
+
+
+async def get_kpi_values(session):
+    stmt = select(
+        KPIValue.granularity_id,
+        KPIValue.value,
+        KPIValue.state,
+        KPIValue.rollup_count,
+    ).order_by(KPIValue.granularity_id, KPIValue.record_time)
+    res = await session.execute(stmt)
+    return [tuple(row) for row in res.all()]
+
+
+def test_late_values_are_merged_into_existing_rollup_value(run_in_session):
+    async def rollup_late_values(session):
+        # the first run rolled up 2 values with average 10
+        await add_kpi_values(
+            session,
+            ["1", "2", "3"],
+            dict(value="10.0", state="historical", rollup_count=2),
+            "float",
+        )
+        await rollup_kpi_values_batch(session, get_policy("avg"), BEFORE)
+        await session.commit()
+        return await get_kpi_values(session)
+
+    assert run_in_session(rollup_late_values) == [(2, "5.2", "historical", 5)]
+
+
+def test_rollup_merged_into_current_value_updates_current_values(
+    run_in_session,
+):
+    async def rollup_into_current_value(session):
+        # value was ingested directly into rollup granularity
+        rollup_value_id = await add_kpi_values(
+            session, ["7", "4"], dict(value="5", state="current"), "int"
+        )
+        await session.execute(
+            insert(KPICurrentValue).values(
+                object_id=1,
+                kpi_id=1,
+                granularity_id=2,
+                kpi_value_id=rollup_value_id,
+                value="5",
+                record_time=BUCKET_START,
+            )
+        )
+        await session.commit()
+        await rollup_kpi_values_batch(session, get_policy("max", "int"), BEFORE)
+        await session.commit()
+        res = await session.execute(select(KPICurrentValue.value))
+        return await get_kpi_values(session), res.scalars().all()
+
+    assert run_in_session(rollup_into_current_value) == (
+        [(2, "7", "current", 3)],
+        ["7"],
+    )
+
+
+def test_bucket_without_numeric_values_is_not_rolled_up(run_in_session):
+    async def rollup_nan_values(session):
+        await add_kpi_values(session, ["nan", "inf"], None, "float")
+        count = await rollup_kpi_values_batch(
+            session, get_policy("avg"), BEFORE
+        )
+        await session.commit()
+        return count, await get_kpi_values(session)
+
+    assert run_in_session(rollup_nan_values) == (2, [])
+
+
+def test_count_rollup_counts_values_without_numeric_value(run_in_session):
+    async def rollup_count(session):
+        await add_kpi_values(session, ["nan", "1", "2"], None, "float")
+        await rollup_kpi_values_batch(session, get_policy("count"), BEFORE)
+        await session.commit()
+        return await get_kpi_values(session)
+
+    assert run_in_session(rollup_count) == [(2, "3", "historical", 3)]
@@ -0,0 +1,31 @@
+import pytest
+
+from grpc_settings.protobuf_storage.airflow_manager.protobuf_files.airflow_to_state_pb2 import (
+    RequestStreamKPIValues,
+)
+from grpc_settings.protobuf_storage.airflow_manager.reader import (
+    get_stream_kpi_values_statement,
+    validate_stream_kpi_values_request,
+)
+
+MANY_OBJECT_IDS = list(range(1, 40001))
+
+
+def test_object_ids_out_of_int32_range_are_invalid():
+    req = RequestStreamKPIValues(object_ids=[1, 2**31])
+
+    with pytest.raises(ValueError, match=str(2**31)):
+        validate_stream_kpi_values_request(req)
+
+
+def test_many_object_ids_are_sent_as_one_parameter(run_in_session):
+    req = RequestStreamKPIValues(kpi_ids=[1], object_ids=MANY_OBJECT_IDS)
+    stmt = get_stream_kpi_values_statement(req)
+
+    assert set(stmt.compile().params) == {"kpi_ids", "object_ids"}
+
+    async def read_kpi_values(session):
+        res = await session.execute(stmt)
+        return res.all()
+
+    assert run_in_session(read_kpi_values) == []